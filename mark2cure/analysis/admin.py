@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Report
+from .models import Report, PairwiseComparison, NetworkSnapshot
 
 admin.site.register(Report)
+admin.site.register(PairwiseComparison)
+admin.site.register(NetworkSnapshot)
@@ -0,0 +1,73 @@
+'''
+    Vectorized annotation keys for comparing Entity Recognition annotations
+    between users. The (document_pk, ann_type_idx, offset, length) fields that
+    identify an annotation are packed into a single int64 so equality checks,
+    grouping and set operations never touch Python strings.
+'''
+
+import numpy as np
+
+# Bits reserved for each field, high to low. 63 in total so keys stay positive int64
+DOCUMENT_BITS = 27
+TYPE_BITS = 3
+OFFSET_BITS = 21
+LENGTH_BITS = 12
+
+KEY_FIELDS = (('document_pk', DOCUMENT_BITS),
+              ('ann_type_idx', TYPE_BITS),
+              ('offset', OFFSET_BITS),
+              ('length', LENGTH_BITS))
+
+
+def keys_fit(document_pk, ann_type_idx, offset, length):
+    """If each annotation's fields fit in the bits of a key
+
+    Returns:
+        np.array: bool per annotation
+    """
+    fits = np.ones(len(document_pk), dtype=bool)
+    for (name, bits), values in zip(KEY_FIELDS, (document_pk, ann_type_idx, offset, length)):
+        values = np.asarray(values, dtype=np.int64)
+        fits &= (values >= 0) & (values < 1 << bits)
+    return fits
+
+
+def pack_keys(document_pk, ann_type_idx, offset, length):
+    """Pack the annotation fields into int64 keys
+
+    Args:
+        document_pk (array-like): Document primary keys
+        ann_type_idx (array-like): Annotation type index, 0 to ignore the type
+        offset (array-like): Offset of the annotation
+        length (array-like): Length of the annotation text
+
+    Returns:
+        np.array: int64 key per annotation
+    """
+    keys = np.zeros(len(document_pk), dtype=np.int64)
+    for (name, bits), values in zip(KEY_FIELDS, (document_pk, ann_type_idx, offset, length)):
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) and (values.min() < 0 or values.max() >= 1 << bits):
+            raise ValueError('{0} does not fit in the {1} bits of an annotation key'.format(name, bits))
+        keys = (keys << bits) | values
+    return keys
+
+
+def unpack_keys(keys):
+    """Split int64 keys back into their fields
+
+    Returns:
+        dict: field name >> np.array
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    fields = {}
+    for name, bits in reversed(KEY_FIELDS):
+        fields[name] = keys & ((1 << bits) - 1)
+        keys = keys >> bits
+    return fields
+
+
+def group_counts(df, columns):
+    """Number of rows sharing the values of columns, aligned to df
+    """
+    return df.groupby(columns)[columns if isinstance(columns, str) else columns[0]].transform('count')
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mark2cure.analysis.tasks import build_network_snapshot, refresh_network_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the network snapshots of the groups with enough annotations submitted since they were built'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='group_pks',
+                            help='Rebuild this group regardless of its pending annotations, may be repeated')
+        parser.add_argument('--threshold', type=int, default=settings.NETWORK_SNAPSHOT_THRESHOLD)
+
+    def handle(self, *args, **options):
+        if options['group_pks'] is not None:
+            group_pks = options['group_pks']
+            for group_pk in group_pks:
+                build_network_snapshot(group_pk)
+        else:
+            group_pks = refresh_network_snapshots(threshold=options['threshold'])
+
+        self.stdout.write('Rebuilt {0} network snapshots'.format(len(group_pks)))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('document', '0009_pubtatorannotation'),
+        ('common', '0002_auto_20151130_0410'),
+        ('analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairwiseComparison',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('true_positives', models.IntegerField(default=0)),
+                ('false_positives', models.IntegerField(default=0)),
+                ('false_negatives', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='document.Document')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='common.Group')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pairwisecomparison',
+            unique_together=set([('group', 'document', 'user_a', 'user_b')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_auto_20151130_0410'),
+        ('analysis', '0002_pairwisecomparison'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkNodePosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=255)),
+                ('x', models.FloatField()),
+                ('y', models.FloatField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='common.Group')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='networknodeposition',
+            unique_together=set([('group', 'label')]),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_auto_20151130_0410'),
+        ('analysis', '0003_networknodeposition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(default=0)),
+                ('data', models.TextField()),
+                ('pending_annotations', models.IntegerField(default=0)),
+                ('built', models.DateTimeField(auto_now_add=True)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='network_snapshot', to='common.Group')),
+            ],
+        ),
+    ]
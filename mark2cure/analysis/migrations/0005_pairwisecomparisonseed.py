@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_auto_20151130_0410'),
+        ('analysis', '0004_networksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairwiseComparisonSeed',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seeded', models.DateTimeField()),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pairwise_seed', to='common.Group')),
+            ],
+        ),
+    ]
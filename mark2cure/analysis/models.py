@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.db import models
 from picklefield.fields import PickledObjectField
 from ..common.models import Group
@@ -27,3 +28,84 @@ class Report(models.Model):
     def __unicode__(self):
         return u'Report'
 
+
+class PairwiseComparison(models.Model):
+    """Running Entity Recognition agreement counts between two users
+        on a single Document. user_a (the lower pk) is treated as the
+        reference set and user_b as the test set
+    """
+    group = models.ForeignKey(Group)
+    document = models.ForeignKey('document.Document')
+    user_a = models.ForeignKey(User, related_name='+')
+    user_b = models.ForeignKey(User, related_name='+')
+
+    true_positives = models.IntegerField(default=0)
+    false_positives = models.IntegerField(default=0)
+    false_negatives = models.IntegerField(default=0)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'analysis'
+        unique_together = ('group', 'document', 'user_a', 'user_b')
+
+    def __unicode__(self):
+        return u'{0} vs {1} on Document #{2}'.format(self.user_a_id, self.user_b_id, self.document_id)
+
+
+class PairwiseComparisonSeed(models.Model):
+    """Marks a group whose PairwiseComparison counts were rebuilt from all
+        of its submissions. Until then the running counts only hold the
+        documents submitted since they were introduced
+    """
+    group = models.OneToOneField(Group, related_name='pairwise_seed')
+    seeded = models.DateTimeField()
+
+    class Meta:
+        app_label = 'analysis'
+
+    def __unicode__(self):
+        return u'Pairwise counts of {0} seeded {1}'.format(self.group_id, self.seeded)
+
+
+class NetworkNodePosition(models.Model):
+    """Persisted layout position of a node (by its clean text label)
+        in a group's co-occurrence network
+    """
+    group = models.ForeignKey(Group)
+    label = models.CharField(max_length=255)
+
+    x = models.FloatField()
+    y = models.FloatField()
+
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'analysis'
+        unique_together = ('group', 'label')
+
+    def __unicode__(self):
+        return u'{0} ({1}, {2})'.format(self.label, self.x, self.y)
+
+
+class NetworkSnapshot(models.Model):
+    """The last built node-link JSON of a group's co-occurrence network
+    """
+    group = models.OneToOneField(Group, related_name='network_snapshot')
+
+    version = models.IntegerField(default=0)
+    data = models.TextField()
+
+    # Annotations submitted to the group since the snapshot was built
+    pending_annotations = models.IntegerField(default=0)
+    built = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'analysis'
+
+    @property
+    def etag(self):
+        return '"{0}-{1}"'.format(self.group_id, self.version)
+
+    def __unicode__(self):
+        return u'Network v{0} for {1}'.format(self.version, self.group_id)
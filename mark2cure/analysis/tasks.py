@@ -1,6 +1,6 @@
 '''
     Pulls data from xml and creates an array for each user consisting of PMID,
-    type, and annotation. Uses NLTK scoring metrics tools to determine
+    type, and annotation. Uses sparse incidence matrices to determine
     precision, recall, and f-score. By including PMID in the hash, this version
     allows for examining user to user comparisons across multiple documents in the
     group. Averages by User in one shot, instead of an average of averages.
@@ -9,73 +9,266 @@
 '''
 
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Sum, F
 from django.conf import settings
+from django.utils import timezone
 
 from ..common.formatter import clean_df
 from ..common.models import Group
+from ..document.managers import NER_DF_COLUMNS
 from ..document.models import Document
-from .models import Report
+from .models import Report, PairwiseComparison, PairwiseComparisonSeed, NetworkNodePosition, NetworkSnapshot
+from .keys import keys_fit, pack_keys, group_counts
 from . import synonyms_dict
 
-from nltk.metrics import scores as nltk_scoring
 # from ..common import celery_app as app
 
+from scipy import sparse
 import pandas as pd
+import numpy as np
 import networkx as nx
 
+from typing import List
+
+from collections import Counter
+from itertools import chain
 import itertools
+import json
 
 
-def hashed_er_annotations_df(group_pk, compare_type=True):
-    """Generate a Entity Recognition DataFrame with additional hash column
+def hash_er_df(er_df, compare_type=True):
+    """Add the hash column used to compare annotations between users
+        to a cleaned Entity Recognition DataFrame
+
+        The hash is a packed int64 of (document_pk, ann_type_idx, section_offset, length).
+        Annotations too long or too far into a document for the key's bits
+        keep the former document_pk_[ann_type_idx_]section_offset_length string
+    """
+    fields = (er_df['document_pk'].values,
+              er_df['ann_type_idx'].values if compare_type else np.zeros(er_df.shape[0], dtype=np.int64),
+              er_df['section_offset'].values,
+              er_df['length'].values)
+
+    fits = keys_fit(*fields)
+    if fits.all():
+        er_df['hash'] = pack_keys(*fields)
+        return er_df
+
+    hashes = np.empty(er_df.shape[0], dtype=object)
+    hashes[fits] = list(pack_keys(*[values[fits] for values in fields]))
+    hashes[~fits] = ['_'.join(str(x) for x in (row if compare_type else row[:1] + row[2:]))
+                     for row in zip(*[values[~fits].tolist() for values in fields])]
+    er_df['hash'] = hashes
+    return er_df
+
+
+# clean_df moves the DataFrame index into an index column
+HASHED_ER_COLUMNS = ['index'] + list(NER_DF_COLUMNS) + ['hash']
+
+
+def iter_hashed_er_dfs(group_pk, compare_type=True):
+    """Stream the hashed Entity Recognition DataFrames of a group a Document at a time
+
+    Yields:
+        tuple: (document_pk, pd.DataFrame) cleaned and with the additional hash column
     """
     group = Group.objects.get(pk=group_pk)
-    org_er_df = Document.objects.ner_df(document_pks=group.get_document_pks(), include_pubtator=False)
-    er_df = clean_df(org_er_df)
+    for document_pk, org_er_df in Document.objects.iter_ner_df(document_pks=group.get_document_pks(), include_pubtator=False):
+        er_df = clean_df(org_er_df)
+        if er_df.shape[0]:
+            yield document_pk, hash_er_df(er_df, compare_type=compare_type)
 
-    if compare_type:
-        er_df['hash'] = er_df.document_pk.apply(str) + '_' + er_df.ann_type_idx.apply(str) + '_' + er_df.section_offset.apply(str) + '_' + er_df.length.apply(str)
-    else:
-        er_df['hash'] = er_df.document_pk.apply(str) + '_' + er_df.section_offset.apply(str) + '_' + er_df.length.apply(str)
-    return er_df
+
+def hashed_er_annotations_df(group_pk, compare_type=True, columns=None):
+    """Generate a Entity Recognition DataFrame with additional hash column
+
+    Args:
+        columns (list): Only keep these columns of each Document, limits the memory used by large groups
+    """
+    frames = [er_df if columns is None else er_df[columns] for document_pk, er_df in iter_hashed_er_dfs(group_pk, compare_type=compare_type)]
+    if not frames:
+        return pd.DataFrame([], columns=HASHED_ER_COLUMNS if columns is None else columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+PAIRWISE_COLUMNS = ('user_a', 'user_b', 'docs_compared', 'precision', 'recall', 'f-score')
 
 
 def compute_pairwise(hashed_er_anns_df):
     """
         Returns pairwise comparision between users (uesr_a & user_b)
         that have completed similar documents
+
+        Annotation hashes and documents are encoded as integer ids to build
+        sparse User x Hash and User x Document matrices so every pairing is
+        scored with a few matrix products instead of filtering the DataFrame
+        for each pair of users. For each pairing only documents both users
+        completed are compared, user_a is treated as the reference set and
+        user_b as the test set.
     """
+    df = hashed_er_anns_df[['user_id', 'document_pk', 'hash']].drop_duplicates()
+    if df.shape[0] == 0:
+        return pd.DataFrame([], columns=PAIRWISE_COLUMNS)
+
     # Make user_pks unique
-    userset = set(hashed_er_anns_df.user_id)
-
-    inter_annotator_arr = []
-    # For each unique user comparision, compute
-    for user_a, user_b in itertools.combinations(userset, 2):
-        # The list of document_pks that each user had completed
-        user_a_set = set(hashed_er_anns_df[hashed_er_anns_df['user_id'] == user_a].document_pk)
-        user_b_set = set(hashed_er_anns_df[hashed_er_anns_df['user_id'] == user_b].document_pk)
-
-        # Only compare documents both users have completed
-        pmid_set = user_a_set.intersection(user_b_set)
-
-        # If user_a and user_b have completed shared PMID, compute comparisions
-        if len(pmid_set) != 0:
-            pmid_df = hashed_er_anns_df[hashed_er_anns_df['document_pk'].isin(pmid_set)]
-            ref_set = set(pmid_df[pmid_df['user_id'] == user_a].hash)
-            test_set = set(pmid_df[pmid_df['user_id'] == user_b].hash)
-
-            # Compute the precision, recall and F-measure based on
-            # the unique hashes
-            inter_annotator_arr.append((
-                user_a,
-                user_b,
-                len(pmid_set),
-                nltk_scoring.precision(ref_set, test_set),
-                nltk_scoring.recall(ref_set, test_set),
-                nltk_scoring.f_measure(ref_set, test_set)
-            ))
-
-    return pd.DataFrame(inter_annotator_arr, columns=('user_a', 'user_b', 'docs_compared', 'precision', 'recall', 'f-score'))
+    users = np.sort(df['user_id'].unique())
+    user_codes = pd.Categorical(df['user_id'], categories=users).codes
+    hash_codes, hashes = pd.factorize(df['hash'])
+    document_codes, documents = pd.factorize(df['document_pk'])
+    ones = np.ones(df.shape[0])
+
+    # User x Hash incidence and User x Document unique hash counts
+    user_hash = sparse.csr_matrix((ones, (user_codes, hash_codes)), shape=(len(users), len(hashes)))
+    user_hash.data[:] = 1
+    user_document_counts = sparse.csr_matrix((ones, (user_codes, document_codes)), shape=(len(users), len(documents)))
+    user_document = user_document_counts.copy()
+    user_document.data[:] = 1
+
+    # [a, b] is the number of hashes both users share
+    intersections = user_hash.dot(user_hash.T).toarray()
+    # [a, b] is the number of documents both users have completed
+    docs_compared = user_document.dot(user_document.T).toarray()
+    # [a, b] is the number of user_a hashes within the documents user_b completed
+    set_sizes = user_document_counts.dot(user_document.T).toarray()
+
+    # For each unique user comparision with shared documents, compute
+    user_a_idx, user_b_idx = np.triu_indices(len(users), k=1)
+    shared = docs_compared[user_a_idx, user_b_idx] > 0
+    user_a_idx, user_b_idx = user_a_idx[shared], user_b_idx[shared]
+
+    true_positives = intersections[user_a_idx, user_b_idx]
+    ref_sizes = set_sizes[user_a_idx, user_b_idx]
+    test_sizes = set_sizes[user_b_idx, user_a_idx]
+
+    # Match nltk.metrics.scores: undefined (NaN) for empty sets, 0 when
+    # either precision or recall is 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(test_sizes > 0, true_positives / test_sizes, np.nan)
+        recall = np.where(ref_sizes > 0, true_positives / ref_sizes, np.nan)
+        f_score = np.where((precision > 0) & (recall > 0), 2 * precision * recall / (precision + recall), 0.0)
+    f_score[np.isnan(precision) | np.isnan(recall)] = np.nan
+
+    return pd.DataFrame({
+        'user_a': users[user_a_idx],
+        'user_b': users[user_b_idx],
+        'docs_compared': docs_compared[user_a_idx, user_b_idx].astype(int),
+        'precision': precision,
+        'recall': recall,
+        'f-score': f_score
+    }, columns=PAIRWISE_COLUMNS)
+
+
+def _score_document_pairs(document_hashes, user_pk=None):
+    """Score every pairing of users on a single document
+
+    Args:
+        document_hashes (dict): user_pk >> set of annotation hashes
+        user_pk (int): Only score the pairings that involve this user
+
+    Returns:
+        list: (user_a, user_b, true_positives, false_positives, false_negatives)
+    """
+    arr = []
+    for user_a, user_b in itertools.combinations(sorted(document_hashes.keys()), 2):
+        if user_pk is not None and user_pk not in (user_a, user_b):
+            continue
+
+        ref_set = document_hashes[user_a]
+        test_set = document_hashes[user_b]
+        true_positives = len(ref_set & test_set)
+        arr.append((user_a, user_b, true_positives,
+                    len(test_set) - true_positives,
+                    len(ref_set) - true_positives))
+    return arr
+
+
+def update_pairwise_comparisons(group_pk: int, document_pk: int, user_pk: int) -> int:
+    """Update the running PairwiseComparison counts for the pairings
+        between the user and everyone else who annotated the document
+
+    Args:
+        group_pk (int): The group the document was completed in
+        document_pk (int): The document the user just completed
+        user_pk (int): The user who submitted the document
+
+    Returns:
+        int: Number of pairings updated
+    """
+    er_df = Document.objects.ner_df(document_pks=[document_pk], include_pubtator=False)
+    if er_df.shape[0] == 0:
+        return 0
+
+    er_df = hash_er_df(clean_df(er_df))
+    document_hashes = dict((user_id, set(user_df.hash)) for user_id, user_df in er_df.groupby('user_id'))
+
+    # Users without annotations are not compared (same as compute_pairwise)
+    if user_pk not in document_hashes:
+        return 0
+
+    pairings = _score_document_pairs(document_hashes, user_pk=user_pk)
+    for user_a, user_b, true_positives, false_positives, false_negatives in pairings:
+        PairwiseComparison.objects.update_or_create(
+            group_id=group_pk, document_id=document_pk,
+            user_a_id=user_a, user_b_id=user_b,
+            defaults={
+                'true_positives': true_positives,
+                'false_positives': false_positives,
+                'false_negatives': false_negatives})
+
+    return len(pairings)
+
+
+def rebuild_pairwise_comparisons(group_pk: int) -> None:
+    """Recompute all the PairwiseComparison counts for a group from scratch
+        and mark the group as seeded
+    """
+    comparisons = []
+    for document_pk, document_df in iter_hashed_er_dfs(group_pk):
+        document_hashes = dict((user_id, set(user_df.hash)) for user_id, user_df in document_df.groupby('user_id'))
+
+        for user_a, user_b, true_positives, false_positives, false_negatives in _score_document_pairs(document_hashes):
+            comparisons.append(PairwiseComparison(
+                group_id=group_pk, document_id=int(document_pk),
+                user_a_id=int(user_a), user_b_id=int(user_b),
+                true_positives=true_positives,
+                false_positives=false_positives,
+                false_negatives=false_negatives))
+
+    with transaction.atomic():
+        PairwiseComparison.objects.filter(group_id=group_pk).delete()
+        PairwiseComparison.objects.bulk_create(comparisons, batch_size=1000)
+        PairwiseComparisonSeed.objects.update_or_create(group_id=group_pk, defaults={'seeded': timezone.now()})
+
+
+def pairwise_from_comparisons(group_pk: int):
+    """Build the Report.PAIRWISE DataFrame from the running
+        PairwiseComparison counts of a group
+
+    Returns:
+        pd.DataFrame
+    """
+    queryset = PairwiseComparison.objects.filter(group_id=group_pk).values('user_a', 'user_b').annotate(
+        docs_compared=Count('document'),
+        tp=Sum('true_positives'),
+        fp=Sum('false_positives'),
+        fn=Sum('false_negatives')).order_by('user_a', 'user_b')
+
+    df = pd.DataFrame(list(queryset), columns=('user_a', 'user_b', 'docs_compared', 'tp', 'fp', 'fn'))
+
+    true_positives = df['tp'].values.astype(float)
+    test_sizes = true_positives + df['fp'].values
+    ref_sizes = true_positives + df['fn'].values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['precision'] = np.where(test_sizes > 0, true_positives / test_sizes, np.nan)
+        df['recall'] = np.where(ref_sizes > 0, true_positives / ref_sizes, np.nan)
+        f_score = np.where((df['precision'] > 0) & (df['recall'] > 0),
+                           2 * df['precision'] * df['recall'] / (df['precision'] + df['recall']), 0.0)
+    f_score[df['precision'].isnull().values | df['recall'].isnull().values] = np.nan
+    df['f-score'] = f_score
+
+    return df[list(PAIRWISE_COLUMNS)]
 
 
 def merge_pairwise_comparisons(inter_annotator_df):
@@ -128,10 +321,12 @@ def merge_pairwise_comparisons(inter_annotator_df):
 #           max_retries=0, soft_time_limit=600,
 #           acks_late=True, track_started=True,
 #           expires=3600)
-def generate_reports(group_pk: int) -> None:
+def generate_reports(group_pk: int, incremental: bool=True) -> None:
     """
     Args:
         group_pk (int): The selection of documents to run the analysis on
+        incremental (bool): Build the pairwise report from the running
+            PairwiseComparison counts instead of recomputing every pairing
 
     Returns:
         None
@@ -139,9 +334,18 @@ def generate_reports(group_pk: int) -> None:
     args = locals()
 
     group = Group.objects.get(pk=group_pk)
-    hash_table_df = hashed_er_annotations_df(group.pk)
 
-    inter_annotator_df = compute_pairwise(hash_table_df)
+    if incremental:
+        # Submissions add to the counts of a group before it's seeded,
+        # so the rows existing doesn't mean they cover its history
+        if not PairwiseComparisonSeed.objects.filter(group=group).exists():
+            rebuild_pairwise_comparisons(group.pk)
+        inter_annotator_df = pairwise_from_comparisons(group.pk)
+
+    else:
+        hash_table_df = hashed_er_annotations_df(group.pk, columns=['user_id', 'document_pk', 'hash'])
+        inter_annotator_df = compute_pairwise(hash_table_df)
+
     Report.objects.create(
         group=group, report_type=Report.PAIRWISE,
         dataframe=inter_annotator_df, args=args)
@@ -166,6 +370,9 @@ def group_analysis(self):
         return True
 
 
+GRAPH_PROCESS_COLUMNS = HASHED_ER_COLUMNS + ['username', 'clean_text', 'hash_count', 'text_count', 'user_pmid_count']
+
+
 def hashed_annotations_graph_process(group_pk: int, min_thresh: int=settings.ENTITY_RECOGNITION_K):
     """
     Args:
@@ -175,124 +382,118 @@ def hashed_annotations_graph_process(group_pk: int, min_thresh: int=settings.ENT
     Returns:
         pd.DataFrame
     """
-    df = hashed_er_annotations_df(group_pk)
+    # Documents are streamed and only the annotations that meet the minimum
+    # count are kept, text_count is the only group wide count so it is tallied as we go
+    text_counts = Counter()
+    frames = []
+    for document_pk, df in iter_hashed_er_dfs(group_pk):
+        # Capitalize all annotation text
+        df['text'] = df['text'].astype(str).str.upper()
+        text_counts.update(df['text'].value_counts().to_dict())
 
-    # (TODO) This can be wayyy faster and better
-    # Add a username column
-    user_lookup = User.objects.all().values('pk', 'username')
-    res = {}
-    for u_dict in user_lookup:
-        res[u_dict['pk']] = u_dict['username']
+        # Add field to deterine if hash meets minimum count (hash includes the document_pk)
+        df['hash_count'] = group_counts(df, 'hash')
 
-    df['username'] = df['user_id'].map(lambda user: res[user] if user > 0 else 'pubtator').apply(str)
+        # User Annotation count per PMID
+        df['user_pmid_count'] = group_counts(df, 'user_id')
 
-    # Capitalize all annotation text
-    df['text'] = df['text'].map(lambda x: x.upper())
-    # Hard coded synonym cleaner
-    df['clean_text'] = df['text'].map(lambda text_str: str(synonyms_dict.get(text_str, text_str))).apply(str)
+        frames.append(df[df['hash_count'] >= min_thresh])
+
+    if not frames:
+        return pd.DataFrame([], columns=GRAPH_PROCESS_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+
+    # Add a username column
+    usernames = dict(User.objects.filter(pk__in=df['user_id'].unique().tolist()).values_list('pk', 'username'))
+    df['username'] = df['user_id'].map(usernames).where(df['user_id'] > 0, 'pubtator').astype(str)
 
-    # Add field to deterine if hash meets minimum count
-    hash_count_series = df['hash'].value_counts()
-    df['hash_count'] = df['hash'].map(lambda hash_str: hash_count_series[hash_str])
+    # Hard coded synonym cleaner
+    clean_text = df['text'].map(synonyms_dict)
+    df['clean_text'] = clean_text.where(clean_text.notnull(), df['text']).astype(str)
 
     # Count the unique usage of that text string
-    text_count_series = df['text'].value_counts()
-    df['text_count'] = df['text'].map(lambda text_str: text_count_series[text_str])
-    # clean_text_count_series = df['clean_text'].value_counts()
-    # df['clean_text_count'] = df['clean_text'].map(lambda text_str: clean_text_count_series[text_str])
+    df['text_count'] = df['text'].map(text_counts).astype(int)
 
-    # User Annotation count per PMID
-    df['user_pmid_hash'] = df.document_pk.apply(str) + '_' + df.username.apply(str)
-    user_pmid_hash_count_series = df['user_pmid_hash'].value_counts()
-    df['user_pmid_count'] = df['user_pmid_hash'].map(lambda hash_str: user_pmid_hash_count_series[hash_str])
+    return df
 
-    return df[df['hash_count'] >= min_thresh]
 
+def cooccurrence_edges(rows, cols):
+    """Weighted co-occurrence edges from a sparse (row x column) incidence
+        matrix, for example Document x Node
 
-def generate_network(group_pk: int, parallel=False, spring_force=10, include_degree=False): # noqa
+    Args:
+        rows (np.array): Row index of each observation
+        cols (np.array): Column index of each observation
+
+    Returns:
+        tuple: (col_a, col_b, weight) arrays, one entry per pair with col_a < col_b
+            where weight is the number of rows that contain both columns
+    """
+    if not len(rows):
+        empty = np.array([], dtype=int)
+        return empty, empty, empty
+
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=int), (rows, cols)))
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+
+    cooccurrence = sparse.triu(incidence.T.dot(incidence), k=1).tocoo()
+    return cooccurrence.row, cooccurrence.col, cooccurrence.data
+
+
+def build_network(group_pk: int, parallel=False, include_degree=False):
     """
         1) Generate the DF needed to compute the Graph
-        2) Compute the graph (aggregate, compare text / pmid)
+        2) Compute the weighted co-occurrence edges (aggregate, compare text / pmid)
         3) Compute graph metadata and attributes
     Args:
         group_pk (int): Use the group for selecting the ner documents to include
+        parallel (bool): Count co-occurrences per (document, user) instead of per document
 
     Returns:
-
+        nx.Graph: Without node positions
     """
-
     # Generate the required base DataFrame from raw Annotations
     df = hashed_annotations_graph_process(group_pk)
 
-    # Numpy Arr of Unique Annotations via sanitized text
-    nd_arr = df.clean_text.unique()
-    # Unique Node labels (not using text as Identifier)
-    names = ['n' + str(x + 1) for x in range(len(nd_arr))]
-    # ID >> Cleantext lookup dictionary
-    nodes = pd.Series(names, index=nd_arr).to_dict()
+    # Unique (document, text, user) annotations
+    new_df = df[['document_pk', 'clean_text', 'username']].drop_duplicates()
 
-    # Start the Network off by adding all the unique Nodes (text annotations)
-    G = nx.MultiGraph()
-    G.add_nodes_from(names)
+    # Unique Node labels (not using text as Identifier), in order of appearance
+    node_idx, nd_arr = pd.factorize(df['clean_text'])
+    nd_arr = pd.Index(nd_arr)
+    names = np.array(['n' + str(x + 1) for x in range(len(nd_arr))])
+    # Cleantext >> ID lookup dictionary
+    nodes = dict(zip(nd_arr, names))
 
-    anns = []
-    for (doc, text, user), g_df in df.groupby(['document_pk', 'clean_text', 'username']):
-        anns.append({
-            'node': nodes[text],
-            'doc': int(doc),
-            'text': text,
-            'user': user
-        })
-    new_df = pd.DataFrame(anns)
+    G = nx.Graph()
+    G.add_nodes_from(names)
 
+    new_df_nodes = nd_arr.get_indexer(new_df['clean_text'])
     if parallel:
-        edge_idx = 1
-        for (doc, user), g_df in new_df.groupby(['doc', 'user']):
-            for node1, node2 in itertools.combinations(list(g_df.node), 2):
-                G.add_edge(node1, node2, key=edge_idx, attributes={'doc': int(doc), 'user': user})
-                edge_idx += 1
-
+        rows = pd.factorize(new_df['document_pk'].apply(str) + '_' + new_df['username'])[0]
     else:
-        edge_idx = 1
-        for doc_id, group_df in new_df[['doc', 'node']].groupby('doc'):
-            node_weight = group_df['node'].value_counts().T.to_dict()
+        rows = pd.factorize(new_df['document_pk'])[0]
 
-            for node1, node2 in itertools.combinations(node_weight.keys(), 2):
-                G.add_edge(node1, node2, key=edge_idx, attributes={'doc': int(doc_id)})
-                edge_idx += 1
-
-    # Compute Node Values
-    pos = nx.spring_layout(G, iterations=spring_force)
+    node_a, node_b, weights = cooccurrence_edges(rows, new_df_nodes)
+    G.add_weighted_edges_from(zip(names[node_a], names[node_b], [int(w) for w in weights]))
 
     # Santize the node colors
     # if these colors get changed, need to edit group_home.js
     type_to_color = {0: '#d1f3ff', 1: '#B1FFA8', 2: '#ffd1dc'}
-    df['color'] = df['ann_type_idx'].map(type_to_color)
-    df['nodes'] = df['clean_text'].map(nodes)
-    colors = {}
-    for node, g_df in df.groupby('nodes'):
-        colors[node] = g_df['color'].value_counts().idxmax()
+    colors = df.assign(nodes=names[node_idx], color=df['ann_type_idx'].map(type_to_color)).groupby('nodes')['color'].agg(
+        lambda x: x.value_counts().idxmax()).to_dict()
     nx.set_node_attributes(G, 'color', colors)
 
-    # Calcuate position and size
-    x_pos, y_pos = {}, {}
-    for idx, val in pos.items():
-        x_pos[idx], y_pos[idx] = val
-    nx.set_node_attributes(G, 'x', x_pos)
-    nx.set_node_attributes(G, 'y', y_pos)
-
-    size_dict = new_df['node'].value_counts().to_dict()
-    for key, value in size_dict.items():
-        size_dict[key] = int(value)
-
-    nx.set_node_attributes(G, 'size', size_dict)
-    nx.set_node_attributes(G, 'label', dict(zip(nodes.values(), nodes.keys())))
+    size_dict = new_df['clean_text'].map(nodes).value_counts().to_dict()
+    nx.set_node_attributes(G, 'size', {key: int(value) for key, value in size_dict.items()})
+    nx.set_node_attributes(G, 'label', dict(zip(names, nd_arr)))
 
     if include_degree:
         # Calculate centrality metrics
         degree = nx.degree_centrality(G)
         attributes = {}
-        for key, value in degree.iteritems():
+        for key, value in degree.items():
             attributes[key] = {}
             attributes[key]['degree'] = int(value)
         nx.set_node_attributes(G, 'attributes', attributes)
@@ -300,4 +501,137 @@ def generate_network(group_pk: int, parallel=False, spring_force=10, include_deg
     return G
 
 
+# @app.task
+def layout_network(group_pk: int, spring_force=10, G=None, relayout=True):
+    """Compute the node positions offline and persist them by node label
+
+        Stored positions seed the layout so a group's network stays stable
+        as annotations are added. With relayout=False only the nodes
+        without a stored position are placed.
+
+    Args:
+        group_pk (int): The group the network belongs to
+        spring_force (int): Spring layout iterations
+        G (nx.Graph): A network from build_network, built if not provided
+
+    Returns:
+        nx.Graph: With x and y node attributes
+    """
+    if G is None:
+        G = build_network(group_pk)
+
+    labels = nx.get_node_attributes(G, 'label')
+    stored = dict((label, (x, y)) for label, x, y in NetworkNodePosition.objects.filter(
+        group_id=group_pk).values_list('label', 'x', 'y'))
+
+    initial = dict((node, stored[label]) for node, label in labels.items() if label in stored)
+    missing = [node for node in G.nodes() if node not in initial]
+
+    if len(G) and (relayout or len(missing)):
+        pos = nx.spring_layout(G, pos=initial or None,
+                               fixed=None if relayout or not initial else list(initial.keys()),
+                               iterations=spring_force)
+        changed = G.nodes() if relayout else missing
+
+        with transaction.atomic():
+            NetworkNodePosition.objects.filter(group_id=group_pk, label__in=[labels[node] for node in changed]).delete()
+            NetworkNodePosition.objects.bulk_create([NetworkNodePosition(
+                group_id=group_pk,
+                label=labels[node],
+                x=float(pos[node][0]),
+                y=float(pos[node][1])) for node in changed])
+    else:
+        pos = initial
+
+    # Calcuate position and size
+    nx.set_node_attributes(G, 'x', dict((node, float(val[0])) for node, val in pos.items()))
+    nx.set_node_attributes(G, 'y', dict((node, float(val[1])) for node, val in pos.items()))
+    return G
+
+
+def generate_network(group_pk: int, parallel=False, spring_force=10, include_degree=False): # noqa
+    """The group's co-occurrence network with its persisted layout
+
+    Args:
+        group_pk (int): Use the group for selecting the ner documents to include
+
+    Returns:
+        nx.Graph
+    """
+    G = build_network(group_pk, parallel=parallel, include_degree=include_degree)
+    return layout_network(group_pk, spring_force=spring_force, G=G, relayout=False)
+
+
+_attrs = dict(id='id', source='source', target='target', key='key')
+
+
+def node_link_data(G, attrs=_attrs):
+    multigraph = G.is_multigraph()
+    id_ = attrs['id']
 
+    source = attrs['source']
+    target = attrs['target']
+
+    # Allow 'key' to be omitted from attrs if the graph is not a multigraph.
+    key = None if not multigraph else attrs['key']
+
+    if len(set([source, target, key])) < 3:
+        raise nx.NetworkXError('Attribute names are not unique.')
+
+    data = {}
+    data['directed'] = G.is_directed()
+    data['multigraph'] = multigraph
+    data['graph'] = list(G.graph.items())
+    data['nodes'] = [dict(chain(G.node[n].items(), [(id_, n)])) for n in G]
+    if multigraph:
+        data['edges'] = [dict(chain(d.items(), [(source, u), (target, v), ('id', k)])) for u, v, k, d in G.edges_iter(keys=True, data=True)]  # N1, N2, IDX, ATTRS
+    else:
+        data['edges'] = [dict(chain(d.items(), [(source, u), (target, v), ('id', k)])) for k, (u, v, d) in enumerate(G.edges_iter(data=True), 1)]  # N1, N2, IDX, ATTRS
+    return data
+
+
+# @app.task
+def build_network_snapshot(group_pk: int, spring_force=8):
+    """Build the group's network and store its node-link JSON
+
+    Returns:
+        NetworkSnapshot
+    """
+    # Annotations counted while the network is built stay pending
+    pending = NetworkSnapshot.objects.filter(group_id=group_pk).values_list('pending_annotations', flat=True).first() or 0
+    data = json.dumps(node_link_data(generate_network(group_pk, spring_force=spring_force)))
+
+    snapshot, created = NetworkSnapshot.objects.get_or_create(group_id=group_pk, defaults={'data': data})
+    NetworkSnapshot.objects.filter(pk=snapshot.pk).update(
+        version=F('version') + 1 if not created else 1,
+        data=data,
+        pending_annotations=F('pending_annotations') - pending if not created else 0,
+        built=timezone.now())
+    snapshot.refresh_from_db()
+    return snapshot
+
+
+def mark_network_stale(group_pk: int, annotation_count: int) -> None:
+    """Count submitted annotations against the group's network snapshot,
+        the snapshot itself is rebuilt by refresh_network_snapshots
+    """
+    NetworkSnapshot.objects.filter(group_id=group_pk).update(
+        pending_annotations=F('pending_annotations') + annotation_count)
+
+
+# @app.task(bind=True, ignore_result=True,
+#           max_retries=0, soft_time_limit=600,
+#           acks_late=True, track_started=True,
+#           expires=3600)
+def refresh_network_snapshots(threshold=settings.NETWORK_SNAPSHOT_THRESHOLD) -> List[int]:
+    """Periodically rebuild the network snapshots of the groups with enough
+        annotations submitted since they were built
+
+    Returns:
+        list: The pks of the groups rebuilt
+    """
+    group_pks = list(NetworkSnapshot.objects.filter(
+        pending_annotations__gte=threshold).order_by('group_id').values_list('group_id', flat=True))
+    for group_pk in group_pks:
+        build_network_snapshot(group_pk)
+    return group_pks
@@ -0,0 +1,179 @@
+from django.test import TestCase
+
+from .tasks import compute_pairwise, _score_document_pairs, cooccurrence_edges
+
+import pandas as pd
+import numpy as np
+import networkx as nx
+import json
+
+
+class PairwiseAnalysis(TestCase):
+
+    def test_compute_pairwise(self):
+        df = pd.DataFrame([
+            (1, 10, '10_0_0_5'), (1, 10, '10_0_8_4'), (1, 11, '11_1_0_3'),
+            (2, 10, '10_0_0_5'),
+            (3, 12, '12_2_4_6'),
+        ], columns=('user_id', 'document_pk', 'hash'))
+
+        pairwise_df = compute_pairwise(df)
+
+        # User 3 shares no documents with anyone
+        self.assertEqual(pairwise_df.shape[0], 1)
+
+        row = pairwise_df.iloc[0]
+        self.assertEqual((row['user_a'], row['user_b'], row['docs_compared']), (1, 2, 1))
+
+        # Only document 10 is compared; user 1 is the reference set
+        self.assertEqual(row['precision'], 1.0)
+        self.assertEqual(row['recall'], 0.5)
+        self.assertAlmostEqual(row['f-score'], 2 / 3.0)
+
+    def test_score_document_pairs(self):
+        document_hashes = {
+            1: set(['10_0_0_5', '10_0_8_4']),
+            2: set(['10_0_0_5']),
+            3: set(['10_1_2_2'])}
+
+        # Only the pairings that include the submitting user are scored
+        self.assertEqual(_score_document_pairs(document_hashes, user_pk=2), [
+            (1, 2, 1, 0, 1),
+            (2, 3, 0, 1, 1)])
+        self.assertEqual(len(_score_document_pairs(document_hashes)), 3)
+
+
+class PairwiseSeeding(TestCase):
+
+    def annotate(self, document, user, anns):
+        from django.contrib.contenttypes.models import ContentType
+        from ..document.models import View, Annotation
+        from ..task.entity_recognition.models import EntityRecognitionAnnotation
+
+        view = View.objects.create(section=document.section_set.first(), user=user, task_type='cr', completed=True)
+        content_type = ContentType.objects.get_for_model(EntityRecognitionAnnotation)
+        for type_idx, start, text in anns:
+            er_ann = EntityRecognitionAnnotation.objects.create(type_idx=type_idx, start=start, text=text)
+            Annotation.objects.create(kind='e', content_type=content_type, object_id=er_ann.pk, view=view)
+
+    def test_seed_group_with_submissions(self):
+        from django.contrib.auth.models import User
+        from ..common.models import Group
+        from ..document.models import Document, Section
+        from ..task.models import Task, DocumentQuestRelationship
+        from .models import Report, PairwiseComparison, PairwiseComparisonSeed
+        from .tasks import update_pairwise_comparisons, generate_reports, hashed_er_annotations_df
+
+        group = Group.objects.create(name='Group', stub='group')
+        task = Task.objects.create(name='Quest', group=group)
+        documents = []
+        for pmid in (1, 2):
+            document = Document.objects.create(document_id=pmid, title='Title', authors='Author')
+            Section.objects.create(kind='t', text='Hereditary spastic paraplegia', document=document)
+            DocumentQuestRelationship.objects.create(task=task, document=document)
+            documents.append(document)
+        user_a, user_b, user_c = [User.objects.create_user('seed-user-{0}'.format(idx)) for idx in range(3)]
+
+        # Submitted before the running counts existed
+        self.annotate(documents[0], user_a, [(0, 11, 'spastic paraplegia')])
+        self.annotate(documents[0], user_b, [(0, 11, 'spastic paraplegia'), (0, 0, 'Hereditary')])
+
+        # A live submission creates the rows of its document only
+        self.annotate(documents[1], user_a, [(0, 19, 'paraplegia')])
+        self.annotate(documents[1], user_c, [(0, 19, 'paraplegia')])
+        update_pairwise_comparisons(group.pk, documents[1].pk, user_c.pk)
+        self.assertEqual(PairwiseComparison.objects.filter(group=group).count(), 1)
+        self.assertFalse(PairwiseComparisonSeed.objects.filter(group=group).exists())
+
+        generate_reports(group.pk)
+        self.assertTrue(PairwiseComparisonSeed.objects.filter(group=group).exists())
+        self.assertEqual(PairwiseComparison.objects.filter(group=group).count(), 2)
+
+        incremental = Report.objects.filter(group=group, report_type=Report.PAIRWISE).last().dataframe
+        expected = compute_pairwise(hashed_er_annotations_df(group.pk))
+        self.assertEqual(incremental[['user_a', 'user_b', 'docs_compared', 'precision', 'recall']].values.tolist(),
+                         expected[['user_a', 'user_b', 'docs_compared', 'precision', 'recall']].values.tolist())
+
+        # Once seeded, reports keep using the running counts
+        PairwiseComparison.objects.filter(group=group, document=documents[0]).delete()
+        generate_reports(group.pk)
+        self.assertEqual(PairwiseComparison.objects.filter(group=group).count(), 1)
+
+
+class NetworkAnalysis(TestCase):
+
+    def test_cooccurrence_edges(self):
+        # Document 0 has nodes 0, 1, 2 and Document 1 has nodes 0 and 1 (twice)
+        rows = np.array([0, 0, 0, 1, 1, 1])
+        cols = np.array([0, 1, 2, 0, 1, 1])
+
+        edges = sorted(zip(*[x.tolist() for x in cooccurrence_edges(rows, cols)]))
+        self.assertEqual(edges, [(0, 1, 2), (0, 2, 1), (1, 2, 1)])
+
+        self.assertEqual([len(x) for x in cooccurrence_edges(np.array([]), np.array([]))], [0, 0, 0])
+
+
+class NetworkSnapshots(TestCase):
+
+    def test_rebuild_pending_snapshots(self):
+        from ..common.models import Group
+        from .models import NetworkSnapshot
+        from .tasks import mark_network_stale, refresh_network_snapshots
+        import mock
+
+        groups = [Group.objects.create(name='Group {0}'.format(idx), stub='group-{0}'.format(idx)) for idx in range(2)]
+        for group in groups:
+            NetworkSnapshot.objects.create(group=group, version=1, data='{}')
+
+        # Submissions only add to the counter
+        mark_network_stale(groups[0].pk, 3)
+        mark_network_stale(groups[0].pk, 2)
+        mark_network_stale(groups[1].pk, 1)
+        self.assertEqual(list(NetworkSnapshot.objects.order_by('group_id').values_list('pending_annotations', flat=True)), [5, 1])
+
+        with mock.patch('mark2cure.analysis.tasks.generate_network', return_value=nx.Graph()):
+            self.assertEqual(refresh_network_snapshots(threshold=5), [groups[0].pk])
+
+        rebuilt, untouched = NetworkSnapshot.objects.order_by('group_id')
+        self.assertEqual((rebuilt.version, rebuilt.pending_annotations), (2, 0))
+        self.assertEqual((untouched.version, untouched.pending_annotations), (1, 1))
+        self.assertEqual(json.loads(rebuilt.data)['nodes'], [])
+
+
+class AnnotationKeys(TestCase):
+
+    def test_pack_keys(self):
+        from .keys import pack_keys, unpack_keys
+
+        keys = pack_keys([10, 10, 11], [0, 1, 0], [0, 0, 250], [6, 6, 6])
+        self.assertEqual(len(set(keys.tolist())), 3)
+
+        fields = unpack_keys(keys)
+        self.assertEqual(fields['document_pk'].tolist(), [10, 10, 11])
+        self.assertEqual(fields['offset'].tolist(), [0, 0, 250])
+
+        with self.assertRaises(ValueError):
+            pack_keys([1], [0], [0], [1 << 12])
+
+    def test_hash_out_of_range_annotations(self):
+        from .keys import keys_fit, pack_keys
+        from .tasks import hash_er_df
+
+        df = pd.DataFrame([
+            (1, 10, 0, 0, 5), (2, 10, 0, 0, 5),
+            (1, 10, 1, 0, 1 << 12), (2, 10, 1, 0, 1 << 12),
+            (1, 10, 2, 1 << 21, 4),
+        ], columns=('user_id', 'document_pk', 'ann_type_idx', 'section_offset', 'length'))
+        self.assertEqual(keys_fit(df['document_pk'], df['ann_type_idx'], df['section_offset'], df['length']).tolist(),
+                         [True, True, False, False, False])
+
+        hashes = hash_er_df(df.copy())['hash'].tolist()
+        self.assertEqual(hashes[:2], pack_keys([10, 10], [0, 0], [0, 0], [5, 5]).tolist())
+        self.assertEqual(hashes[2:], ['10_1_0_4096', '10_1_0_4096', '10_2_2097152_4'])
+
+        # Without the type the rows keep comparing equal
+        hashes = hash_er_df(df.copy(), compare_type=False)['hash'].tolist()
+        self.assertEqual(hashes[2:], ['10_0_4096', '10_0_4096', '10_2097152_4'])
+
+        pairwise_df = compute_pairwise(hash_er_df(df.copy()))
+        self.assertEqual(pairwise_df[['precision', 'recall']].values.tolist(), [[1.0, 2 / 3.0]])
@@ -6,8 +6,6 @@ from ..document.models import Annotation
 from ..common.models import Group
 from ..task.models import Task
 
-from ..common.bioc import BioCReader
-
 import json
 
 
@@ -47,7 +45,59 @@ class GroupBioCAPIViews(TestCase, TestBase):
         self.assertTrue("1817, 1816, 1815" in data_string)
         self.client.logout()
 
+    def test_ner_quest_read(self):
+        from ..task.models import UserQuestDocumentProgress
+        self.login_test_user('test_player')
+
+        response = self.client.get(reverse('api:ner-quest-read-api', kwargs={'quest_pk': self.task.pk}))
+        self.assertEqual(response.status_code, 200)
+
+        data = json.loads(response.content)
+        self.assertFalse(data['completed'])
+        self.assertEqual([d['pk'] for d in data['documents']],
+                         list(self.task.documents.order_by('pk').values_list('pk', flat=True)))
+
+        # The progress snapshot is stored on first read and reused afterwards
+        self.assertEqual(UserQuestDocumentProgress.objects.filter(task=self.task).count(), len(data['documents']))
+        response = self.client.get(reverse('api:ner-quest-read-api', kwargs={'quest_pk': self.task.pk}))
+        self.assertEqual(json.loads(response.content), data)
+        self.client.logout()
+
+    def test_group_network_snapshot(self):
+        from ..analysis.models import NetworkSnapshot
+        group = Group.objects.create(name='Network Group', stub='network-group')
+        NetworkSnapshot.objects.create(group=group, version=3, data='{"nodes": [], "edges": []}')
+
+        response = self.client.get(reverse('api:group-network', kwargs={'group_pk': group.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'nodes': [], 'edges': []})
+        etag = response['ETag']
+        self.assertEqual(etag, '"{0}-3"'.format(group.pk))
+
+        response = self.client.get(reverse('api:group-network', kwargs={'group_pk': group.pk}),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_group_contributors(self):
+        from django.contrib.auth.models import User
+        from ..common.models import GroupStats
+        from ..task.models import UserQuestRelationship
+
+        group = Group.objects.create(name='Contributors Group', stub='contributors-group')
+        task = Task.objects.create(name='Contributors Quest', kind=Task.QUEST, group=group)
+        for username, completed in (('API-Test-User1', True), ('API-Test-User2', True), ('API-Test-User3', False)):
+            user = User.objects.create_user(username, password='password')
+            UserQuestRelationship.objects.create(task=task, user=user, completed=completed)
+        GroupStats.objects.refresh(group.pk)
+
+        response = self.client.get(reverse('api:ner-quest-contributors-api', kwargs={'group_pk': group.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), [{'username': 'API-Test-User1', 'count': 1},
+                                                                        {'username': 'API-Test-User2', 'count': 1}])
+        self.assertEqual(Group.objects.get(pk=group.pk).total_contributors(), 2)
+
     def test_group_users_bioc(self):
+        from ..common.bioc import BioCReader
         self.create_new_user_accounts(self.user_names)
         # Get one document only (for users to share) (here just use user 0)
         # TODO: this could be improved. Currently using client to login and
@@ -112,6 +162,49 @@ class GroupBioCAPIViews(TestCase, TestBase):
 
         self.client.logout()
 
+    def test_leaderboard_buckets(self):
+        from django.contrib.auth.models import User
+        from django.contrib.contenttypes.models import ContentType
+        from django.core.cache import cache
+        from ..score.models import Point, PointBucket
+
+        task = Task.objects.create(name='Leaderboard Quest')
+        user = User.objects.create_user('API-Test-User1', password='password')
+        for amount in (100, 250):
+            Point.objects.create(user=user, amount=amount,
+                                 content_type=ContentType.objects.get_for_model(task), object_id=task.pk)
+
+        self.assertEqual(PointBucket.objects.get(user=user).amount, 350)
+        PointBucket.objects.rebuild()
+        self.assertEqual(PointBucket.objects.get(user=user).amount, 350)
+
+        cache.clear()
+        response = self.client.get(reverse('api:leaderboard-users', kwargs={'day_window': 1}))
+        self.assertIn({'user': {'pk': user.pk, 'username': user.username}, 'name': user.username, 'score': 350},
+                      json.loads(response.content.decode('utf-8')))
+
+    def test_score_ledger(self):
+        from django.contrib.auth.models import User
+        from django.contrib.contenttypes.models import ContentType
+        from ..score.models import Point, ScoreLedger
+        from ..task.relation.models import RelationAnnotation
+
+        task = Task.objects.create(name='Ledger Quest', kind=Task.QUEST)
+        user = User.objects.create_user('API-Test-User1', password='password')
+        Point.objects.create(user=user, amount=1000, content_type=ContentType.objects.get_for_model(Task),
+                             object_id=task.pk)
+        Point.objects.create(user=user, amount=75, content_type=ContentType.objects.get_for_model(RelationAnnotation),
+                             object_id=1)
+
+        self.assertEqual(user.profile.score(), 1075)
+        self.assertEqual(user.profile.score(task='entity_recognition'), 1000)
+        self.assertEqual(user.profile.score(task='relation'), 75)
+
+        # Reconciling from the Points gives the same ledger
+        ledger = sorted(ScoreLedger.objects.values_list('user', 'content_type', 'category', 'amount'))
+        ScoreLedger.objects.rebuild()
+        self.assertEqual(sorted(ScoreLedger.objects.values_list('user', 'content_type', 'category', 'amount')), ledger)
+
     def test_leaderboard_teams(self):
         self.login_test_user('test_player')
 
@@ -122,6 +215,43 @@ class GroupBioCAPIViews(TestCase, TestBase):
 
         self.client.logout()
 
+    def test_leaderboard_team_scores(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.utils import timezone
+        from ..score.models import PointBucket
+        from ..userprofile.models import Team, UserProfile
+        import mock
+
+        owner = User.objects.create_user('API-Team-Owner')
+        teams = [Team.objects.create(owner=owner, name=name) for name in ('Ataxia', 'Paraplegia')]
+        members = [User.objects.create_user('API-Team-User{0}'.format(idx)) for idx in range(3)]
+        for user, team, amount in zip(members, (teams[0], teams[0], teams[1]), (100, 250, 300)):
+            UserProfile.objects.create(user=user, team=team)
+            PointBucket.objects.add(user.pk, timezone.localtime(timezone.now()).date(), amount)
+
+        # Excluding a member only drops their own points from the team
+        cache.clear()
+        with mock.patch('mark2cure.score.managers.LEADERBOARD_EXCLUDED_USERS', [members[1].pk]):
+            response = self.client.get(reverse('api:leaderboard-teams', kwargs={'day_window': 1}))
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         [{'name': 'Paraplegia', 'score': 300}, {'name': 'Ataxia', 'score': 100}])
+
+    def test_point_save_is_atomic(self):
+        from django.contrib.auth.models import User
+        from django.contrib.contenttypes.models import ContentType
+        from ..score.models import Point, PointBucket, ScoreLedger
+        import mock
+
+        user = User.objects.create_user('API-Test-User1')
+        with mock.patch.object(ScoreLedger.objects, 'add', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Point.objects.create(user=user, amount=100, content_type=ContentType.objects.get_for_model(User))
+
+        # Neither the Point nor its bucket are kept without the ledger
+        self.assertFalse(Point.objects.filter(user=user).exists())
+        self.assertFalse(PointBucket.objects.filter(user=user).exists())
+
 
 class GroupUsersBioC(TestCase, TestBase):
     # (TODO) where did data.json go?
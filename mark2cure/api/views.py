@@ -2,61 +2,48 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.db import connection
 from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 
 from ..document.models import Document, Annotation, View
-from ..task.models import Level, UserQuestRelationship
+from ..task.models import Level, UserQuestRelationship, UserQuestDocumentProgress
 
 from .serializers import QuestSerializer, LeaderboardSerializer, NERGroupSerializer, TeamLeaderboardSerializer, DocumentRelationSerializer
-from ..userprofile.models import Team
 from ..common.models import Group
-from ..analysis.models import Report
+from ..analysis.models import Report, NetworkSnapshot
 from ..task.models import Task
 from ..task.entity_recognition.models import EntityRecognitionAnnotation
 from ..task.relation.models import RelationAnnotation
-from ..score.models import Point
+from ..score.models import PointBucket
+from ..common import sql
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from itertools import chain, groupby
-import networkx as nx
-import datetime
-
-
-_attrs = dict(id='id', source='source', target='target', key='key')
-
-
-def node_link_data(G, attrs=_attrs):
-    multigraph = G.is_multigraph()
-    id_ = attrs['id']
-
-    source = attrs['source']
-    target = attrs['target']
-
-    # Allow 'key' to be omitted from attrs if the graph is not a multigraph.
-    key = None if not multigraph else attrs['key']
-
-    if len(set([source, target, key])) < 3:
-        raise nx.NetworkXError('Attribute names are not unique.')
-
-    data = {}
-    data['directed'] = G.is_directed()
-    data['multigraph'] = multigraph
-    data['graph'] = list(G.graph.items())
-    data['nodes'] = [dict(chain(G.node[n].items(), [(id_, n)])) for n in G]
-    data['edges'] = [dict(chain(d.items(), [(source, u), (target, v), ('id', k)])) for u, v, k, d in G.edges_iter(keys=True, data=True)]  # N1, N2, IDX, ATTRS
-    return data
+from itertools import groupby
+import calendar
 
 
 @api_view(['GET'])
 def group_network(request, group_pk):
-    get_object_or_404(Group, pk=group_pk)
+    group = get_object_or_404(Group, pk=group_pk)
 
-    from ..analysis.tasks import generate_network
-    G = generate_network(group_pk, spring_force=8)
-    d = node_link_data(G)
+    snapshot = NetworkSnapshot.objects.filter(group=group).first()
+    if snapshot is None:
+        from ..analysis.tasks import build_network_snapshot
+        snapshot = build_network_snapshot(group.pk)
 
-    return Response(d)
+    if request.META.get('HTTP_IF_NONE_MATCH') == snapshot.etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.data, content_type='application/json')
+    response['ETag'] = snapshot.etag
+    response['Last-Modified'] = http_date(calendar.timegm(snapshot.built.utctimetuple()))
+    # Revalidated against the ETag, kept out of the site-wide cache so a rebuilt snapshot shows up at once
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
 
 
 @login_required
@@ -147,33 +134,25 @@ def ner_document(request, document_pk):
         No annotations of any kind are included
     """
     get_object_or_404(Document, pk=document_pk)
-    response = Document.objects.as_json(document_pks=[document_pk])
+    response = Document.objects.as_json_cached(document_pks=[document_pk])
     return Response(response[0])
 
 
 @login_required
 @api_view(['GET'])
 def ner_quest_read(request, quest_pk):
-    cmd_str = ""
-    with open('mark2cure/task/entity_recognition/commands/get-quest-progression.sql', 'r') as f:
-        cmd_str = f.read()
-
-    cmd_str = cmd_str.format(task_id=quest_pk, user_id=request.user.pk)
-
-    c = connection.cursor()
-    try:
-        c.execute(cmd_str)
-        queryset = [dict(zip(['pk', 'quest_completed', 'view_count',
-                              'completed', 'had_opponent',
-                              'disease_pub', 'gene_pub', 'drug_pub'], x)) for x in c.fetchall()]
-    finally:
-        c.close()
-
-    documents = Document.objects.as_json(document_pks=[x['pk'] for x in queryset],
-                                         pubtators=[[x['disease_pub'], x['gene_pub'], x['drug_pub']] for x in queryset])
-
-    # Each query does ASC document_pk so we know they're in the same order!
-    documents = [{**queryset[i], **documents[i]} for i in range(len(queryset))]
+    task = get_object_or_404(Task, pk=quest_pk)
+    progress = UserQuestDocumentProgress.objects.progress(task.pk, request.user.pk)
+    documents_json = {doc['pk']: doc for doc in task.documents_json()}
+
+    documents = []
+    for row in progress:
+        if row['document_id'] in documents_json:
+            doc = {'pk': row['document_id'], 'quest_completed': row['quest_completed'],
+                   'view_count': row['view_count'], 'completed': row['completed'],
+                   'had_opponent': row['had_opponent']}
+            doc.update(documents_json[row['document_id']])
+            documents.append(doc)
 
     doc_quest_completed_bools = [d['quest_completed'] for d in documents]
 
@@ -181,9 +160,6 @@ def ner_quest_read(request, quest_pk):
         raise ValueError
 
     for doc in documents:
-        del doc['disease_pub']
-        del doc['gene_pub']
-        del doc['drug_pub']
         del doc['quest_completed']
         doc['completed'] = True if doc['completed'] else False
 
@@ -207,7 +183,7 @@ def re_stats(request):
 @api_view(['GET'])
 def ner_list_item_contributors(request, group_pk):
     group = get_object_or_404(Group, pk=group_pk)
-    return Response([{'username': i[0], 'count': i[1]} for i in group.contributors()])
+    return Response([{'username': username, 'count': count} for username, count in group.contributors()])
 
 
 @api_view(['GET'])
@@ -289,8 +265,8 @@ def ner_list_item(request, group_pk):
 
         'document_count': group.document_count(),
 
-        'total_contributors': 0,
-        'percentage_complete': 0,
+        'total_contributors': group.total_contributors(),
+        'percentage_complete': group.percentage_complete(),
         "complete_percent": 70.66666666666667,
         'current_avg_f_score': 0,
         'start_date': start_date,
@@ -304,18 +280,13 @@ def re_list(request):
     """ Returns the available relation tasks for a specific user
         Accessed through a JSON API endpoint
     """
-    cmd_str = ""
-    with open('mark2cure/api/commands/get-relations.sql', 'r') as f:
-        cmd_str = f.read()
-
     # Start the DB Connection
     c = connection.cursor()
-
-    c.execute('SET @user_work_max = {rel_work_size};'.format(rel_work_size=20))
-    c.execute('SET @k_max = {completions};'.format(completions=settings.ENTITY_RECOGNITION_K))
-    c.execute('SET @user_id = {user_id};'.format(user_id=request.user.pk))
-    c.execute('SET @rel_ann_content_type_id = 56;')
-    c.execute(cmd_str)
+    sql.execute(c, 'api/get-relations', variables={
+        'user_work_max': 20,
+        'k_max': settings.ENTITY_RECOGNITION_K,
+        'user_id': request.user.pk,
+        'rel_ann_content_type_id': 56})
 
     queryset = [{'id': x[0],
                  'document_id': x[1],
@@ -341,56 +312,36 @@ def re_list(request):
 
 
 def users_with_score(days=30):
-    today = datetime.datetime.now()
-    since = today - datetime.timedelta(days=days)
-
-    res = Point.objects.raw("""
-        SELECT  ANY_VALUE(`score_point`.`id`) as `id`,
-                SUM(score_point.amount) as score,
-                `auth_user`.`username`,
-                `auth_user`.`id`
-        FROM `score_point`
-        LEFT OUTER JOIN `auth_user`
-            ON `auth_user`.`id` = `score_point`.`user_id`
-        WHERE ( `score_point`.`created` > '{since}'
-                AND `score_point`.`created` <= '{today}'
-                AND `auth_user`.`id` NOT IN ({excluded_users}) )
-        GROUP BY `auth_user`.`id` ORDER BY score DESC;""".format(
-        since=since,
-        today=today,
-        excluded_users=', '.join('\'' + str(item) + '\'' for item in [5, 160]))
-    )
-
-    return [row for row in res if row.score is not None]
+    return PointBucket.objects.users_with_score(days=days)
 
 
 def get_annotated_teams(days=30):
-    # (TODO) This could be smaller by only being UserProfiles that
-    # we know are part of a Team
-    users_queryset = users_with_score(days=days)
+    return PointBucket.objects.teams_with_score(days=days)
 
-    teams = Team.objects.all()
-    for team in teams:
-        team_user_profile_pks = team.userprofile_set.values_list('pk', flat=True)
-        team.score = sum(filter(None, [row.score for row in filter(lambda x: x.id in team_user_profile_pks, users_queryset)]))
-    teams = list(teams)
-    teams.sort(key=lambda x: x.score, reverse=True)
-    return teams
+
+def leaderboard_cache_key(kind, days):
+    # Windows are whole days, so the key rolls over at midnight
+    return 'leaderboard-{0}-{1}-{2}'.format(kind, days, PointBucket.objects.window_start(days).isoformat())
 
 
 @api_view(['GET'])
 def leaderboard_users(request, day_window):
-    queryset = users_with_score(days=int(day_window))[:25]
-    serializer = LeaderboardSerializer(queryset, many=True)
-    return Response(serializer.data)
+    days = int(day_window)
+    data = cache.get_or_set(
+        leaderboard_cache_key('users', days),
+        lambda: list(LeaderboardSerializer(users_with_score(days=days)[:25], many=True).data),
+        settings.LEADERBOARD_CACHE_TIMEOUT)
+    return Response(data)
 
 
 @api_view(['GET'])
 def leaderboard_teams(request, day_window):
-    queryset = list(get_annotated_teams(days=int(day_window)))[:25]
-    queryset = [team for team in queryset if team.score is not 0]
-    serializer = TeamLeaderboardSerializer(queryset, many=True)
-    return Response(serializer.data)
+    days = int(day_window)
+    data = cache.get_or_set(
+        leaderboard_cache_key('teams', days),
+        lambda: list(TeamLeaderboardSerializer([team for team in get_annotated_teams(days=days) if team.score > 0][:25], many=True).data),
+        settings.LEADERBOARD_CACHE_TIMEOUT)
+    return Response(data)
 
 
 @api_view(['GET'])
@@ -398,18 +349,9 @@ def training(request):
     if request.user.is_anonymous():
         return Response([{"task": "r"}])
 
-    cmd_str = ""
-    with open('mark2cure/training/commands/get-user-training.sql', 'r') as f:
-        cmd_str = f.read()
-    cmd_str = cmd_str.format(user_id=request.user.pk)
-
-    c = connection.cursor()
-    try:
-        c.execute(cmd_str)
-        queryset = [dict(zip(['task_type', 'level', 'last_created',
-                              'completions'], x)) for x in c.fetchall()]
-    finally:
-        c.close()
+    queryset = sql.fetchdicts('training/get-user-training',
+                              ['task_type', 'level', 'last_created', 'completions'],
+                              user_id=request.user.pk)
 
     res = []
     for key, group in groupby(queryset, lambda x: x['task_type']):
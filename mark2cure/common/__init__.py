@@ -4,3 +4,5 @@ from __future__ import absolute_import
 # Django starts so that shared_task will use this app.
 # from .celery import app as celery_app  # noqa
 
+
+default_app_config = 'mark2cure.common.apps.CommonConfig'
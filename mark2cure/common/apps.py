@@ -0,0 +1,13 @@
+from __future__ import unicode_literals
+
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    name = 'mark2cure.common'
+    verbose_name = 'Common'
+
+    def ready(self):
+        # Read and validate every commands/*.sql file once at startup
+        from . import sql
+        sql.load()
@@ -1,28 +1,14 @@
 from raven.contrib.django.raven_compat.models import client
 
-import itertools
-import nltk
-
-
-def pad_split(text):
-    text = text.replace("\\(", " ( ")
-    text = text.replace("\\)", " ) ")
-    text = text.replace("\\.", " . ")
-    text = text.replace("\\,", " , ")
-    text = text.replace("\\%", " % ")
-    text = text.replace("\\#", " # ")
-    text = text.replace("\\&", " & ")
-    text = text.replace("\\+", " + ")
-    text = text.replace("\\=", " = ")
-    text = text.replace("\\[", " [ ")
-    text = text.replace("\\]", " ] ")
-    text = text.replace("\\;", " ; ")
-    text = text.replace("\\/", " / ")
-    text = text.replace("/", " / ")
-    text = text.replace("\\\"", " \" ")
-    text = text.replace("  ", " ")
-    text = text.replace("  ", " ")
-    return nltk.word_tokenize(text.encode('utf-8'))
+from nltk.tokenize import WhitespaceTokenizer
+
+from .tokenizer import pad_split, PAD_SPLIT_VERSION  # noqa
+
+import xml.etree.ElementTree as ET
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+import numpy as np
+import heapq
 
 
 def validate_pubtator(content, document):
@@ -58,6 +44,109 @@ def validate_pubtator(content, document):
         return False
 
 
+def parse_pubtator_annotations(content):
+    """ Extract the passage offsets and annotations from a Pubtator (BioC)
+        response in a single pass over the XML
+
+    Args:
+        content (str): The BioC XML returned from Pubtator
+
+    Returns:
+        tuple: (list of passage offsets, list of (dict)annotations)
+    """
+    root = ET.fromstring(content)
+
+    offsets = []
+    annotations = []
+    for passage_idx, passage in enumerate(root.findall(".//passage")):
+        offsets.append(int(passage.find("./offset").text))
+
+        for annotation in passage.findall("./annotation"):
+            types_list = [infon.text for infon in annotation.findall("./infon[@key='type']")]
+            uids_list = [infon.text for infon in annotation.findall("./infon[@key='identifier']")]
+
+            annotations.append({
+                'passage_idx': passage_idx,
+                'ann_type': types_list[0] if types_list else '',
+                'uid': uids_list[0] if uids_list else None,
+                'start': int(annotation.find('location').attrib['offset']),
+                'text': annotation.find('text').text or ''
+            })
+
+    return offsets, annotations
+
+
+WordOverlay = namedtuple('WordOverlay', ('starts', 'stops', 'words', 'intensity', 'gm_pks', 'user_pks'))
+
+
+def _cover_words(word_starts, annotations):
+    """ Sweep the annotation spans over the (sorted) word start positions
+
+        A word is covered by an annotation if it starts within
+        [start, start + length] of the annotation
+
+    Returns:
+        tuple: (number of covering annotations, pk of the last covering annotation or -1)
+    """
+    counts = np.zeros(len(word_starts) + 1, dtype=np.int32)
+    pks = np.full(len(word_starts), -1, dtype=np.int64)
+
+    spans = []
+    for order, (pk, start, text) in enumerate(annotations):
+        lo = bisect_left(word_starts, start)
+        hi = bisect_right(word_starts, start + len(text))
+        if lo < hi:
+            counts[lo] += 1
+            counts[hi] -= 1
+            spans.append((lo, hi, order, pk))
+    spans.sort()
+
+    # Max heap (by annotation order) of the spans covering the current word
+    active = []
+    span_idx = 0
+    for word_idx in range(len(word_starts)):
+        while span_idx < len(spans) and spans[span_idx][0] <= word_idx:
+            lo, hi, order, pk = spans[span_idx]
+            heapq.heappush(active, (-order, hi, pk))
+            span_idx += 1
+
+        while active and active[0][1] <= word_idx:
+            heapq.heappop(active)
+
+        if active:
+            pks[word_idx] = active[0][2]
+
+    return np.cumsum(counts[:-1]).astype(np.int32), pks
+
+
+def word_overlay(text, gm_anns, user_anns):
+    """ Overlay the GM and user annotations on the words of a text
+
+    Args:
+        text (str): The text to tokenize on whitespace
+        gm_anns (list): (pk, start, text) of the GM annotations
+        user_anns (list): (pk, start, text) of the user annotations
+
+    Returns:
+        WordOverlay: Arrays aligned with the words of the text; intensity is
+            the number of GM annotations covering the word, gm_pks and user_pks
+            are the last covering annotation (-1 if none)
+    """
+    spans = list(WhitespaceTokenizer().span_tokenize(text))
+    word_starts = [span[0] for span in spans]
+
+    intensity, gm_pks = _cover_words(word_starts, gm_anns)
+    user_counts, user_pks = _cover_words(word_starts, user_anns)
+
+    return WordOverlay(
+        starts=np.array(word_starts, dtype=np.int32),
+        stops=np.array([span[1] for span in spans], dtype=np.int32),
+        words=[text[start:stop] for start, stop in spans],
+        intensity=intensity,
+        gm_pks=gm_pks,
+        user_pks=user_pks)
+
+
 # R & S are tuple of (start position, stop position)
 def are_separate(r, s):
     return r[1] < s[0] or s[1] < r[0]
@@ -71,18 +160,41 @@ def is_pubtator_df(df):
     return df['user_id'].isnull().all()
 
 
+# The prefixes Pubtator puts on uids, stripped in the order they were
+# checked: MESH: then OMIM: then CHEBI:
+UID_PREFIX_RE = r'^(?:MESH:)?(?:OMIM:)?(?:CHEBI:)?'
+
+
+def overlapping_rows(df):
+    """ Flag the annotations that overlap an earlier annotation of their document
+
+        The rows are swept in start_position order; a row overlaps if it
+        starts at or before the furthest stop of the rows swept before it,
+        spans being inclusive like are_overlapping
+
+    Returns:
+        Series: bool, aligned with the index of df
+    """
+    spans = df[['document_pk', 'start_position']].copy()
+    spans['stop'] = df['start_position'] + df['length']
+    spans.sort_values(['document_pk', 'start_position'], kind='mergesort', inplace=True)
+
+    furthest_stop = spans.groupby('document_pk')['stop'].cummax()
+    previous_stop = furthest_stop.groupby(spans['document_pk']).shift(1)
+    return (spans['start_position'] <= previous_stop).reindex(df.index)
+
+
 def clean_df(df, overlap_protection=False, allow_duplicates=True):
     """Ensure all manager dataframe generators share a uniform format
 
         This attempts to santize our Annotation Dataframes that may originate
         from multiple sources (users, pubtator) so they're comparable
     """
-    if df.shape[1] is not 11:
+    if df.shape[1] != 11:
         raise ValueError('Incorrect number of dataframe columns.')
 
     # If Pubtator included, make the user_id -1
-    df.fillna(value=-1, inplace=True)
-    df['user_id'] = df['user_id'].astype(int)
+    df['user_id'] = df['user_id'].fillna(-1).astype(int)
 
     # Make all the offsets scoped the the entire document (like Pubtator)
     df.ix[df['offset_relative'], 'start_position'] = df['section_offset'] + df['start_position']
@@ -95,16 +207,13 @@ def clean_df(df, overlap_protection=False, allow_duplicates=True):
     df.dropna(subset=('uid', 'source'), how='any', inplace=True)
 
     # Remove unnecessary prefixes from uids if coming from external sources (via pubtator algos)
-    df.loc[:, 'uid'] = df.loc[:, 'uid'].map(lambda v: v[5:] if v.startswith('MESH:') else v)
-    df.loc[:, 'uid'] = df.loc[:, 'uid'].map(lambda v: v[5:] if v.startswith('OMIM:') else v)
-    df.loc[:, 'uid'] = df.loc[:, 'uid'].map(lambda v: v[6:] if v.startswith('CHEBI:') else v)
+    df.loc[:, 'uid'] = df.loc[:, 'uid'].str.replace(UID_PREFIX_RE, '')
 
     # (TODO) Inspect for , in IDs and duplicate rows
     # (TODO) Is there an ordering to the UIDs?
 
     # (NOTES) After a short inspection, I didn't see an obvious order. -Max 3/2/2016
-    df = df[~df.uid.str.contains(",")]
-    df = df[~df.uid.str.contains("\|")]
+    df = df[~df.uid.str.contains(r'[,|]')]
 
     # We're previously DB Primary Keys
     df.reset_index(inplace=True)
@@ -112,20 +221,7 @@ def clean_df(df, overlap_protection=False, allow_duplicates=True):
     # is_pubtator = is_pubtator_df(df)
     if overlap_protection:
         # Removes any annotations (rows) that have span overlap
-        res = []
-        for index, row in df.iterrows():
-            loc_span = (row['start_position'], row['start_position'] + row['length'])
-            res.append((loc_span, index))
-
-        for x, y in itertools.combinations(res, 2):
-            span_a, span_a_row = x
-            span_b, span_b_row = y
-            if are_overlapping(span_a, span_b):
-                try:
-                    # (TODO) Figure out why this fails sometimes...
-                    df.drop(span_b_row, inplace=True)
-                except:
-                    pass
+        df = df[~overlapping_rows(df)]
 
     if not allow_duplicates:
         df.drop_duplicates(['uid', 'ann_type_idx', 'text'], inplace=True)
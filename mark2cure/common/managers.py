@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+import json
+
+
+class GroupStatsManager(models.Manager):
+
+    def refresh(self, group_pk: int):
+        """Recompute the statistics of a group with aggregate queries and
+            replace the stored snapshot
+
+        Args:
+            group_pk (int): The Group
+
+        Returns:
+            GroupStats
+        """
+        from ..document.models import Annotation
+        from ..task.models import Task, UserQuestRelationship
+
+        completed_uqrs = UserQuestRelationship.objects.filter(task__group_id=group_pk, completed=True)
+
+        # Completed quests per username, most contributions first
+        contributors = [[row['user__username'], row['count']] for row in completed_uqrs.values('user__username').annotate(
+            count=Count('pk')).order_by('-count', 'user__username')]
+
+        completed = completed_uqrs.count()
+        required = Task.objects.filter(group_id=group_pk).aggregate(required=Sum('completions'))['required'] or 0
+
+        annotation_count = Annotation.objects.filter(
+            view__userquestrelationship__task__group_id=group_pk).values('pk').distinct().count()
+
+        stats, created = self.update_or_create(group_id=group_pk, defaults={
+            'contributors': json.dumps(contributors),
+            'total_contributors': len(contributors),
+            'annotation_count': annotation_count,
+            'completed': completed,
+            'required': required,
+            'updated': timezone.now()})
+        return stats
+
+    def snapshot(self, group_pk: int):
+        """The stored statistics of a group, computed on first access
+
+        Returns:
+            GroupStats
+        """
+        stats = self.filter(group_id=group_pk).first()
+        if stats:
+            return stats
+        return self.refresh(group_pk)
+
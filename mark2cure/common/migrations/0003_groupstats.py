@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_auto_20151130_0410'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contributors', models.TextField(default='[]')),
+                ('total_contributors', models.IntegerField(default=0)),
+                ('annotation_count', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('required', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='group_stats', to='common.Group')),
+            ],
+        ),
+    ]
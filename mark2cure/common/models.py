@@ -2,13 +2,14 @@ from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
 
-from ..document.models import Document, View, Annotation
-from ..task.models import DocumentQuestRelationship, Task, UserQuestRelationship
+from ..document.models import Document
+from ..task.models import DocumentQuestRelationship, Task
+from .managers import GroupStatsManager
 
 from decimal import Decimal
 
 import random
-from collections import Counter
+import json
 
 from allauth.account.signals import user_signed_up
 from django.dispatch import receiver
@@ -54,33 +55,21 @@ class Group(models.Model):
         dqr_count = len(DocumentQuestRelationship.objects.filter(task__group=self))
         return dqr_count
 
+    def stats(self):
+        """The GroupStats snapshot, refreshed whenever a quest of the group is completed"""
+        return GroupStats.objects.snapshot(self.pk)
+
     def contributors(self):
-        # (TODO) have this return a query set of User models
-        """returns a user name list for the group"""
-        uqrs = UserQuestRelationship.objects.filter(task__group=self)
-        username_list = []
-        for uqr in uqrs:
-            if uqr.completed:
-                # (TODO) not sure if this is the fastest approach
-                username_list.append(str.encode(str(uqr.user.username)))
-        counter = Counter(username_list)
-        return counter.most_common()
+        """returns (username, completed quests) for the group, most first"""
+        return [tuple(x) for x in self.stats().contributors_list()]
 
     def total_contributors(self):
-        """returns a user name list for the group"""
-        uqrs = UserQuestRelationship.objects.filter(task__group=self)
-        username_list = []
-        for uqr in uqrs:
-            if uqr.completed:
-                # (TODO) not sure if this is the best approach:
-                username_list.append(str.encode(str(uqr.user.username)))
-        total_contributors = len(set(username_list))
-        return total_contributors
+        """returns the number of distinct users who completed a quest of the group"""
+        return self.stats().total_contributors
 
     def total_annotation_count(self):
         # (TODO) make work with multiple annotation types
-        uqrs = UserQuestRelationship.objects.filter(task__group=self)
-        return Annotation.objects.filter(view=View.objects.filter(userquestrelationship=uqrs)).count()
+        return self.stats().annotation_count
 
     # def current_avg_f(self, weighted=True):
     #     report_qs = self.report_set.filter(report_type=1).order_by('-created')
@@ -102,19 +91,7 @@ class Group(models.Model):
     #         return 0.0
 
     def percentage_complete(self):
-        task_queryset = self.task_set.extra(select={
-            "completed": """
-                SELECT COUNT(*) AS completed
-                FROM task_userquestrelationship
-                WHERE (task_userquestrelationship.completed = 1
-                    AND task_userquestrelationship.task_id = task_task.id)"""
-        })
-        completed = sum([x for x in task_queryset.values_list('completed', flat=True) if x is not None])
-        required = sum([x for x in task_queryset.values_list('completions', flat=True) if x is not None])
-        if required:
-            return (Decimal(completed) / Decimal(required)) * 100
-        else:
-            return 0
+        return self.stats().percentage_complete()
 
     def pubtator_coverage(self):
         """Return back a float representing the amount of documents contained within the ER Group
@@ -165,6 +142,41 @@ class Group(models.Model):
         return self.name
 
 
+class GroupStats(models.Model):
+    """Aggregate statistics of a Group, stored so listing the groups and
+        their contributors doesn't query every UserQuestRelationship
+    """
+    group = models.OneToOneField(Group, related_name='group_stats')
+
+    # JSON list of [username, completed quests]
+    contributors = models.TextField(default='[]')
+    total_contributors = models.IntegerField(default=0)
+    annotation_count = models.IntegerField(default=0)
+
+    # Completed UserQuestRelationships and the completions required by the Tasks
+    completed = models.IntegerField(default=0)
+    required = models.IntegerField(default=0)
+
+    updated = models.DateTimeField(default=timezone.now)
+
+    objects = GroupStatsManager()
+
+    class Meta:
+        app_label = 'common'
+
+    def contributors_list(self):
+        return json.loads(self.contributors)
+
+    def percentage_complete(self):
+        if self.required:
+            return (Decimal(self.completed) / Decimal(self.required)) * 100
+        else:
+            return 0
+
+    def __unicode__(self):
+        return u'Stats for {0}'.format(self.group_id)
+
+
 class SupportMessage(models.Model):
     user = models.ForeignKey(User, blank=True, null=True)
     text = models.TextField()
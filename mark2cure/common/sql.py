@@ -0,0 +1,121 @@
+from django.db import connection
+
+from collections import namedtuple
+import glob
+import os
+import re
+
+
+COMMANDS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAM_RE = re.compile(r'%\((\w+)\)s')
+STRAY_RE = re.compile(r'%(?!\(\w+\)s|%)|\{\w*\}')
+
+SQLCommand = namedtuple('SQLCommand', ['name', 'sql', 'params'])
+
+_commands = {}
+
+
+def command_name(path: str) -> str:
+    """Registry key for a commands/*.sql file, e.g.
+        mark2cure/task/relation/commands/get-relation-ann-exists.sql -> task/relation/get-relation-ann-exists
+    """
+    rel_path = os.path.relpath(path, COMMANDS_ROOT)
+    return os.path.splitext(rel_path.replace('{0}commands{0}'.format(os.sep), os.sep))[0].replace(os.sep, '/')
+
+
+def parse_command(name: str, sql: str) -> SQLCommand:
+    """Validate a SQL command and collect its named parameters
+
+    Commands use DB-API pyformat placeholders (%(name)s) and never
+    python formatting, so values are always bound by the database driver.
+    """
+    stray = STRAY_RE.search(sql)
+    if stray:
+        raise ValueError('SQL command {0} has an unbound placeholder: {1}'.format(name, stray.group(0)))
+    return SQLCommand(name=name, sql=sql, params=frozenset(PARAM_RE.findall(sql)))
+
+
+def load(force=False):
+    """Read every commands/*.sql file into memory, once"""
+    if _commands and not force:
+        return _commands
+
+    commands = {}
+    for path in glob.glob(os.path.join(COMMANDS_ROOT, '**', 'commands', '*.sql'), recursive=True):
+        name = command_name(path)
+        with open(path, 'r') as f:
+            commands[name] = parse_command(name, f.read())
+
+    _commands.clear()
+    _commands.update(commands)
+    return _commands
+
+
+def get(name: str) -> SQLCommand:
+    return load()[name]
+
+
+def prepare(name: str, **params):
+    """Bind parameters to a registered command
+
+    List and tuple values are expanded into one placeholder per item so they
+    can be used in IN clauses; an empty list expands to NULL which matches nothing.
+
+    Returns:
+        tuple: (sql, params) ready for cursor.execute
+    """
+    command = get(name)
+
+    missing = command.params - set(params)
+    if missing:
+        raise ValueError('SQL command {0} is missing parameters: {1}'.format(name, ', '.join(sorted(missing))))
+
+    sql = command.sql
+    bound = {}
+    for key in command.params:
+        value = params[key]
+        if isinstance(value, (list, tuple, set, frozenset)):
+            value = list(value)
+            if len(value):
+                keys = ['{0}__{1}'.format(key, idx) for idx in range(len(value))]
+                bound.update(zip(keys, value))
+                sql = sql.replace('%({0})s'.format(key), ', '.join(['%({0})s'.format(k) for k in keys]))
+            else:
+                sql = sql.replace('%({0})s'.format(key), 'NULL')
+        else:
+            bound[key] = value
+
+    return sql, bound
+
+
+def execute(cursor, name: str, variables=None, **params):
+    """Execute a registered command on an open cursor
+
+    Args:
+        cursor: Database cursor, the caller is responsible for closing it
+        name (str): Registry key of the command
+        variables (dict): MySQL session @variables to SET before the command
+
+    Returns:
+        cursor
+    """
+    if variables:
+        cursor.execute('SET {0};'.format(', '.join(['@{0} = %({0})s'.format(key) for key in sorted(variables)])), variables)
+
+    sql, bound = prepare(name, **params)
+    cursor.execute(sql, bound)
+    return cursor
+
+
+def fetchall(name: str, variables=None, **params):
+    """Execute a registered command and return all of its rows"""
+    c = connection.cursor()
+    try:
+        return execute(c, name, variables, **params).fetchall()
+    finally:
+        c.close()
+
+
+def fetchdicts(name: str, columns, variables=None, **params):
+    """Execute a registered command and zip each row with the given column names"""
+    return [dict(zip(columns, x)) for x in fetchall(name, variables, **params)]
@@ -98,3 +98,99 @@ class QuestViews(TestCase, TestBase):
 
     def test_quest_submit(self):
         pass
+
+
+class SQLCommands(TestCase):
+
+    def test_commands_loaded(self):
+        from . import sql
+        commands = sql.load()
+        self.assertIn('document/get-documents', commands)
+        self.assertEqual(commands['document/get-documents'].params, frozenset(['document_pks']))
+
+    def test_prepare_expands_lists(self):
+        from . import sql
+        cmd_str, params = sql.prepare('document/get-ner-results', content_type_id=1,
+                                      document_pks=[5, 6], all_users=False, user_pks=[])
+        self.assertIn('IN (%(document_pks__0)s, %(document_pks__1)s)', cmd_str)
+        self.assertIn('IN (NULL)', cmd_str)
+        self.assertEqual(params, {'content_type_id': 1, 'all_users': False,
+                                  'document_pks__0': 5, 'document_pks__1': 6})
+
+        with self.assertRaises(ValueError):
+            sql.prepare('document/get-documents')
+
+    def test_unbound_placeholder(self):
+        from . import sql
+        with self.assertRaises(ValueError):
+            sql.parse_command('bad', 'SELECT * FROM `task_level` WHERE `user_id` = {user_id}')
+
+
+def _legacy_pad(text):
+    # The replace chain pad_split ran before the single pass tokenizer
+    for old, new in (("\\(", " ( "), ("\\)", " ) "), ("\\.", " . "), ("\\,", " , "),
+                     ("\\%", " % "), ("\\#", " # "), ("\\&", " & "), ("\\+", " + "),
+                     ("\\=", " = "), ("\\[", " [ "), ("\\]", " ] "), ("\\;", " ; "),
+                     ("\\/", " / "), ("/", " / "), ("\\\"", " \" "), ("  ", " "), ("  ", " ")):
+        text = text.replace(old, new)
+    return text
+
+
+class PadSplitTokenizer(TestCase):
+
+    texts = [
+        'Spinocerebellar ataxia type 2 (SCA2) and/or type 3',
+        'Escaped \\(parens\\) \\[brackets\\] 5\\% \\#1 A\\&B x\\+y\\=z a\\;b',
+        'Slashes a/b a\\/b a\\\\/b //  spaced    out   text',
+        'Quotes \\"quoted\\" and "plain" text. Second sentence.',
+        '',
+    ]
+
+    def test_pad_matches_replace_chain(self):
+        from .tokenizer import pad
+        for text in self.texts:
+            self.assertEqual(pad(text), _legacy_pad(text))
+
+    def test_pad_split_matches_word_tokenize(self):
+        import nltk
+        from .tokenizer import pad_split, pad_join_many
+        for text in self.texts:
+            self.assertEqual(pad_split(text), nltk.word_tokenize(_legacy_pad(text)))
+
+        self.assertEqual(pad_join_many(self.texts, workers=2),
+                         [' '.join(nltk.word_tokenize(_legacy_pad(text))) for text in self.texts])
+
+
+class CleanDataFrame(TestCase):
+
+    def er_df(self, rows):
+        import pandas as pd
+        from ..document.managers import NER_DF_COLUMNS
+        return pd.DataFrame([(uid, 'db', None, 0, 'text', document_pk, 1, 0, False, start, length)
+                             for uid, document_pk, start, length in rows], columns=NER_DF_COLUMNS)
+
+    def test_uid_prefixes(self):
+        from .formatter import clean_df
+        df = clean_df(self.er_df([('MESH:D001', 1, 0, 4), ('OMIM:1234', 1, 10, 4), ('CHEBI:55', 1, 20, 4),
+                                  ('D002', 1, 30, 4), ('D003,D004', 1, 40, 4), ('D005|D006', 1, 50, 4)]))
+        self.assertEqual(list(df['uid']), ['D001', '1234', '55', 'D002'])
+        self.assertEqual(list(df['user_id']), [-1] * 4)
+
+    def test_overlap_protection(self):
+        from .formatter import clean_df, are_overlapping
+        import itertools
+        import random
+
+        rows = [('D{0}'.format(idx), random.choice([1, 2]), random.randint(0, 80), random.randint(0, 8)) for idx in range(60)]
+        df = clean_df(self.er_df(rows), overlap_protection=True)
+
+        # Pairwise reference: drop a row if it overlaps an earlier row of its document
+        ref = clean_df(self.er_df(rows))
+        dropped = set()
+        for (a_idx, a), (b_idx, b) in itertools.combinations(ref.iterrows(), 2):
+            if a['document_pk'] == b['document_pk'] and are_overlapping(
+                    (a['start_position'], a['start_position'] + a['length']),
+                    (b['start_position'], b['start_position'] + b['length'])):
+                dropped.add(b_idx)
+
+        self.assertEqual(list(df.index), [idx for idx in ref.index if idx not in dropped])
@@ -0,0 +1,82 @@
+'''
+    The padding tokenizer applied to every title and abstract. Escaped
+    punctuation and slashes are padded with spaces in a single regex pass
+    and the text is split with NLTK's word tokenizer, loaded once per process.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import multiprocessing
+import os
+import re
+
+# Bump whenever the pad_split rules change, Sections padded under an
+# older version are re-padded by the corpus health sweep
+PAD_SPLIT_VERSION = 1
+
+# A backslash escaped ( ) . , % # & + = [ ] ; / " or any slash
+PAD_RE = re.compile(r'\\[()\.,%#&+=\[\];/"]|/')
+SPACES_RE = re.compile(r' {2,}')
+
+_tokenizers = None
+
+
+def _pad_match(match):
+    token = match.group(0)
+    if token == '\\/':
+        # The escaped slash is padded, then padded again as a slash
+        return '  /  '
+    return ' {0} '.format(token[-1])
+
+
+def _collapse_spaces(match):
+    # Two passes of replace('  ', ' ') leave ceil(n / 4) of n spaces
+    return ' ' * ((len(match.group(0)) + 3) // 4)
+
+
+def pad(text: str) -> str:
+    """The padded text, before tokenizing"""
+    return SPACES_RE.sub(_collapse_spaces, PAD_RE.sub(_pad_match, text))
+
+
+def tokenizers():
+    """The (sentence, word) tokenizers nltk.word_tokenize uses, loaded once"""
+    global _tokenizers
+    if _tokenizers is None:
+        import nltk
+        from nltk.tokenize import _treebank_word_tokenizer
+        _tokenizers = (nltk.data.load('tokenizers/punkt/english.pickle'), _treebank_word_tokenizer)
+    return _tokenizers
+
+
+def pad_split(text: str) -> List[str]:
+    """Pad and tokenize the text
+
+    Returns:
+        list: The tokens, the same as nltk.word_tokenize(padded text)
+    """
+    sentence_tokenizer, word_tokenizer = tokenizers()
+    return [token for sentence in sentence_tokenizer.tokenize(pad(text))
+            for token in word_tokenizer.tokenize(sentence)]
+
+
+def pad_join(text: str) -> str:
+    """The padded text as it is stored on a Section"""
+    return ' '.join(pad_split(text))
+
+
+def pad_join_many(texts: List[str], workers=None) -> List[str]:
+    """pad_join a batch of texts across a process pool
+
+        Celery's prefork workers are daemonic and can't start child
+        processes, so they tokenize in process instead
+
+    Returns:
+        list: The padded texts, in the order given
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) < 2 or multiprocessing.current_process().daemon:
+        return [pad_join(text) for text in texts]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(pad_join, texts, chunksize=max(1, len(texts) // (workers * 4))))
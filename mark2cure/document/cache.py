@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Dict
+
+
+class LRUBackend(object):
+    """In process least recently used cache, shared by the threads of a worker
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+        return found
+
+    def set_many(self, data):
+        with self._lock:
+            for key, value in data.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend(object):
+    """Any of the configured Django caches, shared between workers
+    """
+
+    def __init__(self, alias='default', timeout=60 * 60 * 24):
+        self.alias = alias
+        self.timeout = timeout
+
+    def get_many(self, keys):
+        return caches[self.alias].get_many(keys)
+
+    def set_many(self, data):
+        caches[self.alias].set_many(data, self.timeout)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+class DocumentJSONCache(object):
+    """Tiered cache of (dict)Documents from DocumentManager.as_json
+
+        Entries are keyed by the Document pk and its revision so any change
+        to the Sections or Pubtator content (which bumps Document.revision)
+        is never served stale. Backends are checked in order and the faster
+        ones are back filled from the slower ones.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    @staticmethod
+    def key(document_pk: int, revision: int, include_pubtator: bool) -> str:
+        return 'document-json-{0}-{1}-{2}'.format(document_pk, revision, 'p' if include_pubtator else 'n')
+
+    def get_many(self, document_pks: List[int], include_pubtator=False) -> List[Dict]:
+        """Bulk get the (dict)Documents, building any that are missing
+
+        Args:
+            documents_pks (list): The selection of JSON Documents to return
+            include_pubtator (bool): Include the pre-extracted Pubtator annotations
+
+        Returns:
+            list: The list of (dict)Documents, ordered by pk
+        """
+        from .models import Document
+
+        revisions = dict(Document.objects.filter(pk__in=document_pks).values_list('pk', 'revision'))
+        keys = {document_pk: self.key(document_pk, revision, include_pubtator) for document_pk, revision in revisions.items()}
+
+        found = {}
+        missing = set(keys.values())
+        for backend_idx, backend in enumerate(self.backends):
+            if not missing:
+                break
+            hits = backend.get_many(list(missing))
+            if hits:
+                for faster_backend in self.backends[:backend_idx]:
+                    faster_backend.set_many(hits)
+                found.update(hits)
+                missing -= set(hits)
+
+        if missing:
+            built = {keys[doc['pk']]: doc for doc in Document.objects.as_json(
+                document_pks=[pk for pk, key in keys.items() if key in missing],
+                include_pubtator=include_pubtator)}
+            for backend in self.backends:
+                backend.set_many(built)
+            found.update(built)
+
+        return [found[keys[document_pk]] for document_pk in sorted(keys) if keys[document_pk] in found]
+
+
+document_json_cache = DocumentJSONCache([
+    LRUBackend(maxsize=getattr(settings, 'DOCUMENT_JSON_CACHE_SIZE', 1000)),
+    DjangoCacheBackend(alias=getattr(settings, 'DOCUMENT_JSON_CACHE_ALIAS', 'default'))
+])
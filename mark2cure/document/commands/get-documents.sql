@@ -9,5 +9,5 @@ FROM `document_document`
 LEFT JOIN `document_section`
     ON `document_section`.`document_id` = `document_document`.`id`
 
-WHERE `document_document`.`id` IN ({0})
-ORDER BY `document_document`.`id` ASC
+WHERE `document_document`.`id` IN (%(document_pks)s)
+ORDER BY `document_document`.`id` ASC, `document_section`.`id` ASC
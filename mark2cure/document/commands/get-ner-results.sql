@@ -12,7 +12,7 @@ FROM `entity_recognition_entityrecognitionannotation`
 
 INNER JOIN `document_annotation`
     ON `document_annotation`.`object_id` = `entity_recognition_entityrecognitionannotation`.`id`
-      AND `document_annotation`.`content_type_id` = {content_type_pk}
+      AND `document_annotation`.`content_type_id` = %(content_type_id)s
 
 INNER JOIN `document_view`
     ON `document_annotation`.`view_id` = `document_view`.`id`
@@ -23,6 +23,5 @@ INNER JOIN `document_section`
 INNER JOIN `document_document`
     ON `document_document`.`id` = `document_section`.`document_id`
 
-{filter_doc_level}
-
-{filter_user_level}
+WHERE `document_section`.`document_id` IN (%(document_pks)s)
+  AND (%(all_users)s OR `document_view`.`user_id` IN (%(user_pks)s))
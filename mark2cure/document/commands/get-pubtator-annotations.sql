@@ -0,0 +1,15 @@
+SELECT  `document_pubtatorannotation`.`document_id`,
+        `document_pubtatorannotation`.`section_id`,
+        `document_pubtatorannotation`.`section_offset`,
+        `document_pubtatorannotation`.`ann_type`,
+        `document_pubtatorannotation`.`uid`,
+        `document_pubtatorannotation`.`start`,
+        `document_pubtatorannotation`.`text`
+
+FROM `document_pubtatorannotation`
+
+WHERE `document_pubtatorannotation`.`document_id` IN (%(document_pks)s)
+  AND `document_pubtatorannotation`.`ann_type` IN ('Disease', 'Gene', 'Chemical')
+
+ORDER BY `document_pubtatorannotation`.`document_id` ASC,
+         `document_pubtatorannotation`.`start` ASC
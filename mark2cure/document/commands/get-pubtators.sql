@@ -8,6 +8,6 @@ JOIN `document_section`
     ON `document_section`.`document_id` = `document_pubtator`.`document_id`
 
 WHERE `document_pubtator`.`content` != ''
-  AND `document_pubtator`.`document_id` IN ({0})
+  AND `document_pubtator`.`document_id` IN (%(document_pks)s)
 
 GROUP BY `document_pubtator`.`document_id`;
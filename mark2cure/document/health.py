@@ -0,0 +1,87 @@
+'''
+    Corpus health sweep. Finds the Documents missing their content with a
+    single annotated query and re-pads, a batch at a time, only the Sections
+    padded under an older PAD_SPLIT_VERSION. Progress lives on the Sections
+    themselves, so an interrupted sweep resumes where it stopped.
+'''
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models.functions import Coalesce
+
+from ..common.tokenizer import pad_join_many, PAD_SPLIT_VERSION
+from .models import Document, Pubtator, Section
+from . import pubtator as scheduler
+
+from typing import List, Dict
+import logging
+logger = logging.getLogger(__name__)
+
+# Sections re-padded per batch and batches per sweep
+REPAD_BATCH_SIZE = 500
+REPAD_MAX_BATCHES = 20
+
+
+def underpopulated_pmids() -> List[int]:
+    """PMIDs of the Documents with fewer than 2 available (non overview) Sections,
+        including those without any Section
+    """
+    return list(Document.objects.annotate(available=Coalesce(Sum(Case(
+        When(section__kind__in=['t', 'a', 'p', 'f'], then=1),
+        default=0, output_field=IntegerField())), 0)).filter(available__lt=2).order_by(
+        'document_id').values_list('document_id', flat=True))
+
+
+def repad_batch(batch_size=REPAD_BATCH_SIZE) -> Dict:
+    """Re-pad the next batch of Sections padded under an older rule
+
+        Documents whose text changed have their Pubtators removed and
+        recreated so the scheduler submits the new text
+
+    Returns:
+        dict: Counts of the Sections checked and changed
+    """
+    sections = list(Section.objects.filter(padding_version__lt=PAD_SPLIT_VERSION).exclude(kind='o').order_by(
+        'pk').values_list('pk', 'document_id', 'text')[:batch_size])
+
+    padded_texts = pad_join_many([text for section_pk, document_pk, text in sections])
+
+    changed_document_pks = set()
+    with transaction.atomic():
+        for (section_pk, document_pk, text), padded in zip(sections, padded_texts):
+            if text != padded:
+                Section.objects.filter(pk=section_pk).update(text=padded)
+                changed_document_pks.add(document_pk)
+
+        Section.objects.filter(pk__in=[section_pk for section_pk, document_pk, text in sections]).update(
+            padding_version=PAD_SPLIT_VERSION)
+
+        if changed_document_pks:
+            Document.objects.filter(pk__in=list(changed_document_pks)).update(revision=F('revision') + 1)
+            Pubtator.objects.filter(document_id__in=list(changed_document_pks)).delete()
+
+    if changed_document_pks:
+        scheduler.ensure_pubtators(list(changed_document_pks))
+
+    return {'checked': len(sections), 'changed': len(changed_document_pks)}
+
+
+def sweep(batch_size=REPAD_BATCH_SIZE, max_batches=REPAD_MAX_BATCHES) -> Dict:
+    """One pass of the health checks, bounded to max_batches of re-padding
+        so a large backlog is spread over several runs
+
+    Returns:
+        dict: The PMIDs to fetch again and the re-padding counts
+    """
+    counts = {'checked': 0, 'changed': 0}
+    for batch_idx in range(max_batches):
+        batch = repad_batch(batch_size=batch_size)
+        counts['checked'] += batch['checked']
+        counts['changed'] += batch['changed']
+        if batch['checked'] < batch_size:
+            break
+
+    counts['refetch'] = underpopulated_pmids()
+    logger.info('Corpus health: %s sections checked, %s documents re-padded, %s to fetch',
+                counts['checked'], counts['changed'], len(counts['refetch']))
+    return counts
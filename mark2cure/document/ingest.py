@@ -0,0 +1,176 @@
+'''
+    Loads PubMed records into Documents and Sections. PMIDs are fetched from
+    Entrez in batches on a few threads, the MEDLINE records are padded in a
+    process pool and the Documents and Sections are written with bulk queries.
+'''
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from ..common.tokenizer import pad_join, PAD_SPLIT_VERSION
+from .models import Document, Section
+from . import pubtator as scheduler
+
+from Bio import Entrez, Medline
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict
+import multiprocessing
+import logging
+import os
+logger = logging.getLogger(__name__)
+
+# PMIDs per efetch request
+EFETCH_BATCH_SIZE = 200
+# efetch requests in flight, NCBI allows 3 per second without an API key
+FETCH_WORKERS = 3
+
+
+class EntrezClient(object):
+    """Fetches MEDLINE records from NCBI"""
+
+    def __init__(self, email=None):
+        self.email = email or settings.ENTREZ_EMAIL
+
+    def efetch(self, pmids: List[str]) -> List[Dict]:
+        Entrez.email = self.email
+        handle = Entrez.efetch(db='pubmed', id=pmids, rettype='medline', retmode='text')
+        try:
+            return list(Medline.parse(handle))
+        finally:
+            handle.close()
+
+
+def fetch_records(pmids: List[str], client=None, batch_size=EFETCH_BATCH_SIZE, workers=FETCH_WORKERS) -> List[Dict]:
+    """Fetch the MEDLINE records of the PMIDs, batch_size per request
+
+    Returns:
+        list: The (dict)Records in the order of the batches
+    """
+    client = client or EntrezClient()
+    batches = [pmids[idx:idx + batch_size] for idx in range(0, len(pmids), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as executor:
+        return [record for records in executor.map(client.efetch, batches) for record in records]
+
+
+def parse_record(record: Dict):
+    """The padded title and abstract of a MEDLINE record
+
+    Reference to abbreviations: http://www.nlm.nih.gov/bsd/mms/medlineelements.html
+
+    Returns:
+        tuple: (pmid, title, abstract), None if the record is incomplete
+    """
+    if record.get('TI') and record.get('AB') and record.get('PMID') and record.get('CRDT'):
+        return (record.get('PMID'),
+                pad_join(record.get('TI')),
+                pad_join(record.get('AB')))
+    return None
+
+
+def parse_records(records: List[Dict], workers=None) -> List[tuple]:
+    """Run parse_record over the records in a process pool
+
+        Celery's prefork workers are daemonic and can't start child
+        processes, so they parse in process instead
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(records) < 2 or multiprocessing.current_process().daemon:
+        parsed = map(parse_record, records)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_record, records, chunksize=max(1, len(records) // (workers * 4))))
+    return [x for x in parsed if x is not None]
+
+
+def upsert_documents(parsed: List[tuple], source='pubmed') -> List[int]:
+    """Create or update the Documents and their title and abstract Sections
+        with a fixed number of queries per call
+
+    Args:
+        parsed (list): (pmid, title, abstract) from parse_record
+        source (str): The source recorded on the Documents
+
+    Returns:
+        list: The Document pks, in the order of parsed
+    """
+    # The last record of a PMID wins, like saving them one after the other
+    records = dict((int(pmid), (title, abstract)) for pmid, title, abstract in parsed)
+    if not records:
+        return []
+
+    with transaction.atomic():
+        document_pks = {}
+        documents = {}
+        for pk, pmid, title, doc_source in Document.objects.filter(document_id__in=list(records)).order_by('pk').values_list(
+                'pk', 'document_id', 'title', 'source'):
+            document_pks.setdefault(pmid, pk)
+            documents.setdefault(pk, (title, doc_source))
+
+        Document.objects.bulk_create([Document(document_id=pmid, title=title, source=source)
+                                      for pmid, (title, abstract) in records.items() if pmid not in document_pks], batch_size=500)
+        # bulk_create doesn't return the pks on MySQL
+        for pk, pmid in Document.objects.filter(document_id__in=[pmid for pmid in records if pmid not in document_pks]).order_by(
+                'pk').values_list('pk', 'document_id'):
+            document_pks.setdefault(pmid, pk)
+
+        for pmid, (title, abstract) in records.items():
+            pk = document_pks[pmid]
+            if pk in documents and documents[pk] != (title, source):
+                Document.objects.filter(pk=pk).update(title=title, source=source)
+
+        # Title and Abstract Sections, keeping the first of each kind like get_or_create
+        sections = {}
+        for pk, document_pk, kind, text in Section.objects.filter(
+                document_id__in=list(document_pks.values()), kind__in=['t', 'a']).order_by('pk').values_list(
+                'pk', 'document_id', 'kind', 'text'):
+            sections.setdefault((document_pk, kind), (pk, text))
+
+        new_sections = []
+        changed_document_pks = set()
+        for pmid, (title, abstract) in records.items():
+            document_pk = document_pks[pmid]
+            for kind, text in (('t', title), ('a', abstract)):
+                if (document_pk, kind) not in sections:
+                    new_sections.append(Section(document_id=document_pk, kind=kind, text=text, padding_version=PAD_SPLIT_VERSION))
+                    changed_document_pks.add(document_pk)
+                elif sections[(document_pk, kind)][1] != text:
+                    Section.objects.filter(pk=sections[(document_pk, kind)][0]).update(text=text, padding_version=PAD_SPLIT_VERSION)
+                    changed_document_pks.add(document_pk)
+
+        # Title before abstract for every Document, Sections are read back in pk order
+        Section.objects.bulk_create(new_sections, batch_size=500)
+
+        # Section.save isn't called by the bulk queries
+        Document.objects.filter(pk__in=list(changed_document_pks)).update(revision=F('revision') + 1)
+
+    return list(dict.fromkeys(document_pks[int(pmid)] for pmid, title, abstract in parsed))
+
+
+def ingest_pmids(pmids, source='pubmed', include_pubtator=True, client=None, pubtator_client=None,
+                 batch_size=EFETCH_BATCH_SIZE, fetch_workers=FETCH_WORKERS, parse_workers=None) -> List[int]:
+    """Fetch, pad and store the PubMed articles
+
+    Args:
+        pmids (list): The PMIDs to load
+        source (str): The source recorded on the Documents
+        include_pubtator (bool): Create and submit the Pubtator requests for the Documents
+        client (EntrezClient): efetch client, a local stand-in in tests
+        pubtator_client (PubtatorClient): tmTool client
+
+    Returns:
+        list: The pks of the loaded Documents
+    """
+    pmids = list(dict.fromkeys(str(pmid) for pmid in pmids))
+    records = fetch_records(pmids, client=client, batch_size=batch_size, workers=fetch_workers)
+    document_pks = upsert_documents(parse_records(records, workers=parse_workers), source=source)
+    logger.info('Ingested %s of %s PMIDs', len(document_pks), len(pmids))
+
+    if include_pubtator and document_pks:
+        scheduler.ensure_pubtators(document_pks)
+        scheduler.submit_pubtators(pubtator_client or scheduler.PubtatorClient(),
+                                   scheduler.pending_pubtator_pks(document_pks))
+
+    return document_pks
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from mark2cure.document.managers import NERFrameBuilder, NER_DF_COLUMNS
+
+import pandas as pd
+import random
+import time
+
+
+def _legacy_row(uid, source='db', user_id=None,
+                ann_type_idx=0, text='',
+                document_pk=0, section_id=0, section_offset=0, offset_relative=True,
+                start_position=0, length=0):
+    # The dict per row ner_df used before NERFrameBuilder
+    return {
+        'uid': str(uid), 'source': str(source), 'user_id': int(user_id) if user_id else None,
+        'ann_type_idx': int(ann_type_idx), 'text': str(text),
+        'document_pk': int(document_pk), 'section_id': int(section_id), 'section_offset': int(section_offset), 'offset_relative': bool(offset_relative),
+        'start_position': int(start_position), 'length': int(length)
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare the build time and memory of the legacy and typed ner_df frames'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000)
+        parser.add_argument('--documents', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        texts = ['text-{0}'.format(x) for x in range(2000)]
+        rows = [dict(uid=idx, source='db', user_id=random.randint(1, 500),
+                     text=random.choice(texts), ann_type_idx=random.randint(0, 2),
+                     document_pk=random.randint(1, options['documents']), section_id=random.randint(1, options['documents'] * 2),
+                     section_offset=random.choice([0, 150]), offset_relative=True,
+                     start_position=random.randint(0, 1500), length=random.randint(3, 30)) for idx in range(options['rows'])]
+
+        start = time.time()
+        legacy_df = pd.DataFrame([_legacy_row(**row) for row in rows], columns=NER_DF_COLUMNS)
+        legacy_time = time.time() - start
+
+        start = time.time()
+        builder = NERFrameBuilder()
+        for row in rows:
+            builder.append(**row)
+        typed_df = builder.to_df()
+        typed_time = time.time() - start
+
+        for name, df, seconds in (('legacy', legacy_df, legacy_time), ('typed', typed_df, typed_time)):
+            memory = df.memory_usage(deep=True).sum()
+            self.stdout.write('{0:>6}: {1:.2f}s, {2:.1f} MB ({3:.0f} bytes per row)'.format(
+                name, seconds, memory / 1024. / 1024., memory / float(len(df))))
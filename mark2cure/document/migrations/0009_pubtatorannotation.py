@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def extract_pubtator_annotations(apps, schema_editor):
+    from mark2cure.common.formatter import parse_pubtator_annotations
+
+    Pubtator = apps.get_model('document', 'Pubtator')
+    PubtatorAnnotation = apps.get_model('document', 'PubtatorAnnotation')
+    Section = apps.get_model('document', 'Section')
+
+    for pubtator in Pubtator.objects.filter(content__isnull=False).exclude(content='').iterator():
+        try:
+            offsets, annotations = parse_pubtator_annotations(pubtator.content)
+        except SyntaxError:
+            continue
+
+        section_pks = list(Section.objects.filter(document_id=pubtator.document_id).exclude(kind='o').order_by('pk').values_list('pk', flat=True))
+
+        PubtatorAnnotation.objects.bulk_create([PubtatorAnnotation(
+            pubtator_id=pubtator.pk,
+            document_id=pubtator.document_id,
+            section_id=section_pks[ann['passage_idx']] if ann['passage_idx'] < len(section_pks) else None,
+            section_offset=offsets[ann['passage_idx']],
+            ann_type=ann['ann_type'],
+            uid=ann['uid'],
+            start=ann['start'],
+            text=ann['text']) for ann in annotations])
+
+        if offsets:
+            pubtator.section_offsets = ','.join([str(x) for x in offsets])
+            pubtator.save(update_fields=['section_offsets'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0008_auto_20161207_0444'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pubtator',
+            name='section_offsets',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.CreateModel(
+            name='PubtatorAnnotation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section_offset', models.IntegerField(default=0)),
+                ('ann_type', models.CharField(max_length=40)),
+                ('uid', models.CharField(blank=True, max_length=200, null=True)),
+                ('start', models.IntegerField()),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pubtator_annotations', to='document.Document')),
+                ('pubtator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotations', to='document.Pubtator')),
+                ('section', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='document.Section')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='pubtatorannotation',
+            index_together=set([('document', 'ann_type')]),
+        ),
+        migrations.RunPython(extract_pubtator_annotations, migrations.RunPython.noop),
+    ]
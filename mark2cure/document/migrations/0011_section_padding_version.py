@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0010_document_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='padding_version',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
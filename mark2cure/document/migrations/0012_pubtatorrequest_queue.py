@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.utils.timezone
+import datetime
+
+
+def schedule_pending_requests(apps, schema_editor):
+    PubtatorRequest = apps.get_model('document', 'PubtatorRequest')
+
+    # The backoff of document.pubtator.next_check at the time of this migration
+    for session in PubtatorRequest.objects.filter(status=0).values('session_id').annotate(
+            request_count=Max('request_count'), updated=Max('updated')):
+        delay = min(datetime.timedelta(minutes=1) * (2 ** min(session['request_count'], 16)), datetime.timedelta(hours=6))
+        PubtatorRequest.objects.filter(session_id=session['session_id'], status=0).update(
+            next_check_at=session['updated'] + delay)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0011_section_padding_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pubtatorrequest',
+            name='next_check_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='pubtatorrequest',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AlterIndexTogether(
+            name='pubtatorrequest',
+            index_together=set([('status', 'next_check_at'), ('session_id', 'status')]),
+        ),
+        migrations.RunPython(schedule_pending_requests, migrations.RunPython.noop),
+    ]
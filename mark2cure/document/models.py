@@ -1,9 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-from nltk.tokenize import WhitespaceTokenizer
-from mark2cure.common.formatter import validate_pubtator
+from mark2cure.common.formatter import validate_pubtator, parse_pubtator_annotations, word_overlay
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
@@ -11,7 +10,6 @@ from .managers import DocumentManager
 from ..task.entity_recognition.models import EntityRecognitionAnnotation
 # from librabbitmq import ConnectionError
 
-import xml.etree.ElementTree as ET
 import pandas as pd
 pd.set_option('display.width', 1000)
 
@@ -25,11 +23,18 @@ class Document(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     source = models.CharField(max_length=200, blank=True)
 
+    # Bumped whenever the Sections or Pubtator content change, used to key the cached JSON
+    revision = models.IntegerField(default=0)
+
     objects = DocumentManager()
 
     def __unicode__(self):
         return self.title
 
+    @staticmethod
+    def bump_revision(document_pk):
+        Document.objects.filter(pk=document_pk).update(revision=models.F('revision') + 1)
+
     def available_sections(self):
         return self.section_set.exclude(kind='o').all()
 
@@ -38,54 +43,36 @@ class Document(models.Model):
 
     def run_pubtator(self):
         """ Ensure a Document has Pubtator entries
-            1) Create Pubtator entries
-            2) Start checking for responses if pending
+            1) Create Pubtator entries (and remove duplicates)
+            2) Submit the ones without content or a pending request
+
+            Pending requests are checked and expired by the scheduler queue
         """
-        kind_arr = ['tmChem', 'DNorm', 'GNormPlus']
-
-        # If the Document has excess Pubtators, cleanup
-        if self.pubtators.count() > 3:
-            for kind in kind_arr:
-                if self.pubtators.filter(kind=kind).count() > 1:
-                    # Picks them off 1 run at a time (oldest first) until no duplicates remain
-                    self.pubtators.filter(kind=kind).first().delete()
-
-        # If the Document is missing any Pubtator "kinds", it should get them
-        for missing_kind in list(set(kind_arr) - set(self.pubtators.values_list('kind', flat=True))):
-            Pubtator.objects.get_or_create(document=self, kind=missing_kind)
-
-        for pubtator in self.pubtators.filter(content__isnull=True).all():
-            try:
-                pending_request = pubtator.requests.get(status=PubtatorRequest.UNFULLFILLED)
-
-                # If the current request is never going to finish, flag it and start over
-                if pending_request and (timezone.now() - pending_request.updated).days >= 1:
-                    pending_request.status = PubtatorRequest.EXPIRED
-                    pending_request.save()
-                    pubtator.submit()
-
-            except PubtatorRequest.DoesNotExist:
-                # Start the PubtatorRequest for the first time
-                pubtator.submit()
-
-            except PubtatorRequest.MultipleObjectsReturned:
-                # If multiple arise, delete all and restart the PubtatorRequest attempts
-                pubtator.requests.filter(status=PubtatorRequest.UNFULLFILLED).all().delete()
-                pubtator.submit()
+        from . import pubtator as scheduler
+        scheduler.ensure_pubtators([self.pk])
+
+        for pubtator in Pubtator.objects.filter(pk__in=scheduler.pending_pubtator_pks([self.pk])):
+            pubtator.submit()
 
     def update_padding(self):
-        from mark2cure.common.formatter import pad_split
+        from mark2cure.common.tokenizer import pad_join, PAD_SPLIT_VERSION
         changed = False
 
         for section in self.available_sections():
-            padded = ' '.join(pad_split(section.text))
+            padded = pad_join(section.text)
             if section.text != padded:
                 # If a change was identified:
                 # 1) Resubmit it to pubtator
                 # 2) Remove any submissions for this doc OR flag their annotations
                 section.text = padded
+                section.padding_version = PAD_SPLIT_VERSION
                 section.save()
                 changed = True
+            elif section.padding_version != PAD_SPLIT_VERSION:
+                Section.objects.filter(pk=section.pk).update(padding_version=PAD_SPLIT_VERSION)
+
+        if changed:
+            Document.bump_revision(self.pk)
 
         return changed
 
@@ -127,9 +114,16 @@ class Pubtator(models.Model):
     kind = models.CharField(max_length=200)
     content = models.TextField(blank=True, null=True)
 
+    # Comma separated passage offsets, extracted alongside the annotations
+    section_offsets = models.CharField(max_length=200, blank=True, null=True)
+
     class Meta:
         app_label = 'document'
 
+    def save(self, *args, **kwargs):
+        super(Pubtator, self).save(*args, **kwargs)
+        Document.bump_revision(self.document_id)
+
     def __unicode__(self):
         return '{0} for PMID: {1} ({2})'.format(self.kind, self.document.document_id, 'Valid' if self.is_valid() else 'Invalid')
 
@@ -144,8 +138,45 @@ class Pubtator(models.Model):
         Returns:
             int: Number of annotations in all sections of the Pubtator response
         """
-        root = ET.fromstring(self.content)
-        return len(root.findall(".//annotation"))
+        return self.annotations.count()
+
+    def get_section_offsets(self):
+        if not self.section_offsets:
+            return []
+        return [int(x) for x in self.section_offsets.split(',')]
+
+    def extract_annotations(self):
+        """ Parse the Pubtator content once and store the annotations
+            as rows so the request path never has to read the BioC XML
+
+        Returns:
+            int: Number of annotations extracted
+        """
+        try:
+            offsets, annotations = parse_pubtator_annotations(self.content) if self.content else ([], [])
+        except SyntaxError:
+            offsets, annotations = [], []
+
+        # Passages are returned in the same order the sections were submitted
+        section_pks = list(self.document.available_sections().order_by('pk').values_list('pk', flat=True))
+
+        # Replace the annotations together so a failed insert keeps the old ones
+        with transaction.atomic():
+            self.annotations.all().delete()
+            PubtatorAnnotation.objects.bulk_create([PubtatorAnnotation(
+                pubtator=self,
+                document_id=self.document_id,
+                section_id=section_pks[ann['passage_idx']] if ann['passage_idx'] < len(section_pks) else None,
+                section_offset=offsets[ann['passage_idx']],
+                ann_type=ann['ann_type'],
+                uid=ann['uid'],
+                start=ann['start'],
+                text=ann['text']) for ann in annotations])
+
+            self.section_offsets = ','.join([str(x) for x in offsets]) if offsets else None
+            self.save(update_fields=['section_offsets'])
+
+        return len(annotations)
 
     def submit(self):
         from .tasks import submit_pubtator
@@ -158,6 +189,34 @@ class Pubtator(models.Model):
             submit_pubtator(self.pk)
 
 
+class PubtatorAnnotation(models.Model):
+    """ Annotations extracted from a Pubtator response when its content
+        is stored
+    """
+    pubtator = models.ForeignKey(Pubtator, related_name='annotations')
+    document = models.ForeignKey(Document, related_name='pubtator_annotations')
+    section = models.ForeignKey('Section', blank=True, null=True)
+
+    # The passage offset reported by Pubtator for the section
+    section_offset = models.IntegerField(default=0)
+
+    # The BioC infon type (Disease, Gene, Chemical, ...)
+    ann_type = models.CharField(max_length=40)
+    uid = models.CharField(max_length=200, blank=True, null=True)
+
+    # (WARNING) Like BioC, this is the start position relative
+    # to the entire document, not the section
+    start = models.IntegerField()
+    text = models.TextField()
+
+    class Meta:
+        app_label = 'document'
+        index_together = [('document', 'ann_type')]
+
+    def __unicode__(self):
+        return '{0} ({1}) [{2}]'.format(self.text, self.start, self.ann_type)
+
+
 class PubtatorRequest(models.Model):
     """ Pending jobs that have been submitted to Pubtator and are
         awaiting completion
@@ -179,9 +238,18 @@ class PubtatorRequest(models.Model):
     # The Number of times we've checked on the session_id
     request_count = models.IntegerField(default=0)
 
+    # When the session should be checked next, every request of a session
+    # shares it. A worker claiming the session pushes it out by the lease
+    next_check_at = models.DateTimeField(default=timezone.now)
+    # Token of the worker holding the lease, blank when unclaimed
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+
     updated = models.DateTimeField(auto_now=True)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        index_together = [('status', 'next_check_at'), ('session_id', 'status')]
+
     def __unicode__(self):
         return '{0} for Pubtator ({1})'.format(self.session_id, self.pubtator)
 
@@ -208,6 +276,9 @@ class Section(models.Model):
     text = models.TextField(blank=True)
     source = models.ImageField(blank=True, upload_to='media/images/', default='images/figure.jpg')
 
+    # The pad_split rules (PAD_SPLIT_VERSION) the text was last padded with, 0 if never
+    padding_version = models.IntegerField(default=0, db_index=True)
+
     updated = models.DateTimeField(auto_now=True)
     created = models.DateTimeField(auto_now_add=True)
 
@@ -216,41 +287,25 @@ class Section(models.Model):
     class Meta:
         app_label = 'document'
 
+    def save(self, *args, **kwargs):
+        super(Section, self).save(*args, **kwargs)
+        Document.bump_revision(self.document_id)
+
+    def _er_annotations(self, view):
+        """(pk, start, text) of the Entity Recognition Annotations for a View
+        """
+        annotation_pks = dict(Annotation.objects.filter(view=view, kind='e').values_list('object_id', 'pk'))
+        return sorted([(annotation_pks[pk], start, text) for pk, start, text in EntityRecognitionAnnotation.objects.filter(
+            pk__in=list(annotation_pks.keys())).values_list('pk', 'start', 'text')])
+
     def resultwords(self, user_view, gm_view):
-        # Gather words and positions from the text
-        words_index = WhitespaceTokenizer().span_tokenize(self.text)
-        words_text = WhitespaceTokenizer().tokenize(self.text)
-        words = zip(words_index, words_text)
-
-        # Add counters for concensus count and personal annotation
-        # ((start, stop), 'Word string itself', Intensity, GM Ann ID, User Ann ID, Did user annotate)
-        words = [w + (0, None, None, False,) for w in words]
-
-        # Gather other annotations from GM and users for this section
-        gm_anns = Annotation.objects.filter(view=gm_view).values_list('pk', 'start', 'text')
-
-        # Build the running counter of times a word was annotated
-        for gm_pk, start, text in gm_anns:
-            length = len(text)
-
-            for idx, word in enumerate(words):
-                word_start = word[0][0]
-                counter = word[2]
-                if word_start >= start and word_start <= start + length:
-                    counter += 1
-                    words[idx] = (word[0], word[1], counter, gm_pk, word[3], word[4])
-
-        user_anns = Annotation.objects.filter(view=user_view).values_list('pk', 'start', 'text')
-
-        # Build the running counter of times a word was annotated
-        for user_pk, start, text in user_anns:
-            length = len(text)
-            for idx, word in enumerate(words):
-                word_start = word[0][0]
-                if word_start >= start and word_start <= start + length:
-                    words[idx] = (word[0], word[1], word[2], word[3], user_pk, True)
-
-        return words
+        """ Overlay the GM and user annotations on the words of the section
+
+        Returns:
+            WordOverlay: Per word (start, stop), text, GM concensus count,
+                GM Ann ID and User Ann ID (-1 if the user didn't annotate it)
+        """
+        return word_overlay(self.text, self._er_annotations(gm_view), self._er_annotations(user_view))
 
     def update_view(self, user, task_type, completed=False):
         view = View.objects.filter(user=user, task_type=task_type, section=self).latest()
@@ -0,0 +1,406 @@
+'''
+    Schedules the Pubtator (tmTool) work for every Document. Work is selected
+    with a few set based queries, Documents are submitted to tmTool in batches
+    of the same kind and pending sessions are polled with a pooled HTTP client,
+    backing off exponentially on the number of times a session was checked.
+
+    The PubtatorRequests are the queue: each carries the next_check_at of its
+    session and workers claim due sessions under a row lock, leasing them for
+    CLAIM_LEASE, so several workers can poll at once without sharing sessions.
+'''
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from ..common.formatter import validate_pubtator
+from .models import Document, Pubtator, PubtatorRequest
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict
+import xml.etree.ElementTree as ET
+import datetime
+import requests
+import logging
+import uuid
+import re
+logger = logging.getLogger(__name__)
+
+TMTOOL_URL = 'https://www.ncbi.nlm.nih.gov/CBBresearch/Lu/Demo/RESTful/tmTool.cgi/'
+PUBTATOR_KINDS = ['tmChem', 'DNorm', 'GNormPlus']
+
+# Documents sent in a single Submit request
+SUBMIT_BATCH_SIZE = 20
+# Receive requests in flight at once
+POLL_CONCURRENCY = 4
+
+# Wait BACKOFF_BASE * 2 ** request_count between checks of a session, up to BACKOFF_MAX
+BACKOFF_BASE = datetime.timedelta(minutes=1)
+BACKOFF_MAX = datetime.timedelta(hours=6)
+# Sessions that never finish are expired and the Pubtators submitted again
+REQUEST_EXPIRY = datetime.timedelta(days=1)
+
+# Requests claimed by a worker at a time and how long the claim holds
+# before the sessions are due again for any worker
+CLAIM_BATCH_SIZE = 60
+CLAIM_LEASE = datetime.timedelta(minutes=10)
+
+SESSION_RE = re.compile(r'\d{4}-\d{4}-\d{4}-\d{4}')
+
+
+class PubtatorClient(object):
+    """tmTool REST client sharing one pooled HTTP session between threads
+
+    Args:
+        base_url (str): tmTool root, a local stand-in server in tests
+        concurrency (int): Connections kept in the pool
+        timeout (int): Seconds before a request is abandoned
+    """
+
+    def __init__(self, base_url=TMTOOL_URL, concurrency=POLL_CONCURRENCY, timeout=30):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def submit(self, kind: str, content: str) -> str:
+        """Start a tmTool session for the BioC collection
+
+        Returns:
+            str: The session_id
+        """
+        res = self.session.post('{0}{1}/Submit/'.format(self.base_url, kind),
+                                data=content.encode('utf-8'),
+                                params={'content-type': 'text/xml'},
+                                timeout=self.timeout)
+        res.raise_for_status()
+        session_ids = SESSION_RE.findall(res.text)
+        if not session_ids:
+            raise ValueError('tmTool did not return a session: {0}'.format(res.text[:200]))
+        return session_ids[0]
+
+    def receive(self, session_id: str, content: str):
+        """Ask tmTool for the results of a session, it wants the collection posted again
+
+        Returns:
+            requests.Response
+        """
+        return self.session.post('{0}{1}/Receive/'.format(self.base_url, session_id),
+                                 data=content.encode('utf-8'),
+                                 params={'content-type': 'text/xml'},
+                                 timeout=self.timeout)
+
+    def receive_many(self, sessions: Dict[str, str]) -> Dict:
+        """Receive several sessions with at most concurrency requests in flight
+
+        Args:
+            sessions (dict): session_id >> collection content
+
+        Returns:
+            dict: session_id >> requests.Response, or the Exception raised
+        """
+        def receive(session_id):
+            try:
+                return session_id, self.receive(session_id, sessions[session_id])
+            except requests.RequestException as e:
+                return session_id, e
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return dict(executor.map(receive, sorted(sessions)))
+
+
+def submission_xml(document_pks: List[int]) -> str:
+    """BioC collection of the Documents' available sections, the
+        document id is the Document pk so responses can be split back
+    """
+    collection = ET.Element('collection')
+    ET.SubElement(collection, 'source').text = 'Mark2Cure'
+    ET.SubElement(collection, 'date').text = timezone.now().strftime('%Y%m%d')
+    ET.SubElement(collection, 'key').text = 'collection.key'
+
+    for doc in Document.objects.as_json(document_pks=document_pks):
+        document = ET.SubElement(collection, 'document')
+        ET.SubElement(document, 'id').text = str(doc['pk'])
+
+        offset = 0
+        for passage_dict in doc['passages']:
+            if passage_dict['section'] == 'o':
+                continue
+            passage = ET.SubElement(document, 'passage')
+            ET.SubElement(passage, 'infon', key='type').text = passage_dict['section']
+            ET.SubElement(passage, 'infon', key='id').text = str(passage_dict['pk'])
+            ET.SubElement(passage, 'offset').text = str(offset)
+            ET.SubElement(passage, 'text').text = passage_dict['text']
+            offset += len(passage_dict['text']) + 1
+
+    return '<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(collection, encoding='unicode')
+
+
+def split_collection(content: str) -> Dict[int, str]:
+    """Split a tmTool response into a single document collection per Document
+
+    Returns:
+        dict: document_pk >> BioC content
+    """
+    root = ET.fromstring(content)
+    header = [child for child in root if child.tag != 'document']
+
+    documents = {}
+    for document in root.findall('document'):
+        try:
+            document_pk = int(document.find('id').text)
+        except (AttributeError, TypeError, ValueError):
+            continue
+
+        collection = ET.Element(root.tag, root.attrib)
+        collection.extend(header)
+        collection.append(document)
+        documents[document_pk] = '<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(collection, encoding='unicode')
+    return documents
+
+
+def next_check(request_count: int, updated: datetime.datetime) -> datetime.datetime:
+    """When a session that was checked request_count times should be checked again"""
+    try:
+        delay = min(BACKOFF_BASE * (2 ** request_count), BACKOFF_MAX)
+    except OverflowError:
+        delay = BACKOFF_MAX
+    return updated + delay
+
+
+def ensure_pubtators(document_pks: List[int]=None) -> int:
+    """Remove duplicate Pubtators and create the missing kinds for the Documents
+
+    Args:
+        document_pks (list): Only these Documents, all if None
+
+    Returns:
+        int: Number of Pubtators created
+    """
+    pubtators = Pubtator.objects.all()
+    documents = Document.objects.all()
+    if document_pks is not None:
+        pubtators = pubtators.filter(document_id__in=document_pks)
+        documents = documents.filter(pk__in=document_pks)
+
+    # Keep the newest Pubtator of each (document, kind)
+    duplicates = pubtators.order_by().values('document_id', 'kind').annotate(
+        count=Count('pk'), newest=Max('pk')).filter(count__gt=1)
+    for row in duplicates:
+        Pubtator.objects.filter(document_id=row['document_id'], kind=row['kind']).exclude(pk=row['newest']).delete()
+
+    existing = set(pubtators.values_list('document_id', 'kind'))
+    missing = [Pubtator(document_id=document_pk, kind=kind)
+               for document_pk in documents.values_list('pk', flat=True)
+               for kind in PUBTATOR_KINDS if (document_pk, kind) not in existing]
+    Pubtator.objects.bulk_create(missing, batch_size=1000)
+    return len(missing)
+
+
+def expire_requests(now=None) -> int:
+    """Flag the pending requests that were not answered within REQUEST_EXPIRY"""
+    now = now or timezone.now()
+    return PubtatorRequest.objects.filter(
+        status=PubtatorRequest.UNFULLFILLED,
+        created__lt=now - REQUEST_EXPIRY).update(status=PubtatorRequest.EXPIRED, updated=now)
+
+
+def submit_pubtators(client: PubtatorClient, pubtator_pks: List[int], batch_size=SUBMIT_BATCH_SIZE) -> int:
+    """Submit the Pubtators to tmTool, one request per batch of the same kind
+
+    Returns:
+        int: Number of PubtatorRequests started
+    """
+    by_kind = {}
+    for pubtator_pk, kind, document_pk in Pubtator.objects.filter(
+            pk__in=pubtator_pks).order_by('kind', 'document_id').values_list('pk', 'kind', 'document_id'):
+        by_kind.setdefault(kind, []).append((pubtator_pk, document_pk))
+
+    started = 0
+    now = timezone.now()
+    for kind, pubtators in sorted(by_kind.items()):
+        for idx in range(0, len(pubtators), batch_size):
+            batch = pubtators[idx:idx + batch_size]
+            try:
+                session_id = client.submit(kind, submission_xml([document_pk for pubtator_pk, document_pk in batch]))
+            except (requests.RequestException, ValueError) as e:
+                logger.warning('Pubtator %s submission failed: %s', kind, e)
+                continue
+
+            PubtatorRequest.objects.bulk_create([PubtatorRequest(pubtator_id=pubtator_pk, session_id=session_id,
+                                                                 next_check_at=next_check(0, now))
+                                                 for pubtator_pk, document_pk in batch])
+            started += len(batch)
+
+    return started
+
+
+def pending_pubtator_pks(document_pks: List[int]=None) -> List[int]:
+    """Pubtators without content or a pending request"""
+    pubtators = Pubtator.objects.filter(content__isnull=True)
+    if document_pks is not None:
+        pubtators = pubtators.filter(document_id__in=document_pks)
+    return list(pubtators.exclude(requests__status=PubtatorRequest.UNFULLFILLED).values_list('pk', flat=True))
+
+
+def _group_sessions(queryset) -> Dict[str, List[Dict]]:
+    sessions = {}
+    for request in queryset.values('pk', 'session_id', 'request_count', 'pubtator_id', 'pubtator__document_id'):
+        sessions.setdefault(request['session_id'], []).append(request)
+    return sessions
+
+
+def pending_sessions(session_ids: List[str]=None) -> Dict[str, List[Dict]]:
+    """The pending requests grouped by their tmTool session
+
+    Args:
+        session_ids (list): Only these sessions, all if None
+
+    Returns:
+        dict: session_id >> list of (dict)Requests with their pubtator and document
+    """
+    queryset = PubtatorRequest.objects.filter(status=PubtatorRequest.UNFULLFILLED)
+    if session_ids is not None:
+        queryset = queryset.filter(session_id__in=session_ids)
+    return _group_sessions(queryset)
+
+
+def claim_sessions(session_ids: List[str]=None, now=None, limit=CLAIM_BATCH_SIZE, lease=CLAIM_LEASE, claim=None) -> Dict[str, List[Dict]]:
+    """Claim the pending sessions due for a check
+
+        The due requests are locked and leased to this worker by pushing
+        their next_check_at out by the lease, so no other worker selects
+        them until apply_response reschedules them or the lease runs out
+
+    Args:
+        session_ids (list): Claim these sessions even if they're not due
+            yet, unless another worker holds them
+        now (datetime): The time the sessions are due by
+        limit (int): Most requests selected (their whole sessions are claimed)
+        lease (timedelta): How long the claim holds
+        claim (str): The worker's token, random if None
+
+    Returns:
+        dict: session_id >> list of (dict)Requests, like pending_sessions
+    """
+    now = now or timezone.now()
+    claim = claim or uuid.uuid4().hex
+
+    pending = PubtatorRequest.objects.filter(status=PubtatorRequest.UNFULLFILLED)
+    if session_ids is None:
+        claimable = pending.filter(next_check_at__lte=now)
+    else:
+        claimable = pending.filter(session_id__in=session_ids).filter(
+            Q(claimed_by='') | Q(next_check_at__lte=now))
+
+    with transaction.atomic():
+        due = claimable.select_for_update().order_by('next_check_at', 'pk').values_list('session_id', flat=True)
+        claimed_sessions = set(due[:limit])
+        if not claimed_sessions:
+            return {}
+
+        # The rest of the claimed sessions, checked again now that they're locked
+        request_pks = list(claimable.select_for_update().filter(
+            session_id__in=list(claimed_sessions)).values_list('pk', flat=True))
+        PubtatorRequest.objects.filter(pk__in=request_pks).update(claimed_by=claim, next_check_at=now + lease)
+
+    return _group_sessions(PubtatorRequest.objects.filter(pk__in=request_pks))
+
+
+def apply_response(session_requests: List[Dict], res, now=None) -> int:
+    """Store a Receive response for every Pubtator of the session
+
+    Returns:
+        int: Number of Pubtators fulfilled
+    """
+    now = now or timezone.now()
+    request_pks = [r['pk'] for r in session_requests]
+    # Release the claim and schedule the next check of the session
+    request_count = max(r['request_count'] for r in session_requests) + 1
+    PubtatorRequest.objects.filter(pk__in=request_pks).update(
+        request_count=F('request_count') + 1, updated=now,
+        next_check_at=next_check(request_count, now), claimed_by='')
+
+    if isinstance(res, Exception):
+        return 0
+
+    if res.status_code == 501:
+        # '[Warning] : The Result is not ready.\n'
+        return 0
+
+    if res.status_code == 404:
+        # '[Warning] : The Session number does not exist.\n'
+        PubtatorRequest.objects.filter(pk__in=request_pks).update(status=PubtatorRequest.FAILED)
+        return 0
+
+    if res.status_code != 200:
+        logger.warning('Unable to react to Pubtator Response %s', res.status_code)
+        return 0
+
+    try:
+        documents = split_collection(res.text)
+    except ET.ParseError:
+        documents = {}
+
+    fulfilled = 0
+    for request in session_requests:
+        content = documents.get(request['pubtator__document_id'])
+        pubtator = Pubtator.objects.select_related('document').get(pk=request['pubtator_id'])
+
+        if content and validate_pubtator(content, pubtator.document):
+            with transaction.atomic():
+                pubtator.content = content
+                pubtator.save()
+                pubtator.extract_annotations()
+                PubtatorRequest.objects.filter(pk=request['pk']).update(status=PubtatorRequest.FULLFILLED)
+            fulfilled += 1
+        else:
+            # Failed Validation
+            PubtatorRequest.objects.filter(pk=request['pk']).update(status=PubtatorRequest.FAILED)
+
+    return fulfilled
+
+
+def poll_sessions(client: PubtatorClient, sessions: Dict[str, List[Dict]], now=None) -> int:
+    """Receive the sessions concurrently and store the results
+
+    Returns:
+        int: Number of Pubtators fulfilled
+    """
+    contents = dict((session_id, submission_xml(sorted(set(r['pubtator__document_id'] for r in session_requests))))
+                    for session_id, session_requests in sessions.items())
+    responses = client.receive_many(contents)
+
+    # Responses are stored from this thread, the database connection isn't shared
+    return sum(apply_response(sessions[session_id], responses[session_id], now=now) for session_id in sorted(responses))
+
+
+def run(client: PubtatorClient=None, now=None) -> Dict:
+    """One pass of the scheduler
+
+    Returns:
+        dict: Counts of the work done
+    """
+    client = client or PubtatorClient()
+    now = now or timezone.now()
+
+    counts = {
+        'created': ensure_pubtators(),
+        'expired': expire_requests(now=now),
+        'submitted': submit_pubtators(client, pending_pubtator_pks()),
+        'fulfilled': 0
+    }
+
+    # Polled sessions are rescheduled past now, so this ends once the due ones
+    # are claimed by this or another worker
+    sessions = claim_sessions(now=now)
+    while sessions:
+        counts['fulfilled'] += poll_sessions(client, sessions, now=now)
+        sessions = claim_sessions(now=now)
+
+    return counts
@@ -1,5 +1,6 @@
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.utils import timezone
 
 from ..task.models import Task, UserQuestRelationship
 from ..common.models import Group
@@ -7,10 +8,12 @@ from .tasks import get_pubmed_document
 from .models import Document, Section, Pubtator, Annotation
 from ..test_base.test_base import TestBase
 
-from ..common.bioc import BioCReader
-from Bio import Entrez
+from ..common.formatter import parse_pubtator_annotations, word_overlay
+from Bio import Entrez, Medline
+import pandas as pd
 import datetime
 import json
+import os
 
 
 class DocumentImportProcessing(TestCase):
@@ -50,14 +53,283 @@ class PubtatorImportProcessing(TestCase):
         h = Entrez.esearch(db='pubmed', retmax=10, term='("{date}"[Date - Publication] : "3000"[Date - Publication])'.format(date=date.strftime('%Y/%m/%M')))
         result = Entrez.read(h)
         for pmid in result.get('IdList'):
-            print pmid
+            print(pmid)
 
     def test_document_init(self):
         pass
 
 
 class DocumentAPIMethods(TestCase):
-    pass
+
+    def test_ner_frame_builder(self):
+        from .managers import NERFrameBuilder, NER_DF_COLUMNS
+        builder = NERFrameBuilder()
+        builder.append(uid=5, source='db', user_id=3, text='BRCA1', ann_type_idx=1,
+                       document_pk=2, section_id=7, section_offset=10, offset_relative=True,
+                       start_position=4, length=5)
+        builder.append(uid='MESH:D001259', source='identifier', user_id=None, text='ataxia', ann_type_idx=0,
+                       document_pk=2, section_id=8, section_offset=10, offset_relative=False,
+                       start_position=21, length=6)
+
+        df = builder.to_df()
+        self.assertEqual(tuple(df.columns), NER_DF_COLUMNS)
+        self.assertEqual(str(df['start_position'].dtype), 'int32')
+        self.assertEqual(str(df['text'].dtype), 'category')
+        self.assertEqual(df['user_id'].isnull().tolist(), [False, True])
+        self.assertEqual(df['uid'].tolist(), ['5', 'MESH:D001259'])
+
+    def test_iter_ner_df(self):
+        from .models import PubtatorAnnotation
+        document_pks = []
+        for pmid in (2, 1):
+            document = Document.objects.create(document_id=pmid, title='Title', authors='Author')
+            section = Section.objects.create(kind='t', text='Hereditary ataxia', document=document)
+            pubtator = Pubtator.objects.create(document=document, kind='DNorm', content='')
+            PubtatorAnnotation.objects.create(pubtator=pubtator, document=document, section=section,
+                                              ann_type='Disease', uid='MESH:D001259', start=11, text='ataxia')
+            document_pks.append(document.pk)
+
+        frames = list(Document.objects.iter_ner_df(document_pks=document_pks, chunk_size=1))
+        self.assertEqual([document_pk for document_pk, df in frames], sorted(document_pks))
+        for document_pk, df in frames:
+            self.assertEqual(df['document_pk'].tolist(), [document_pk])
+
+        streamed = pd.concat([df for document_pk, df in frames], ignore_index=True)
+        ner_df = Document.objects.ner_df(document_pks=document_pks)
+        # Compared as strings, astype(str) doesn't handle the categorical columns
+        self.assertEqual([[str(x) for x in row] for row in streamed.values.tolist()],
+                         [[str(x) for x in row] for row in ner_df.sort_values('document_pk').values.tolist()])
+
+
+class SectionWordOverlay(TestCase):
+
+    def test_word_overlay(self):
+        text = 'Hereditary spastic paraplegia type 4'
+        gm_anns = [(1, 11, 'spastic paraplegia'), (2, 19, 'paraplegia')]
+        user_anns = [(3, 0, 'Hereditary')]
+
+        overlay = word_overlay(text, gm_anns, user_anns)
+        self.assertEqual(overlay.words, ['Hereditary', 'spastic', 'paraplegia', 'type', '4'])
+        self.assertEqual(list(overlay.starts), [0, 11, 19, 30, 35])
+        self.assertEqual(list(overlay.stops), [10, 18, 29, 34, 36])
+
+        # Words starting within [start, start + length] of an annotation are covered
+        self.assertEqual(list(overlay.intensity), [0, 1, 2, 0, 0])
+        self.assertEqual(list(overlay.gm_pks), [-1, 1, 2, -1, -1])
+        self.assertEqual(list(overlay.user_pks), [3, -1, -1, -1, -1])
+
+
+class PubtatorAnnotationExtraction(TestCase):
+
+    def test_parse_pubtator_annotations(self):
+        content = '''<collection><document><id>9467011</id>
+            <passage><offset>0</offset><text>Hereditary ataxia</text>
+                <annotation id="0">
+                    <infon key="type">Disease</infon>
+                    <infon key="identifier">MESH:D001259</infon>
+                    <location offset="11" length="6"/><text>ataxia</text>
+                </annotation>
+            </passage>
+            <passage><offset>18</offset><text>No concepts here</text></passage>
+        </document></collection>'''
+
+        offsets, annotations = parse_pubtator_annotations(content)
+        self.assertEqual(offsets, [0, 18])
+        self.assertEqual(len(annotations), 1)
+        self.assertEqual(annotations[0], {
+            'passage_idx': 0,
+            'ann_type': 'Disease',
+            'uid': 'MESH:D001259',
+            'start': 11,
+            'text': 'ataxia'})
+
+
+class DocumentJSONCaching(TestCase):
+
+    def test_cache_follows_revision(self):
+        from .cache import DocumentJSONCache, LRUBackend
+        document_cache = DocumentJSONCache([LRUBackend(maxsize=10)])
+
+        document = Document.objects.create(document_id=1, title='Title', authors='Author')
+        section = Section.objects.create(kind='t', text='Hereditary ataxia', document=document)
+        Section.objects.create(kind='a', text='No concepts here', document=document)
+
+        first = document_cache.get_many([document.pk])
+        self.assertEqual(first, Document.objects.as_json(document_pks=[document.pk]))
+        self.assertIs(document_cache.get_many([document.pk])[0], first[0])
+
+        # Editing a Section moves the Document to a new revision
+        section.text = 'Hereditary ataxias'
+        section.save()
+        updated = document_cache.get_many([document.pk])
+        self.assertEqual(updated[0]['passages'][0]['text'], 'Hereditary ataxias')
+
+    def test_lru_eviction(self):
+        from .cache import LRUBackend
+        lru = LRUBackend(maxsize=2)
+        lru.set_many({'a': 1, 'b': 2})
+        lru.get_many(['a'])
+        lru.set_many({'c': 3})
+        self.assertEqual(lru.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+class FixtureEntrez(object):
+    """Serves efetch from the MEDLINE fixture instead of NCBI"""
+
+    def __init__(self, path):
+        with open(path) as handle:
+            self.records = dict((record['PMID'], record) for record in Medline.parse(handle))
+        self.batches = []
+
+    def efetch(self, pmids):
+        self.batches.append(list(pmids))
+        return [self.records[pmid] for pmid in pmids if pmid in self.records]
+
+
+class PubMedIngest(TestCase):
+
+    def test_ingest_pmids(self):
+        from django.conf import settings
+        from .ingest import ingest_pmids
+        client = FixtureEntrez(os.path.join(settings.FIXTURE_DIRS[0], 'pubmed', 'efetch.medline'))
+
+        document_pks = ingest_pmids([9467011, 9467012, 9467013], include_pubtator=False,
+                                    client=client, batch_size=2, parse_workers=1)
+        self.assertEqual(client.batches, [['9467011', '9467012'], ['9467013']])
+
+        # The record without an abstract is skipped
+        self.assertEqual(len(document_pks), 2)
+        self.assertEqual(Section.objects.filter(document__in=document_pks).count(), 4)
+        document = Document.objects.get(document_id=9467011)
+        self.assertEqual(document.section_set.get(kind='t').text, document.title)
+
+        # Loading again updates in place
+        self.assertEqual(ingest_pmids([9467011], include_pubtator=False, client=client, parse_workers=1), [document.pk])
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(Section.objects.count(), 4)
+
+
+class CorpusHealth(TestCase):
+
+    def test_sweep(self):
+        from . import health
+        from ..common.formatter import PAD_SPLIT_VERSION
+        complete = Document.objects.create(document_id=1, title='Title', authors='Author')
+        Section.objects.create(kind='t', text='Hereditary ataxia', document=complete)
+        abstract = Section.objects.create(kind='a', text='SCA2/SCA3 patients', document=complete)
+
+        partial = Document.objects.create(document_id=2, title='Title', authors='Author')
+        Section.objects.create(kind='o', text='', document=partial)
+        Section.objects.create(kind='t', text='Hereditary ataxia', document=partial)
+
+        Document.objects.create(document_id=3, title='Title', authors='Author')
+
+        counts = health.sweep(batch_size=2)
+        self.assertEqual(counts['refetch'], [2, 3])
+        self.assertEqual(counts['checked'], 3)
+        self.assertEqual(counts['changed'], 1)
+        self.assertEqual(Section.objects.get(pk=abstract.pk).text, 'SCA2 / SCA3 patients')
+        self.assertEqual(Pubtator.objects.filter(document=complete).count(), 3)
+
+        # Sections padded under the current rules are not checked again
+        self.assertFalse(Section.objects.exclude(kind='o').filter(padding_version__lt=PAD_SPLIT_VERSION).exists())
+        self.assertEqual(health.sweep()['checked'], 0)
+
+
+class PubtatorScheduler(TestCase):
+    """Runs the scheduler against a local stand-in for tmTool"""
+
+    def setUp(self):
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        import threading
+
+        self.calls = []
+        calls = self.calls
+
+        class TmToolHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                content = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                calls.append((self.path.split('?')[0], content))
+                if '/Submit/' in self.path:
+                    body = '1234-5678-9012-3456'
+                else:
+                    body = content
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), TmToolHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batch_submit_and_poll(self):
+        from . import pubtator as scheduler
+        from .models import PubtatorRequest
+
+        for pmid in (1, 2):
+            document = Document.objects.create(document_id=pmid, title='Title', authors='Author')
+            Section.objects.create(kind='t', text='Hereditary ataxia', document=document)
+
+        client = scheduler.PubtatorClient(base_url='http://127.0.0.1:{0}/'.format(self.server.server_port))
+        counts = scheduler.run(client)
+        self.assertEqual(counts['created'], 6)
+        # One Submit per kind for both documents
+        self.assertEqual(counts['submitted'], 6)
+        self.assertEqual(len([path for path, content in self.calls if path.endswith('/Submit/')]), 3)
+
+        # Nothing is polled until the backoff passed
+        self.assertEqual(counts['fulfilled'], 0)
+        later = timezone.now() + scheduler.BACKOFF_BASE
+        self.assertEqual(scheduler.run(client, now=later)['fulfilled'], 6)
+        self.assertEqual(PubtatorRequest.objects.filter(status=PubtatorRequest.FULLFILLED).count(), 6)
+        self.assertEqual(Pubtator.objects.filter(content__isnull=True).count(), 0)
+
+    def test_claim_sessions(self):
+        from . import pubtator as scheduler
+        from .models import PubtatorRequest
+
+        document = Document.objects.create(document_id=1, title='Title', authors='Author')
+        Section.objects.create(kind='t', text='Hereditary ataxia', document=document)
+        scheduler.ensure_pubtators([document.pk])
+        now = timezone.now()
+        for idx, pubtator in enumerate(document.pubtators.all()):
+            PubtatorRequest.objects.create(pubtator=pubtator, session_id='0000-0000-0000-000{0}'.format(idx),
+                                           next_check_at=now - datetime.timedelta(minutes=idx))
+        session_id = '0000-0000-0000-0000'
+
+        # Each due session goes to a single worker
+        first = scheduler.claim_sessions(now=now, limit=2, claim='first')
+        second = scheduler.claim_sessions(now=now, claim='second')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(scheduler.claim_sessions(now=now), {})
+        self.assertEqual(PubtatorRequest.objects.filter(claimed_by='').count(), 0)
+
+        # A held session can't be claimed by name until the lease runs out
+        self.assertEqual(scheduler.claim_sessions([session_id], now=now), {})
+        self.assertEqual(len(scheduler.claim_sessions(now=now + scheduler.CLAIM_LEASE)), 3)
+
+        # Checking a session releases it and backs off
+        requests = scheduler.pending_sessions([session_id])[session_id]
+        scheduler.apply_response(requests, ValueError('offline'), now=now)
+        request = PubtatorRequest.objects.get(session_id=session_id)
+        self.assertEqual(request.claimed_by, '')
+        self.assertEqual(request.next_check_at, scheduler.next_check(1, now))
+        self.assertEqual(list(scheduler.claim_sessions([session_id], now=now)), [session_id])
+
+    def test_backoff(self):
+        from . import pubtator as scheduler
+        updated = timezone.now()
+        self.assertEqual(scheduler.next_check(0, updated), updated + scheduler.BACKOFF_BASE)
+        self.assertEqual(scheduler.next_check(3, updated), updated + scheduler.BACKOFF_BASE * 8)
+        self.assertEqual(scheduler.next_check(100, updated), updated + scheduler.BACKOFF_MAX)
 
 
 class DocumentAPIViews(TestCase):
@@ -73,6 +345,7 @@ class DocumentAPIViews(TestCase):
         self.assertEqual(Pubtator.objects.count(), 3)
 
     def test_document_as_bioc(self):
+        from ..common.bioc import BioCReader
         response = self.client.get('/document/{pmid}.json'.format(pmid=self.doc.document_id))
         json_string = response.content
         self.assertNotEqual(json_string, '', msg='API returned empty response for document BioC Representation.')
@@ -104,6 +377,7 @@ class DocumentAPIViews(TestCase):
         self.assertEqual(len(r.collection.documents[0].passages[1].annotations), 0)
 
     def test_document_as_bioc_with_pubtator(self):
+        from ..common.bioc import BioCReader
         # Unused for now
         """
         pub_query_set = Pubtator.objects.filter(
@@ -154,6 +428,7 @@ class DocumentSubmissionsAPIViews(TestCase, TestBase):
         cls.user_annotation_list = []
 
     def test_document_as_bioc_for_pairing(self):
+        from ..common.bioc import BioCReader
         self.create_new_user_accounts(self.user_names)
 
         # Ensure the player views the Q but can't match b/c no Anns exist
@@ -0,0 +1,25 @@
+SELECT  `relation_relation`.`document_id`,
+        `relation_relation`.`id` as `relation_id`,
+        `relation_relation`.`relation_type`,
+        `relation_relation`.`concept_1_id`,
+        `relation_relation`.`concept_2_id`,
+        `relation_relationannotation`.`answer`,
+        `document_view`.`user_id`
+
+FROM `relation_relationannotation`
+
+INNER JOIN `relation_relation`
+    ON `relation_relation`.`id` = `relation_relationannotation`.`relation_id`
+
+INNER JOIN `document_annotation`
+    ON `document_annotation`.`object_id` = `relation_relationannotation`.`id`
+      AND `document_annotation`.`content_type_id` = %(content_type_id)s
+
+INNER JOIN `document_view`
+    ON `document_view`.`id` = `document_annotation`.`view_id`
+
+WHERE `relation_relation`.`document_id` IN (%(document_pks)s)
+
+ORDER BY `relation_relation`.`document_id` ASC,
+         `relation_relation`.`id` ASC,
+         `document_view`.`user_id` ASC
@@ -0,0 +1,233 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+
+from ..common import sql
+from ..document.managers import PUBTATOR_TYPES
+from ..document.models import Document
+from ..task.entity_recognition.models import EntityRecognitionAnnotation
+from ..task.relation.models import RelationAnnotation
+
+from typing import List, Dict
+import xml.etree.ElementTree as ET
+import shutil
+import json
+
+EXPORT_CHUNK_SIZE = 100
+CURSOR_FETCH_SIZE = 1000
+
+ALL = 0
+ER = 1
+REL = 2
+
+ANN_TYPES = ['disease', 'gene_protein', 'chemical']
+SECTION_TYPES = {'o': 'overview', 't': 'title', 'a': 'abstract', 'p': 'paragraph', 'f': 'figure'}
+
+
+def _streaming_cursor():
+    """A server side cursor on MySQL, so fetchmany reads the rows as they're
+        sent instead of MySQLdb buffering the whole result set first
+    """
+    if connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor
+        connection.ensure_connection()
+        return connection.connection.cursor(SSCursor)
+    return connection.cursor()
+
+
+def _fetch_rows(name: str, columns, **params):
+    """Iterate the rows of a registered command a batch at a time
+
+        The connection can't run other queries until a server side cursor
+        is exhausted or closed, so don't query while iterating
+    """
+    c = _streaming_cursor()
+    try:
+        sql.execute(c, name, **params)
+        while True:
+            rows = c.fetchmany(CURSOR_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        c.close()
+
+
+def export_chunk(document_pks: List[int], export_type=ALL) -> List[Dict]:
+    """Assemble the (dict)Documents of a chunk with their Passages,
+        Annotations and Relations
+
+    Args:
+        documents_pks (list): The Documents in this chunk
+        export_type (int): ALL, ER or REL
+
+    Returns:
+        list: The list of (dict)Documents, ordered by pk
+    """
+    documents = Document.objects.as_json(document_pks=document_pks)
+    pmids = dict(Document.objects.filter(pk__in=document_pks).values_list('pk', 'document_id'))
+
+    passages = {}
+    for doc in documents:
+        doc['pmid'] = pmids.get(doc['pk'])
+        doc['relations'] = []
+        for passage in doc['passages']:
+            passage['annotations'] = []
+            passages[passage['pk']] = passage
+
+    if export_type in (ALL, ER):
+        for ann in _fetch_rows('document/get-ner-results',
+                               ['pk', 'type_idx', 'text', 'start', 'created', 'document_pk',
+                                'pmid', 'section_pk', 'user_id'],
+                               content_type_id=ContentType.objects.get_for_model(EntityRecognitionAnnotation).id,
+                               document_pks=document_pks, all_users=True, user_pks=[]):
+            passage = passages.get(ann['section_pk'])
+            if passage is not None:
+                passage['annotations'].append({
+                    'uid': str(ann['pk']), 'source': 'db', 'user_id': ann['user_id'],
+                    'type_id': ann['type_idx'], 'text': ann['text'],
+                    'start': passage['offset'] + ann['start'], 'length': len(ann['text'])})
+
+        for ann in Document.objects._pubtator_annotations(document_pks):
+            passage = passages.get(ann['section_pk'])
+            if passage is not None:
+                passage['annotations'].append({
+                    'uid': ann['uid'], 'source': 'identifier', 'user_id': -1,
+                    'type_id': PUBTATOR_TYPES.index(ann['ann_type']), 'text': ann['text'],
+                    'start': ann['start'], 'length': len(ann['text'])})
+
+        for passage in passages.values():
+            passage['annotations'].sort(key=lambda x: x['start'])
+
+    if export_type in (ALL, REL):
+        documents_by_pk = {doc['pk']: doc for doc in documents}
+        for rel in _fetch_rows('download/get-export-relation-annotations',
+                               ['document_pk', 'relation_id', 'relation_type',
+                                'concept_1_id', 'concept_2_id', 'answer', 'user_id'],
+                               content_type_id=ContentType.objects.get_for_model(RelationAnnotation).id,
+                               document_pks=document_pks):
+            documents_by_pk[rel['document_pk']]['relations'].append(rel)
+
+    return documents
+
+
+class BioCFormat(object):
+    """Writes each (dict)Document as a BioC <document> so the collection
+        can be built one chunk at a time
+    """
+    extension = 'xml'
+
+    def header(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<!DOCTYPE collection SYSTEM "BioC.dtd">'
+                '<collection><source>Mark2Cure</source>'
+                '<date>{0}</date><key>collection.key</key>').format(timezone.now().strftime('%Y%m%d')).encode('utf-8')
+
+    def footer(self):
+        return b'</collection>'
+
+    def document(self, doc):
+        document = ET.Element('document')
+        ET.SubElement(document, 'id').text = str(doc['pmid'])
+        ET.SubElement(document, 'infon', key='document_pk').text = str(doc['pk'])
+
+        for passage_dict in doc['passages']:
+            passage = ET.SubElement(document, 'passage')
+            ET.SubElement(passage, 'infon', key='type').text = SECTION_TYPES.get(passage_dict['section'], 'paragraph')
+            ET.SubElement(passage, 'infon', key='id').text = str(passage_dict['pk'])
+            ET.SubElement(passage, 'offset').text = str(passage_dict['offset'])
+            ET.SubElement(passage, 'text').text = passage_dict['text']
+
+            for ann_idx, ann in enumerate(passage_dict['annotations']):
+                annotation = ET.SubElement(passage, 'annotation', id=str(ann_idx))
+                ET.SubElement(annotation, 'infon', key='uid').text = str(ann['uid'])
+                ET.SubElement(annotation, 'infon', key='source').text = ann['source']
+                ET.SubElement(annotation, 'infon', key='user_id').text = str(ann['user_id'])
+                ET.SubElement(annotation, 'infon', key='type').text = ANN_TYPES[ann['type_id']]
+                ET.SubElement(annotation, 'infon', key='type_id').text = str(ann['type_id'])
+                ET.SubElement(annotation, 'location', offset=str(ann['start']), length=str(ann['length']))
+                ET.SubElement(annotation, 'text').text = ann['text']
+
+        for rel_idx, rel in enumerate(doc['relations']):
+            relation = ET.SubElement(document, 'relation', id='R{0}'.format(rel_idx))
+            ET.SubElement(relation, 'infon', key='event-type').text = rel['answer']
+            ET.SubElement(relation, 'infon', key='relation-type').text = rel['relation_type']
+            ET.SubElement(relation, 'infon', key='user_id').text = str(rel['user_id'])
+            ET.SubElement(relation, 'node', refid=str(rel['concept_1_id']), role='')
+            ET.SubElement(relation, 'node', refid=str(rel['concept_2_id']), role='')
+
+        return ET.tostring(document, encoding='unicode').encode('utf-8')
+
+
+class JSONLFormat(object):
+    """One JSON (dict)Document per line
+    """
+    extension = 'jsonl'
+
+    def header(self):
+        return b''
+
+    def footer(self):
+        return b''
+
+    def document(self, doc):
+        return json.dumps(doc, default=str).encode('utf-8') + b'\n'
+
+
+EXPORT_FORMATS = {
+    'bioc': BioCFormat,
+    'jsonl': JSONLFormat
+}
+
+
+def export_documents(download, document_pks: List[int], export_type=ALL, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream the Documents into default_storage a chunk at a time
+
+        Every chunk is written to its own part file and recorded on the
+        Download, so an interrupted export resumes after the last written
+        chunk. The parts are concatenated into the final file at the end.
+
+    Args:
+        download (Download): The export being written
+        documents_pks (list): The Documents to export
+        export_type (int): ALL, ER or REL
+        chunk_size (int): Number of Documents held in memory at once
+
+    Returns:
+        str: The storage location of the completed export
+    """
+    export_format = EXPORT_FORMATS[download.export_format]()
+    document_pks = sorted(set(document_pks))
+    chunks = [document_pks[i:i + chunk_size] for i in range(0, len(document_pks), chunk_size)]
+    part_location = 'downloads/data/export-{0}-part-{1:05d}.' + export_format.extension
+
+    for chunk_idx, chunk in enumerate(chunks):
+        if chunk_idx < download.chunks_written:
+            continue
+
+        with default_storage.open(part_location.format(download.pk, chunk_idx), 'wb') as handle:
+            for doc in export_chunk(chunk, export_type=export_type):
+                handle.write(export_format.document(doc))
+
+        download.chunks_written = chunk_idx + 1
+        download.save(update_fields=['chunks_written'])
+
+    save_location = 'downloads/data/{0}-{1}.{2}'.format(
+        download.export_format, timezone.now().strftime('%Y-%m-%d-%H-%M-%S'), export_format.extension)
+
+    with default_storage.open(save_location, 'wb') as handle:
+        handle.write(export_format.header())
+        for chunk_idx in range(len(chunks)):
+            with default_storage.open(part_location.format(download.pk, chunk_idx), 'rb') as part:
+                shutil.copyfileobj(part, handle)
+        handle.write(export_format.footer())
+
+    for chunk_idx in range(len(chunks)):
+        default_storage.delete(part_location.format(download.pk, chunk_idx))
+
+    download.file = save_location
+    download.completed = True
+    download.save(update_fields=['file', 'completed'])
+    return save_location
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('download', '0002_auto_20160928_1147'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='download',
+            name='chunks_written',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='download',
+            name='completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='download',
+            name='export_format',
+            field=models.CharField(choices=[('bioc', 'BioC XML'), ('jsonl', 'JSON Lines')], default='bioc', max_length=5),
+        ),
+    ]
@@ -21,6 +21,16 @@ class Download(models.Model):
 
     download_count = models.IntegerField(default=0)
 
+    EXPORT_FORMAT_CHOICES = (
+        ('bioc', 'BioC XML'),
+        ('jsonl', 'JSON Lines'),
+    )
+    export_format = models.CharField(max_length=5, choices=EXPORT_FORMAT_CHOICES, default='bioc')
+
+    # Resume point for the streaming export
+    chunks_written = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
     class Meta:
         app_label = 'download'
 
@@ -1,58 +1,47 @@
 from __future__ import absolute_import
 
 from .models import Download
-from ..document.models import Document
-from ..common.formatter import clean_df, apply_annotations
+from .exporter import export_documents, ALL, ER, REL
 
 # from celery import states
 # from celery.exceptions import SoftTimeLimitExceeded
 # from ..common import celery_app as app
 
-from django.core.files.storage import default_storage
-
-from django.utils import timezone
-import random
-
 
 # @app.task(bind=True, ignore_result=True,
 #           max_retries=1, rate_limit='20/m', soft_time_limit=600,
 #           acks_late=True, track_started=True,
 #           expires=None)
-def group_export(self, document_pks, export_type=0):
-    pass
-#     save_location = 'downloads/data/bioc-{0}.xml'.format(timezone.now().strftime('%Y-%m-%d-%H-%M-%S'))
-#     er_df = None
-#     rel_df = None
-#
-#     try:
-#         # Base BioC writer for all exports
-#         writer = Document.objects.as_writer(documents=document_pks)
-#
-#         if export_type == 0 or export_type == 1:
-#             er_df = clean_df(Document.objects.entity_recognition_df(documents=document_pks, writer=writer))
-#
-#         if export_type == 0 or export_type == 2:
-#             rel_df = Document.objects.re_df(documents=document_pks, user_pks=[])
-#
-#         export_writer = apply_annotations(writer, er_df=er_df, rel_df=rel_df)
-#
-#         with default_storage.open(save_location, 'wb') as handle:
-#             handle.write(export_writer.__str__())
-#
-#         d = Download.objects.create(
-#             task_er=True if export_type == 0 or export_type == 1 else False,
-#             task_rel=True if export_type == 0 or export_type == 2 else False,
-#             file=save_location
-#         )
-#         d.documents = document_pks
-#         d.save()
-#
-#     except SoftTimeLimitExceeded:
-#         return False
-#     except:
-#         self.retry(countdown=int(random.uniform(2, 4) ** self.request.retries))
-#
-#     if not self.request.called_directly:
-#         self.update_state(state=states.SUCCESS, meta=export_writer)
-#         return True
-#
+def group_export(self, document_pks, export_type=ALL, export_format='bioc', download_pk=None):
+    """Export the Documents and their Annotations to default_storage
+
+    Args:
+        document_pks (list): The Documents to export
+        export_type (int): ALL, ER or REL
+        export_format (str): bioc or jsonl
+        download_pk (int): A previous, unfinished Download to resume
+
+    Returns:
+        int: The Download pk
+    """
+    if download_pk:
+        download = Download.objects.get(pk=download_pk)
+        if download.completed:
+            return download.pk
+        document_pks = list(download.documents.values_list('pk', flat=True))
+        # Resume with what the Download was started for
+        if download.task_er and download.task_rel:
+            export_type = ALL
+        elif download.task_er:
+            export_type = ER
+        else:
+            export_type = REL
+    else:
+        download = Download.objects.create(
+            task_er=export_type in (ALL, ER),
+            task_rel=export_type in (ALL, REL),
+            export_format=export_format)
+        download.documents = document_pks
+
+    export_documents(download, document_pks, export_type=export_type)
+    return download.pk
@@ -0,0 +1,94 @@
+from django.core.urlresolvers import reverse
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from ..document.models import Document, Section
+from .models import Download
+from .exporter import export_documents, ER, REL
+from .tasks import group_export
+
+import xml.etree.ElementTree as ET
+import tempfile
+import shutil
+import json
+import mock
+import os
+
+EXPORT_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage', MEDIA_ROOT=EXPORT_ROOT)
+class Export(TestCase):
+
+    def setUp(self):
+        os.makedirs(os.path.join(EXPORT_ROOT, 'downloads/data'))
+        self.document_pks = []
+        for pmid in (101, 102, 103):
+            document = Document.objects.create(document_id=pmid, title='Title {0}'.format(pmid), authors='Author')
+            Section.objects.create(kind='t', text='Title {0}'.format(pmid), document=document)
+            self.document_pks.append(document.pk)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(EXPORT_ROOT, 'downloads'))
+
+    def start_download(self, export_format, **kwargs):
+        download = Download.objects.create(task_er=True, export_format=export_format, **kwargs)
+        download.documents = self.document_pks
+        return download
+
+    def read_export(self, download):
+        with default_storage.open(download.file.name, 'rb') as handle:
+            content = handle.read().decode('utf-8')
+        default_storage.delete(download.file.name)
+        return content
+
+    def test_export_bioc_in_chunks(self):
+        download = self.start_download('bioc')
+        export_documents(download, self.document_pks, export_type=ER, chunk_size=2)
+
+        download.refresh_from_db()
+        self.assertTrue(download.completed)
+        self.assertEqual(download.chunks_written, 2)
+
+        collection = ET.fromstring(self.read_export(download).split('<!DOCTYPE collection SYSTEM "BioC.dtd">')[1])
+        self.assertEqual([doc.find('id').text for doc in collection.findall('document')], ['101', '102', '103'])
+        self.assertEqual(collection.find('document/passage/text').text, 'Title 101')
+
+        # The part files are removed once concatenated
+        self.assertFalse(default_storage.exists('downloads/data/export-{0}-part-00000.xml'.format(download.pk)))
+
+    def test_export_jsonl_in_chunks(self):
+        download = self.start_download('jsonl')
+        export_documents(download, self.document_pks, export_type=ER, chunk_size=2)
+
+        download.refresh_from_db()
+        self.assertEqual(download.chunks_written, 2)
+        documents = [json.loads(line) for line in self.read_export(download).splitlines()]
+        self.assertEqual([doc['pmid'] for doc in documents], [101, 102, 103])
+        self.assertEqual([doc['pk'] for doc in documents], self.document_pks)
+
+    def test_resume_after_written_chunks(self):
+        download = self.start_download('jsonl', chunks_written=1)
+        with default_storage.open('downloads/data/export-{0}-part-00000.jsonl'.format(download.pk), 'wb') as handle:
+            handle.write(b'{"pmid": "written before"}\n')
+
+        export_documents(download, self.document_pks, export_type=ER, chunk_size=2)
+
+        # The first chunk isn't exported again
+        documents = [json.loads(line) for line in self.read_export(download).splitlines()]
+        self.assertEqual([doc['pmid'] for doc in documents], ['written before', 103])
+
+    def test_resume_keeps_export_type(self):
+        download = Download.objects.create(task_rel=True, export_format='jsonl')
+        download.documents = self.document_pks
+
+        with mock.patch('mark2cure.download.tasks.export_documents') as export:
+            self.assertEqual(group_export(None, [], download_pk=download.pk), download.pk)
+        args, kwargs = export.call_args
+        self.assertEqual(sorted(args[1]), self.document_pks)
+        self.assertEqual(kwargs, {'export_type': REL})
+
+    def test_start_export_rejects_unknown_format(self):
+        response = self.client.post(reverse('download:export'), {'task_type': 'er', 'export_format': 'csv'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Download.objects.exists())
@@ -3,6 +3,7 @@ from ..common.models import Group
 from ..task.relation.models import RelationGroup
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import redirect
+from django.http import HttpResponseBadRequest
 
 from .models import Download
 from .tasks import group_export
@@ -22,16 +23,20 @@ def start_export(request):
     task_type = request.POST.get('task_type')
     group_pk = request.POST.get('group_pk')
     document_pks = request.POST.get('document_pks')
+    export_format = request.POST.get('export_format', 'bioc')
     ALL = 0
     ER = 1
     REL = 2
 
+    if export_format not in dict(Download.EXPORT_FORMAT_CHOICES):
+        return HttpResponseBadRequest('Unknown export format')
+
     if task_type == 'er':
         group = Group.objects.get(pk=group_pk)
         docs = group.get_documents()
         group_export.apply_async(
             args=[list(docs.values_list('pk', flat=True))],
-            kwargs={'export_type': ER},
+            kwargs={'export_type': ER, 'export_format': export_format},
             queue='mark2cure_downloads')
 
     elif task_type == 'rel':
@@ -39,13 +44,13 @@ def start_export(request):
         docs = group.documents.all()
         group_export.apply_async(
             args=[list(docs.values_list('pk', flat=True))],
-            kwargs={'export_type': REL},
+            kwargs={'export_type': REL, 'export_format': export_format},
             queue='mark2cure_downloads')
 
     else:
         group_export.apply_async(
             args=[document_pks],
-            kwargs={'export_type': ALL},
+            kwargs={'export_type': ALL, 'export_format': export_format},
             queue='mark2cure_downloads')
 
     return redirect('download:home')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from mark2cure.score.models import PointBucket, ScoreLedger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the score ledger (and the leaderboard buckets) from the Points and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_pks',
+                            help='Only rebuild this user, may be repeated')
+        parser.add_argument('--skip-buckets', action='store_true', default=False)
+
+    def handle(self, *args, **options):
+        user_pks = options['user_pks']
+
+        ledgers = ScoreLedger.objects.all()
+        if user_pks is not None:
+            ledgers = ledgers.filter(user_id__in=user_pks)
+        before = dict(((ledger.user_id, ledger.content_type_id, ledger.category), ledger.amount) for ledger in ledgers)
+
+        after = ScoreLedger.objects.rebuild(user_pks=user_pks)
+
+        drifted = sorted(set(key for key in set(before) | set(after) if before.get(key, 0) != after.get(key, 0)))
+        for user_pk, content_type_id, category in drifted:
+            key = (user_pk, content_type_id, category)
+            self.stdout.write('user {0} content_type {1} {2}: {3} >> {4}'.format(
+                user_pk, content_type_id, category or '-', before.get(key, 0), after.get(key, 0)))
+
+        self.stdout.write('Rebuilt {0} ledger rows, {1} had drifted'.format(len(after), len(drifted)))
+
+        if not options['skip_buckets'] and user_pks is None:
+            self.stdout.write('Rebuilt {0} leaderboard buckets'.format(PointBucket.objects.rebuild()))
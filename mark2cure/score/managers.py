@@ -0,0 +1,195 @@
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+import datetime
+
+# Staff accounts that are never ranked
+LEADERBOARD_EXCLUDED_USERS = [5, 160]
+
+# Games a Point can be earned in
+ENTITY_RECOGNITION = 'entity_recognition'
+RELATION = 'relation'
+
+
+def point_category(content_type_id: int, object_id, is_quest_task, is_relation_view) -> str:
+    """The game a Point was earned in, using the same rules UserProfile.score filtered by
+
+    Args:
+        content_type_id (int): ContentType of the Point's job
+        object_id (int): The job's pk, may be None
+        is_quest_task (callable): object_id >> if it is a Quest Task
+        is_relation_view (callable): object_id >> if it is the user's relation View
+
+    Returns:
+        str: ENTITY_RECOGNITION, RELATION or an empty string for neither
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from ..document.models import View
+    from ..task.models import Task
+    from ..task.entity_recognition.models import EntityRecognitionAnnotation
+    from ..task.relation.models import RelationAnnotation
+
+    def get_id(model):
+        return ContentType.objects.get_for_model(model).id
+
+    if object_id is None or content_type_id == get_id(EntityRecognitionAnnotation):
+        return ENTITY_RECOGNITION
+    if content_type_id == get_id(Task) and is_quest_task(object_id):
+        return ENTITY_RECOGNITION
+    if content_type_id == get_id(RelationAnnotation):
+        return RELATION
+    if content_type_id == get_id(View) and is_relation_view(object_id):
+        return RELATION
+    return ''
+
+
+def _grouped_points(points):
+    """Sum the Points per (user, content_type, object_id) in the database"""
+    for row in points.order_by().values('user_id', 'content_type_id', 'object_id').annotate(
+            amount=Sum('amount'), points=Count('pk')).iterator():
+        yield (row['user_id'], row['content_type_id'], row['object_id']), row
+
+
+class ScoreLedgerManager(models.Manager):
+
+    def add(self, point):
+        """Add a new Point to its user's running score"""
+        from ..document.models import View
+        from ..task.models import Task
+
+        category = point_category(
+            point.content_type_id, point.object_id,
+            lambda task_pk: Task.objects.filter(pk=task_pk, kind=Task.QUEST).exists(),
+            lambda view_pk: View.objects.filter(pk=view_pk, user_id=point.user_id, task_type='ri').exists())
+
+        with transaction.atomic():
+            lookup = {'user_id': point.user_id, 'content_type_id': point.content_type_id, 'category': category}
+            if not self.filter(**lookup).update(amount=F('amount') + point.amount, points=F('points') + 1):
+                ledger, created = self.get_or_create(defaults={'amount': point.amount, 'points': 1}, **lookup)
+                if not created:
+                    self.filter(pk=ledger.pk).update(amount=F('amount') + point.amount, points=F('points') + 1)
+
+    def score(self, user_pk: int, category: str=None) -> float:
+        """Total points of the user, optionally only for a game"""
+        ledgers = self.filter(user_id=user_pk)
+        if category is not None:
+            ledgers = ledgers.filter(category=category)
+        return ledgers.aggregate(score=Sum('amount'))['score'] or 0
+
+    def rebuild(self, user_pks=None):
+        """Recompute the ledger from the Points in bulk
+
+        Args:
+            user_pks (list): Only rebuild these users, all if None
+
+        Returns:
+            dict: (user_pk, content_type_id, category) >> amount of the rebuilt ledger
+        """
+        from ..document.models import View
+        from ..task.models import Task
+        from .models import Point
+
+        quest_task_pks = set(Task.objects.filter(kind=Task.QUEST).values_list('pk', flat=True))
+        relation_views = set(View.objects.filter(task_type='ri').values_list('pk', 'user_id'))
+
+        points = Point.objects.all()
+        if user_pks is not None:
+            points = points.filter(user_id__in=user_pks)
+
+        totals = {}
+        for (user_pk, content_type_id, object_id), row in _grouped_points(points):
+            key = (user_pk, content_type_id, point_category(
+                content_type_id, object_id,
+                lambda task_pk: task_pk in quest_task_pks,
+                lambda view_pk: (view_pk, user_pk) in relation_views))
+            amount, count = totals.get(key, (0, 0))
+            totals[key] = (amount + row['amount'], count + row['points'])
+
+        with transaction.atomic():
+            ledgers = self.all()
+            if user_pks is not None:
+                ledgers = ledgers.filter(user_id__in=user_pks)
+            ledgers.delete()
+            self.bulk_create([self.model(user_id=user_pk, content_type_id=content_type_id, category=category,
+                                         amount=amount, points=count)
+                              for (user_pk, content_type_id, category), (amount, count) in totals.items()], batch_size=1000)
+
+        return {key: amount for key, (amount, count) in totals.items()}
+
+
+class PointBucketManager(models.Manager):
+
+    def add(self, user_pk: int, day: datetime.date, amount: float):
+        """Add an amount to the user's bucket for the day, creating it when missing"""
+        with transaction.atomic():
+            if not self.filter(user_id=user_pk, day=day).update(amount=F('amount') + amount):
+                bucket, created = self.get_or_create(user_id=user_pk, day=day, defaults={'amount': amount})
+                if not created:
+                    self.filter(pk=bucket.pk).update(amount=F('amount') + amount)
+
+    def rebuild(self, since: datetime.date=None):
+        """Recompute the buckets from the Points, optionally only from a day onwards
+
+        Returns:
+            int: Number of buckets written
+        """
+        from .models import Point
+
+        points = Point.objects.all()
+        if since:
+            points = points.filter(created__gte=timezone.make_aware(datetime.datetime.combine(since, datetime.time.min)))
+
+        buckets = {}
+        for user_pk, created, amount in points.values_list('user_id', 'created', 'amount').iterator():
+            key = (user_pk, timezone.localtime(created).date())
+            buckets[key] = buckets.get(key, 0) + amount
+
+        with transaction.atomic():
+            old_buckets = self.all()
+            if since:
+                old_buckets = old_buckets.filter(day__gte=since)
+            old_buckets.delete()
+            self.bulk_create([self.model(user_id=user_pk, day=day, amount=amount)
+                              for (user_pk, day), amount in buckets.items()], batch_size=1000)
+
+        return len(buckets)
+
+    def window_start(self, days: int) -> datetime.date:
+        """First day included in a leaderboard of the last days"""
+        return timezone.localtime(timezone.now()).date() - datetime.timedelta(days=days)
+
+    def users_with_score(self, days=30):
+        """Users ranked by the points earned within the window
+
+        Returns:
+            QuerySet: Users annotated with score, highest first
+        """
+        return User.objects.filter(
+            point_buckets__day__gt=self.window_start(days)
+        ).exclude(
+            pk__in=LEADERBOARD_EXCLUDED_USERS
+        ).annotate(score=Sum('point_buckets__amount')).order_by('-score')
+
+    def teams_with_score(self, days=30):
+        """Teams ranked by the points their members earned within the window
+
+            Summed from the members' buckets, so an excluded user only
+            takes away their own points and not their whole team
+
+        Returns:
+            list: Teams with a score attribute, highest first
+        """
+        from ..userprofile.models import Team
+
+        scores = dict(self.filter(
+            day__gt=self.window_start(days), user__userprofile__team__isnull=False
+        ).exclude(
+            user__in=LEADERBOARD_EXCLUDED_USERS
+        ).order_by().values_list('user__userprofile__team').annotate(score=Sum('amount')))
+
+        teams = list(Team.objects.filter(pk__in=scores.keys()).order_by('pk'))
+        for team in teams:
+            team.score = scores[team.pk]
+        return sorted(teams, key=lambda team: team.score, reverse=True)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_point_buckets(apps, schema_editor):
+    Point = apps.get_model('score', 'Point')
+    PointBucket = apps.get_model('score', 'PointBucket')
+
+    buckets = {}
+    for user_pk, created, amount in Point.objects.values_list('user_id', 'created', 'amount').iterator():
+        key = (user_pk, timezone.localtime(created).date())
+        buckets[key] = buckets.get(key, 0) + amount
+
+    PointBucket.objects.bulk_create([PointBucket(user_id=user_pk, day=day, amount=amount)
+                                     for (user_pk, day), amount in buckets.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('score', '0005_auto_20160706_1331'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('amount', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pointbucket',
+            unique_together=set([('user', 'day')]),
+        ),
+        migrations.RunPython(fill_point_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_score_ledger(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Point = apps.get_model('score', 'Point')
+    ScoreLedger = apps.get_model('score', 'ScoreLedger')
+    Task = apps.get_model('task', 'Task')
+    View = apps.get_model('document', 'View')
+
+    content_type_ids = dict(((ct.app_label, ct.model), ct.pk) for ct in ContentType.objects.all())
+    er_ann_id = content_type_ids.get(('entity_recognition', 'entityrecognitionannotation'))
+    rel_ann_id = content_type_ids.get(('relation', 'relationannotation'))
+    task_id = content_type_ids.get(('task', 'task'))
+    view_id = content_type_ids.get(('document', 'view'))
+
+    quest_task_pks = set(Task.objects.filter(kind='q').values_list('pk', flat=True))
+    relation_views = set(View.objects.filter(task_type='ri').values_list('pk', 'user_id'))
+
+    totals = {}
+    for row in Point.objects.order_by().values('user_id', 'content_type_id', 'object_id').annotate(
+            amount=Sum('amount'), points=Count('pk')).iterator():
+        content_type_id, object_id = row['content_type_id'], row['object_id']
+        if object_id is None or content_type_id == er_ann_id or (content_type_id == task_id and object_id in quest_task_pks):
+            category = 'entity_recognition'
+        elif content_type_id == rel_ann_id or (content_type_id == view_id and (object_id, row['user_id']) in relation_views):
+            category = 'relation'
+        else:
+            category = ''
+
+        key = (row['user_id'], content_type_id, category)
+        amount, count = totals.get(key, (0, 0))
+        totals[key] = (amount + row['amount'], count + row['points'])
+
+    ScoreLedger.objects.bulk_create([ScoreLedger(user_id=user_pk, content_type_id=content_type_id, category=category,
+                                                 amount=amount, points=count)
+                                     for (user_pk, content_type_id, category), (amount, count) in totals.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('document', '0010_document_revision'),
+        ('task', '0006_userquestdocumentprogress'),
+        ('score', '0006_pointbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreLedger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, default='', max_length=20)),
+                ('amount', models.FloatField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_ledgers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='scoreledger',
+            unique_together=set([('user', 'content_type', 'category')]),
+        ),
+        migrations.RunPython(fill_score_ledger, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from .managers import PointBucketManager, ScoreLedgerManager
 
 AUTH_USER_MODEL = getattr(settings, 'AUTH_USER_MODEL', 'auth.User')
 
@@ -23,5 +26,58 @@ class Point(models.Model):
         ordering = ('-updated',)
         app_label = 'score'
 
+    def save(self, *args, **kwargs):
+        # The bucket and ledger only ever hold Points that were stored
+        with transaction.atomic():
+            created = self.pk is None
+            super(Point, self).save(*args, **kwargs)
+            if created:
+                PointBucket.objects.add(self.user_id, timezone.localtime(self.created).date(), self.amount)
+                ScoreLedger.objects.add(self)
+
     def __unicode__(self):
         return '{0}'.format(self.id)
+
+
+class PointBucket(models.Model):
+    """Points a user earned on a day, summed for the leaderboard windows
+        instead of the individual Points
+    """
+    user = models.ForeignKey(AUTH_USER_MODEL, related_name='point_buckets')
+    day = models.DateField(db_index=True)
+    amount = models.FloatField(default=0)
+
+    objects = PointBucketManager()
+
+    class Meta:
+        unique_together = ('user', 'day')
+        app_label = 'score'
+
+    def __unicode__(self):
+        return u'{0} on {1}'.format(self.user_id, self.day)
+
+
+class ScoreLedger(models.Model):
+    """Running total of a user's Points per ContentType and game, so a
+        score never has to sum the individual Points
+    """
+    user = models.ForeignKey(AUTH_USER_MODEL, related_name='score_ledgers')
+
+    from django.contrib.contenttypes.models import ContentType
+    content_type = models.ForeignKey(ContentType)
+    # entity_recognition, relation or blank
+    category = models.CharField(max_length=20, blank=True, default='')
+
+    amount = models.FloatField(default=0)
+    points = models.IntegerField(default=0)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = ScoreLedgerManager()
+
+    class Meta:
+        unique_together = ('user', 'content_type', 'category')
+        app_label = 'score'
+
+    def __unicode__(self):
+        return u'{0} {1}: {2}'.format(self.user_id, self.category, self.amount)
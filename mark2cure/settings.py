@@ -303,6 +303,12 @@ ENTITY_RECOGNITION_DOC_POINTS = 1000
 RELATION_REL_POINTS = 75
 RELATION_DOC_POINTS = 1000
 
+# New annotations on a group before its network snapshot is rebuilt
+NETWORK_SNAPSHOT_THRESHOLD = 100
+
+# Seconds a leaderboard window is served from the cache
+LEADERBOARD_CACHE_TIMEOUT = 60 * 5
+
 # Email settings management
 DEFAULT_FROM_EMAIL = 'Mark2Cure <contact@mark2cure.org>'
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
@@ -3,25 +3,7 @@ SELECT `quest_documents`.`document_id`,
 
         COUNT(`document_view`.`id`) as `view_count`,
         IF(SUM(`document_view`.`completed`) = 2, true, false) as `document_view_completed`,
-        IF(SUM(`document_view`.`opponent_id`) IS NULL, false, true) as `had_opponent`,
-        (
-          SELECT `document_pubtator`.`content`
-          FROM `document_pubtator`
-          WHERE `document_pubtator`.`document_id` = `quest_documents`.`document_id` AND `document_pubtator`.`kind` = 'DNorm'
-          LIMIT 1
-        ) as `disease`,
-        (
-          SELECT `document_pubtator`.`content`
-          FROM `document_pubtator`
-          WHERE `document_pubtator`.`document_id` = `quest_documents`.`document_id` AND `document_pubtator`.`kind` = 'GNormPlus'
-          LIMIT 1
-        ) as `gene`,
-        (
-          SELECT `document_pubtator`.`content`
-          FROM `document_pubtator`
-          WHERE `document_pubtator`.`document_id` = `quest_documents`.`document_id` AND `document_pubtator`.`kind` = 'tmChem'
-          LIMIT 1
-        ) as `drug`
+        IF(SUM(`document_view`.`opponent_id`) IS NULL, false, true) as `had_opponent`
 
 FROM (
   SELECT DISTINCT `task_documentquestrelationship`.`document_id`,
@@ -35,9 +17,9 @@ FROM (
 
   LEFT JOIN `task_userquestrelationship`
       ON `task_userquestrelationship`.`task_id` = `task_documentquestrelationship`.`task_id`
-      AND `task_userquestrelationship`.`user_id` = {user_id}
+      AND `task_userquestrelationship`.`user_id` = %(user_id)s
 
-  WHERE `task_documentquestrelationship`.`task_id` = {task_id}
+  WHERE `task_documentquestrelationship`.`task_id` = %(task_id)s
   ORDER BY `task_documentquestrelationship`.`document_id` ASC
 ) as `quest_documents`
 
@@ -21,6 +21,6 @@ INNER JOIN `document_view`
 INNER JOIN `document_annotation`
   ON `document_annotation`.`view_id` = `document_view`.`id`
 
-WHERE `task_task`.`id` = {task_id} AND `dqr`.`document_id` = {document_id}
+WHERE `task_task`.`id` = %(task_id)s AND `dqr`.`document_id` = %(document_id)s
 
 GROUP BY `uqr`.`user_id`
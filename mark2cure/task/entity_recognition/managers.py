@@ -1,9 +1,34 @@
 from django.db import models
 from django.utils.html import escape
 
+import uuid
+
 
 class EntityRecognitionAnnotationManager(models.Manager):
 
+    def bulk_create_with_pks(self, annotations):
+        """Insert the annotations with a single query and assign their pks
+
+            bulk_create doesn't return the pks on MySQL, so the rows are
+            tagged with a marker unique to this call and read back by it.
+            A multi row INSERT assigns increasing pks in the order of its
+            rows, so the pks sorted line up with the annotations given.
+        """
+        if not len(annotations):
+            return annotations
+
+        submission = uuid.uuid4().hex
+        for ann in annotations:
+            ann.submission = submission
+        self.bulk_create(annotations)
+
+        pks = list(self.filter(submission=submission).order_by('pk').values_list('pk', flat=True))
+        if len(pks) != len(annotations):
+            raise ValueError('Inserted {0} annotations but read back {1}'.format(len(annotations), len(pks)))
+        for pk, ann in zip(pks, annotations):
+            ann.pk = pk
+        return annotations
+
     def document_pks_by_text_and_document_pks(self, text, document_pks, content_type_id):
         '''(TODO) Remove from Talk Page'''
         res = self.raw("""
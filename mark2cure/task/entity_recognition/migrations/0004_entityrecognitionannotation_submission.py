@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entity_recognition', '0003_remove_entityrecognitionannotation_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entityrecognitionannotation',
+            name='submission',
+            field=models.CharField(blank=True, db_index=True, max_length=32, null=True),
+        ),
+    ]
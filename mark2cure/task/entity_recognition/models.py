@@ -22,5 +22,8 @@ class EntityRecognitionAnnotation(models.Model):
     # to the section, not the entire document
     start = models.IntegerField(blank=True, null=True)
 
+    # Shared by the annotations inserted together, to read back their pks
+    submission = models.CharField(max_length=32, blank=True, null=True, db_index=True)
+
     objects = EntityRecognitionAnnotationManager()
 
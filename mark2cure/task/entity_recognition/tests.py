@@ -6,8 +6,6 @@ from ...common.models import Group
 from ...document.models import Annotation
 from ...test_base.test_base import TestBase
 
-from ...common.bioc import BioCReader
-
 
 class DocumentSubmissionsAPIViews(TestCase, TestBase):
     fixtures = ['tests_documents.json', 'tests_common.json']
@@ -24,6 +22,7 @@ class DocumentSubmissionsAPIViews(TestCase, TestBase):
         cls.user_annotation_list = []
 
     def test_document_as_bioc_for_pairing(self):
+        from ...common.bioc import BioCReader
         self.create_new_user_accounts(self.user_names)
 
         # Ensure the player views the Q but can't match b/c no Anns exist
@@ -42,7 +41,7 @@ class DocumentSubmissionsAPIViews(TestCase, TestBase):
         self.assertEqual(UserQuestRelationship.objects.count(), 1)
 
         # Ensure this returns a 500 for the player b/c there are no submissions yet
-        print 'doc.pk', doc.pk
+        print('doc.pk', doc.pk)
         response = self.client.get(reverse('task-entity-recognition:results-bioc',
                                            kwargs={'task_pk': self.task.pk,
                                            'doc_pk': doc.pk, 'format_type': 'xml'}))
@@ -167,3 +166,77 @@ class DocumentSubmissionsAPIViews(TestCase, TestBase):
                                     'document_pk': doc.pk}),
                                     follow=True)
         self.client.logout()
+
+
+class ScoreAnnotations(TestCase):
+
+    def test_score_annotations(self):
+        from .utils import score_annotations
+
+        user_anns = [{'start': 0, 'text': 'BRCA1', 'type_idx': 0},
+                     {'start': 10, 'text': 'cancer', 'type_idx': 1},
+                     {'start': 30, 'text': 'tumor', 'type_idx': 1}]
+        gm_anns = [{'start': 0, 'text': 'BRCA1', 'type_idx': 0},
+                   {'start': 10, 'text': 'cancer', 'type_idx': 2},
+                   {'start': 50, 'text': 'aspirin', 'type_idx': 2}]
+
+        score, tps, fps, fns = score_annotations(user_anns, gm_anns)
+        self.assertEqual(tps, [gm_anns[0]])
+        self.assertEqual(fps, user_anns[1:])
+        self.assertEqual(fns, gm_anns[1:])
+        self.assertAlmostEqual(score[2], 1 / 3.)
+
+        score, tps, fps, fns = score_annotations([], gm_anns)
+        self.assertEqual(tps, [])
+        self.assertEqual(fns, gm_anns)
+
+
+class QuestProgress(TestCase):
+
+    def test_progress_follows_quest_documents(self):
+        from django.contrib.auth.models import User
+        from ...document.models import Document
+        from ..models import DocumentQuestRelationship, UserQuestDocumentProgress
+        import mock
+
+        task = Task.objects.create(name='Quest')
+        user = User.objects.create_user('progress-user')
+        documents = [Document.objects.create(document_id=pmid, title='Title', authors='Author') for pmid in (1, 2)]
+        DocumentQuestRelationship.objects.create(task=task, document=documents[0])
+        UserQuestDocumentProgress.objects.create(task=task, user=user, document=documents[0], view_count=2)
+
+        # The stored rows cover the quest's documents and are reused
+        with mock.patch.object(UserQuestDocumentProgress.objects, 'refresh') as refresh:
+            rows = UserQuestDocumentProgress.objects.progress(task.pk, user.pk)
+        self.assertFalse(refresh.called)
+        self.assertEqual([(row['document_id'], row['view_count']) for row in rows], [(documents[0].pk, 2)])
+
+        # A document added to the quest makes them stale
+        DocumentQuestRelationship.objects.create(task=task, document=documents[1])
+        with mock.patch.object(UserQuestDocumentProgress.objects, 'refresh') as refresh:
+            UserQuestDocumentProgress.objects.progress(task.pk, user.pk)
+        refresh.assert_called_once_with(task.pk, user.pk)
+
+        # As does one removed from it
+        DocumentQuestRelationship.objects.filter(task=task).delete()
+        DocumentQuestRelationship.objects.create(task=task, document=documents[1])
+        UserQuestDocumentProgress.objects.create(task=task, user=user, document=documents[1])
+        with mock.patch.object(UserQuestDocumentProgress.objects, 'refresh') as refresh:
+            UserQuestDocumentProgress.objects.progress(task.pk, user.pk)
+        refresh.assert_called_once_with(task.pk, user.pk)
+
+
+class BulkAnnotations(TestCase):
+
+    def test_bulk_create_with_pks(self):
+        from .models import EntityRecognitionAnnotation
+
+        EntityRecognitionAnnotation.objects.create(type_idx=0, text='earlier', start=0)
+        anns = EntityRecognitionAnnotation.objects.bulk_create_with_pks([
+            EntityRecognitionAnnotation(type_idx=idx % 3, text='ann {0}'.format(idx), start=idx) for idx in range(60)])
+
+        # Every annotation got the pk of its own row
+        self.assertEqual(len(set(ann.pk for ann in anns)), 60)
+        stored = dict(EntityRecognitionAnnotation.objects.filter(pk__in=[ann.pk for ann in anns]).values_list('pk', 'text'))
+        self.assertEqual([stored[ann.pk] for ann in anns], ['ann {0}'.format(idx) for idx in range(60)])
+        self.assertEqual(EntityRecognitionAnnotation.objects.bulk_create_with_pks([]), [])
@@ -1,11 +1,10 @@
 from django.contrib.contenttypes.models import ContentType
-from django.db import connection
-
 from ...analysis.tasks import generate_reports
 from ...analysis.models import Report
+from ...common import sql
 from .models import EntityRecognitionAnnotation
 
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import random
 
 
@@ -22,18 +21,10 @@ def select_best_opponent(task_pk: int, document_pk: int, player_pk: int) -> int:
     Returns:
         int: user_pk or None
     """
-    cmd_str = ""
-    with open('mark2cure/task/entity_recognition/commands/get-quest-user-contributions.sql', 'r') as f:
-        cmd_str = f.read()
-    cmd_str = cmd_str.format(task_id=task_pk, document_id=document_pk)
-
-    c = connection.cursor()
-    try:
-        c.execute(cmd_str)
-        queryset = [dict(zip(['group_pk', 'task_pk', 'user_pk',
-                              'quest_completed', 'view_progress', 'total_annotations'], x)) for x in c.fetchall()]
-    finally:
-        c.close()
+    queryset = sql.fetchdicts('task/entity_recognition/get-quest-user-contributions',
+                              ['group_pk', 'task_pk', 'user_pk',
+                               'quest_completed', 'view_progress', 'total_annotations'],
+                              task_id=task_pk, document_id=document_pk)
 
     gm_user_pk = 340
     exclude_user_pks = [107, ]
@@ -88,11 +79,64 @@ def determine_f(true_positive, false_positive, false_negative):
 NER_ANN_MATCHING_KEYS = ['start', 'text', 'type_idx']
 
 
-def match_exact(gm_ann: Dict, user_anns: List[Dict]) -> bool:
-    for user_ann in user_anns:
-        if all([True if user_ann[k] == gm_ann[k] else False for k in NER_ANN_MATCHING_KEYS]):
-            return True
-    return False
+def score_annotations(user_annotations: List[Dict], gm_annotations: List[Dict]):
+    """
+      Compare two lists of (dict)Annotations in linear time by keying them
+      on NER_ANN_MATCHING_KEYS
+
+      1) True Positives are the gm annotations with an exact user match
+      2) False Positives are the user annotations that share neither the start nor the text of a True Positive
+      3) False Negatives are the gm annotations that share neither the start nor the text of a True Positive
+    """
+    user_keys = set(tuple(ann[k] for k in NER_ANN_MATCHING_KEYS) for ann in user_annotations)
+
+    # 1)
+    true_positives = [gm_ann for gm_ann in gm_annotations if tuple(gm_ann[k] for k in NER_ANN_MATCHING_KEYS) in user_keys]
+
+    tp_starts = set(tp['start'] for tp in true_positives)
+    tp_texts = set(tp['text'] for tp in true_positives)
+
+    # 2)
+    false_positives = [ann for ann in user_annotations if ann['start'] not in tp_starts and ann['text'] not in tp_texts]
+
+    # 3)
+    false_negatives = [ann for ann in gm_annotations if ann['start'] not in tp_starts and ann['text'] not in tp_texts]
+
+    score = determine_f(len(true_positives), len(false_positives), len(false_negatives))
+    return (score, true_positives, false_positives, false_negatives)
+
+
+def generate_results_batch(view_pairs: List[Tuple[List[int], List[int]]]) -> List[Tuple]:
+    """
+      Score many (user_view_pks, gm_view_pks) pairs with a single query,
+      intended for offline re-scoring
+
+    Args:
+        view_pairs (list): (user_view_pks, gm_view_pks) to compare
+
+    Returns:
+        list: The generate_results tuple for each of the view_pairs
+    """
+    view_pks = set()
+    for user_view_pks, gm_view_pks in view_pairs:
+        view_pks.update(user_view_pks)
+        view_pks.update(gm_view_pks)
+
+    annotations_by_view = {}
+    if len(view_pks):
+        for ann in sql.fetchdicts('task/entity_recognition/get-ner-annotations-for-views',
+                                  ['view_id', 'section_id', 'completed', 'start', 'type_idx', 'text'],
+                                  content_type_id=ContentType.objects.get_for_model(EntityRecognitionAnnotation).id,
+                                  view_pks=view_pks):
+            annotations_by_view.setdefault(ann['view_id'], []).append(ann)
+
+    results = []
+    for user_view_pks, gm_view_pks in view_pairs:
+        user_annotations = [dict(ann, user=0) for view_pk in user_view_pks for ann in annotations_by_view.get(view_pk, [])]
+        gm_annotations = [dict(ann, user=1) for view_pk in gm_view_pks for ann in annotations_by_view.get(view_pk, [])]
+        results.append(score_annotations(user_annotations, gm_annotations))
+
+    return results
 
 
 def generate_results(user_view_pks: List[int], gm_view_pks: List[int]):
@@ -107,42 +151,4 @@ def generate_results(user_view_pks: List[int], gm_view_pks: List[int]):
      tp  fp
      fn  *tn
     """
-    cmd_str = ""
-    with open('mark2cure/task/entity_recognition/commands/get-ner-annotations-for-scoring-compare.sql', 'r') as f:
-        cmd_str = f.read()
-    cmd_str = cmd_str.format(ct_id=ContentType.objects.get_for_model(EntityRecognitionAnnotation).id,
-                             user_view_ids=','.join([str(x) for x in user_view_pks]),
-                             gm_view_ids=','.join([str(x) for x in gm_view_pks]))
-
-    c = connection.cursor()
-    try:
-        c.execute(cmd_str)
-        queryset = [dict(zip(['user', 'view_id', 'section_id',
-                              'completed', 'start', 'type_idx',
-                              'text'], x)) for x in c.fetchall()]
-    finally:
-        c.close()
-
-    user_annotations = list(filter(lambda x: x['user'] == 0, queryset))
-    gm_annotations = list(filter(lambda x: x['user'] == 1, queryset))
-
-    # 1)
-    true_positives = [gm_ann for gm_ann in gm_annotations if match_exact(gm_ann, user_annotations)]
-
-    # 2)
-    false_positives = user_annotations
-    for tp in true_positives:
-        false_positives = list(filter(lambda ner_ann: ner_ann['start'] != tp['start'] and ner_ann['text'] != tp['text'], false_positives))
-
-    # 3)
-    false_negatives = gm_annotations
-    for tp in true_positives:
-        false_negatives = list(filter(lambda ner_ann: ner_ann['start'] != tp['start'] and ner_ann['text'] != tp['text'], false_negatives))
-
-    # print('-'*6)
-    # print(len(true_positives), len(false_positives))
-    # print(len(false_negatives), '*')
-    # print('-'*6)
-
-    score = determine_f(len(true_positives), len(false_positives), len(false_negatives))
-    return (score, true_positives, false_positives, false_negatives)
+    return generate_results_batch([(user_view_pks, gm_view_pks)])[0]
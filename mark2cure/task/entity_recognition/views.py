@@ -2,6 +2,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
+from django.db import transaction
 
 from rest_framework.generics import ListCreateAPIView
 from rest_framework.decorators import api_view
@@ -13,10 +14,11 @@ from django.http import HttpResponseServerError
 from django.template.response import TemplateResponse
 
 from ...document.models import Document, Annotation
-from ...common.models import Group
+from ...common.models import Group, GroupStats
 from ..models import Level, Task, UserQuestRelationship
 from .models import EntityRecognitionAnnotation
 from .utils import generate_results, select_best_opponent
+from ...analysis.tasks import update_pairwise_comparisons, mark_network_stale
 from ...score.models import Point
 from .serializers import AnnotationSerializer
 
@@ -92,6 +94,62 @@ class NERDocumentSubmissionView(ListCreateAPIView):
     serializer_class = AnnotationSerializer(many=True)
     permission_classes = (permissions.IsAuthenticated,)
 
+    @staticmethod
+    def save_annotations(validated_data, section_views):
+        """Save a submission's Annotations with a bulk insert into each table
+
+        Args:
+            validated_data (list): The serialized annotations
+            section_views (dict): Section pk >> the View the annotation belongs to
+        """
+        er_anns = EntityRecognitionAnnotation.objects.bulk_create_with_pks([EntityRecognitionAnnotation(
+            type_idx=d.get('type_id'),
+            text=d.get('text'),
+            start=d.get('start')) for d in validated_data])
+
+        er_ann_content_type = ContentType.objects.get_for_model(EntityRecognitionAnnotation)
+        Annotation.objects.bulk_create([Annotation(
+            kind='e',
+            view_id=section_views[d.get('section_pk')],
+            content_type=er_ann_content_type,
+            object_id=er_ann.pk) for d, er_ann in zip(validated_data, er_anns)])
+
+    @staticmethod
+    def complete_views(task, document, user, opponent_pk):
+        """Mark the player's Views of the Document completed and paired against the opponent's
+
+        Returns:
+            tuple: The player and opponent View pks, in Section order
+        """
+        player_view_pks = []
+        opponent_view_pks = []
+
+        uqr = task.userquestrelationship_set.filter(user=user).first()
+        player_views = {}
+        for view in uqr.views.filter(user=user, section__document=document).order_by('pk'):
+            player_views.setdefault(view.section_id, view)
+
+        opponent_views = {}
+        if opponent_pk:
+            quest_rel = task.userquestrelationship_set.filter(user_id=opponent_pk).first()
+            for view in quest_rel.views.filter(section__document=document, completed=True).order_by('pk'):
+                opponent_views.setdefault(view.section_id, view)
+
+        for section in document.available_sections():
+            player_view = player_views[section.pk]
+            player_view.completed = True
+
+            # Save who the player was paired against
+            if opponent_pk:
+                opponent_view = opponent_views[section.pk]
+                player_view.opponent = opponent_view
+                opponent_view_pks.append(opponent_view.pk)
+
+            player_view.save(update_fields=['completed', 'opponent'])
+            player_view_pks.append(player_view.pk)
+
+        return player_view_pks, opponent_view_pks
+
     def create(self, request, *args, **kwargs):
         data = request.data
         task = get_object_or_404(Task, pk=self.kwargs['quest_pk'])
@@ -104,59 +162,44 @@ class NERDocumentSubmissionView(ListCreateAPIView):
             if not user_quest_rel:
                 return HttpResponseServerError('User Quest Relationship not found')
 
-            # Submit the Annotations
-            # (TODO) Convert to custom sql bulk
-            er_ann_content_type = ContentType.objects.get_for_model(EntityRecognitionAnnotation)
-            for d in data:
-                view = user_quest_rel.views.filter(section_id=d.get('section_pk'), completed=False).first()
-
-                if not view:
-                    return HttpResponseServerError('View for Annotation not found')
-
-                er_ann = EntityRecognitionAnnotation.objects.create(
-                    type_idx=d.get('type_id'),
-                    text=d.get('text'),
-                    start=d.get('start')
-                )
-                Annotation.objects.create(
-                    kind='e',
-                    view=view,
-                    content_type=er_ann_content_type,
-                    object_id=er_ann.pk)
-
-            # Save opponent comparisons
-            player_view_pks = []
-            opponent_view_pks = []
-            opponent_pk = select_best_opponent(task.pk, document.pk, request.user.pk)
-
-            for section in document.available_sections():
-                uqr = task.userquestrelationship_set.filter(user=request.user).first()
-                player_view = uqr.views.filter(user=request.user, section=section).first()
-                player_view.completed = True
-
-                # Save who the player was paired against
-                if opponent_pk:
-                    quest_rel = task.userquestrelationship_set.filter(user_id=opponent_pk).first()
-                    opponent_view = quest_rel.views.filter(section=section, completed=True).first()
-                    player_view.opponent = opponent_view
-                    opponent_view_pks.append(opponent_view.pk)
+            # Resolve the (first) open View for every Section in one query
+            section_views = {}
+            for section_pk, view_pk in user_quest_rel.views.filter(completed=False).order_by('pk').values_list('section_id', 'pk'):
+                section_views.setdefault(section_pk, view_pk)
 
-                player_view.save()
-                player_view_pks.append(player_view.pk)
+            if not all(d.get('section_pk') in section_views for d in serializer.validated_data):
+                return HttpResponseServerError('View for Annotation not found')
 
-            # Save Earned Points
-            if opponent_pk:
-                results = generate_results(player_view_pks, opponent_view_pks)
-                points = results[0][2] * settings.ENTITY_RECOGNITION_DOC_POINTS  # F Score * Point Multiplier (1000)
-            else:
-                points = settings.ENTITY_RECOGNITION_DOC_POINTS
-
-            Point.objects.create(
-                user=request.user,
-                amount=points,
-                content_type=ContentType.objects.get_for_model(task),
-                object_id=task.id,
-                created=timezone.now())
+            # The annotations, the completed Views and the Points are saved together
+            # so a failed submission can be retried without duplicating anything
+            with transaction.atomic():
+                self.save_annotations(serializer.validated_data, section_views)
+
+                # Save opponent comparisons
+                opponent_pk = select_best_opponent(task.pk, document.pk, request.user.pk)
+                player_view_pks, opponent_view_pks = self.complete_views(task, document, request.user, opponent_pk)
+
+                # Save Earned Points
+                if opponent_pk:
+                    results = generate_results(player_view_pks, opponent_view_pks)
+                    points = results[0][2] * settings.ENTITY_RECOGNITION_DOC_POINTS  # F Score * Point Multiplier (1000)
+                else:
+                    points = settings.ENTITY_RECOGNITION_DOC_POINTS
+
+                Point.objects.create(
+                    user=request.user,
+                    amount=points,
+                    content_type=ContentType.objects.get_for_model(task),
+                    object_id=task.id,
+                    created=timezone.now())
+
+                user_quest_rel.refresh_progress()
+
+                # Keep the running agreement counts for the group current once saved
+                if task.group_id:
+                    annotation_count = len(serializer.validated_data)
+                    transaction.on_commit(lambda: update_pairwise_comparisons(task.group_id, document.pk, request.user.pk))
+                    transaction.on_commit(lambda: mark_network_stale(task.group_id, annotation_count))
 
             # Wrap up
             headers = self.get_success_headers(serializer.data)
@@ -194,6 +237,8 @@ def ner_quest_submit(request, quest_pk):
 
         user_quest_relationship.completed = True
         user_quest_relationship.save()
+        user_quest_relationship.refresh_progress()
+        GroupStats.objects.refresh(group.pk)
 
     return Response({
         'task': {
@@ -229,10 +274,12 @@ def ner_quest(request, quest_pk):
     # Check if user has pre-existing relationship with Quest
     if not UserQuestRelationship.objects.filter(task=task, user=request.user).exists():
         # Create the User >> Quest relationship
-        UserQuestRelationship.objects.create(task=task, user=request.user, completed=False)
+        user_quest_rel = UserQuestRelationship.objects.create(task=task, user=request.user, completed=False)
 
         documents = list(task.documents.all())
         for document in documents:
             task.create_views(document, request.user)
 
+        user_quest_rel.refresh_progress()
+
     return TemplateResponse(request, 'entity_recognition/quest.jade', {'task_pk': task.pk})
@@ -0,0 +1,53 @@
+from django.db import models, transaction
+from typing import List, Dict
+
+from ..common import sql
+
+QUEST_PROGRESS_COLUMNS = ['document_id', 'quest_completed', 'view_count',
+                          'completed', 'had_opponent']
+
+
+class UserQuestDocumentProgressManager(models.Manager):
+
+    def refresh(self, task_pk: int, user_pk: int) -> List[Dict]:
+        """Recompute the quest progression for a user and replace the
+            stored snapshot
+
+        Args:
+            task_pk (int): The Task (Quest)
+            user_pk (int): The User the progress belongs to
+
+        Returns:
+            list: The (dict)Progress rows, ordered by document_id
+        """
+        rows = sql.fetchdicts('task/entity_recognition/get-quest-progression',
+                              QUEST_PROGRESS_COLUMNS,
+                              task_id=task_pk, user_id=user_pk)
+
+        with transaction.atomic():
+            self.filter(task_id=task_pk, user_id=user_pk).delete()
+            self.bulk_create([self.model(
+                task_id=task_pk,
+                user_id=user_pk,
+                document_id=row['document_id'],
+                quest_completed=bool(row['quest_completed']),
+                view_count=row['view_count'],
+                completed=bool(row['completed']),
+                had_opponent=bool(row['had_opponent'])) for row in rows])
+
+        return rows
+
+    def progress(self, task_pk: int, user_pk: int) -> List[Dict]:
+        """The stored quest progression for a user, recomputed when it
+            doesn't cover exactly the Documents currently in the quest
+
+        Returns:
+            list: The (dict)Progress rows, ordered by document_id
+        """
+        from .models import DocumentQuestRelationship
+
+        rows = list(self.filter(task_id=task_pk, user_id=user_pk).order_by('document_id').values(*QUEST_PROGRESS_COLUMNS))
+        quest_document_pks = sorted(set(DocumentQuestRelationship.objects.filter(task_id=task_pk).values_list('document_id', flat=True)))
+        if [row['document_id'] for row in rows] == quest_document_pks:
+            return rows
+        return self.refresh(task_pk, user_pk)
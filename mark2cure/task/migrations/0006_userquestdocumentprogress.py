@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('document', '0009_pubtatorannotation'),
+        ('task', '0005_auto_20160928_1056'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuestDocumentProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quest_completed', models.BooleanField(default=False)),
+                ('view_count', models.IntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('had_opponent', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='document.Document')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='task.Task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='userquestdocumentprogress',
+            unique_together=set([('task', 'user', 'document')]),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from django.db import models
 
+from .managers import UserQuestDocumentProgressManager
+
 
 class Level(models.Model):
     """The Task Type specific Level a user is trained at
@@ -73,6 +75,17 @@ class Task(models.Model):
                 view = View.objects.create(section=sec, user=user)
                 user_quest_rel_views.add(view)
 
+    def documents_json(self):
+        """The user independent (dict)Documents of the Quest, including the
+            Pubtator annotations, served from the document JSON cache
+
+        Returns:
+            list: The list of (dict)Documents, ordered by pk
+        """
+        from ..document.models import Document
+        document_pks = list(self.documents.values_list('pk', flat=True))
+        return Document.objects.as_json_cached(document_pks=document_pks, include_pubtator=True)
+
     def __unicode__(self):
         return self.name
 
@@ -105,6 +118,9 @@ class UserQuestRelationship(models.Model):
             self.completed_views().values_list('section__document', flat=True)
         ))
 
+    def refresh_progress(self):
+        return UserQuestDocumentProgress.objects.refresh(self.task_id, self.user_id)
+
     class Meta:
         get_latest_by = 'updated'
 
@@ -126,3 +142,28 @@ class DocumentQuestRelationship(models.Model):
     def __unicode__(self):
         return u'Document Quest Relationship'
 
+
+class UserQuestDocumentProgress(models.Model):
+    """Materialized progression of a User through each Document of an ER Quest
+
+        Refreshed whenever the User's Views for the Quest change so reading
+        a Quest doesn't have to aggregate the Views on every request
+    """
+    task = models.ForeignKey(Task)
+    user = models.ForeignKey(User)
+    document = models.ForeignKey('document.Document')
+
+    quest_completed = models.BooleanField(default=False)
+    view_count = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    had_opponent = models.BooleanField(default=False)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = UserQuestDocumentProgressManager()
+
+    class Meta:
+        unique_together = ('task', 'user', 'document')
+
+    def __unicode__(self):
+        return u'Quest Document Progress'
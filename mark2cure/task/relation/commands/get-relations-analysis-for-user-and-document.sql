@@ -8,7 +8,7 @@ SELECT  `relation_relation`.`id` as `relation_id`,
             FROM `relation_concepttext`
 
             INNER JOIN `relation_conceptdocumentrelationship`
-              ON `relation_conceptdocumentrelationship`.`document_id` = {document_id}
+              ON `relation_conceptdocumentrelationship`.`document_id` = %(document_id)s
                 AND `relation_conceptdocumentrelationship`.`concept_text_id` = `relation_concepttext`.`id`
 
             WHERE `relation_concepttext`.`concept_id` = `relation_relation`.`concept_1_id`
@@ -23,7 +23,7 @@ SELECT  `relation_relation`.`id` as `relation_id`,
             FROM `relation_concepttext`
 
             INNER JOIN `relation_conceptdocumentrelationship`
-              ON `relation_conceptdocumentrelationship`.`document_id` = {document_id}
+              ON `relation_conceptdocumentrelationship`.`document_id` = %(document_id)s
                 AND `relation_conceptdocumentrelationship`.`concept_text_id` = `relation_concepttext`.`id`
 
             WHERE `relation_concepttext`.`concept_id` = `relation_relation`.`concept_2_id`
@@ -35,7 +35,7 @@ SELECT  `relation_relation`.`id` as `relation_id`,
         `relation_relationannotation`.`answer`,
         `document_view`.`user_id`,
         IF(
-            `document_view`.`user_id` = {user_id}
+            `document_view`.`user_id` = %(user_id)s
         , TRUE, FALSE) as `self`
 
 FROM `relation_relationannotation`
@@ -50,7 +50,7 @@ INNER JOIN `document_annotation`
 INNER JOIN `document_view`
     ON `document_view`.`id` = `document_annotation`.`view_id`
 
-WHERE `relation_relation`.`document_id` = {document_id}
+WHERE `relation_relation`.`document_id` = %(document_id)s
   AND `relation_id` IN (
 
       /*  Subquery to select all the relationship identifiers
@@ -70,10 +70,10 @@ WHERE `relation_relation`.`document_id` = {document_id}
       INNER JOIN `document_view`
           ON `document_view`.`id` = `document_annotation`.`view_id`
 
-      WHERE `relation_relation`.`document_id` = {document_id}
-          AND `document_view`.`user_id` = {user_id}
+      WHERE `relation_relation`.`document_id` = %(document_id)s
+          AND `document_view`.`user_id` = %(user_id)s
     )
-    {relation_logic}
+  AND (%(relation_id)s IS NULL OR `relation_relation`.`id` = %(relation_id)s)
 
 ORDER BY  `relation_id` ASC,
           `answer` ASC,
@@ -0,0 +1,124 @@
+'''
+    Bulk import of the Pubtator concepts behind the Relation tasks. The
+    annotations extracted from the Pubtator responses are read for every
+    Document in one pass, deduplicated in memory and only the missing
+    Concepts, ConceptTexts and ConceptDocumentRelationships are created.
+'''
+
+from django.db import transaction
+
+from ...document.managers import PUBTATOR_TYPES
+from ...document.models import PubtatorAnnotation
+from ...common.formatter import UID_PREFIX_RE
+from .models import Concept, ConceptText, ConceptDocumentRelationship
+
+from typing import List, Dict, Set, Tuple
+import logging
+import time
+import re
+logger = logging.getLogger(__name__)
+
+# Document, Concept and ConceptText pks per IN (...) query
+IMPORT_CHUNK_SIZE = 500
+
+# stype of each PUBTATOR_TYPES entry
+STYPES = ['d', 'g', 'c']
+
+UID_PREFIX = re.compile(UID_PREFIX_RE)
+
+
+def _chunks(items: List, size=IMPORT_CHUNK_SIZE):
+    for idx in range(0, len(items), size):
+        yield items[idx:idx + size]
+
+
+def extract_concepts(document_pks: List[int]) -> Set[Tuple]:
+    """The concept mentions of the Documents, cleaned like clean_df
+
+        Annotations without a uid or with several (comma or pipe separated)
+        are skipped and the MESH: / OMIM: / CHEBI: prefixes are removed
+
+    Returns:
+        set: (document_pk, uid, text, stype)
+    """
+    mentions = set()
+    for document_pks_chunk in _chunks(sorted(set(document_pks))):
+        for document_pk, ann_type, uid, text in PubtatorAnnotation.objects.filter(
+                document_id__in=document_pks_chunk, ann_type__in=PUBTATOR_TYPES).values_list(
+                'document_id', 'ann_type', 'uid', 'text').iterator():
+            if not uid:
+                continue
+            uid = UID_PREFIX.sub('', uid)
+            if ',' in uid or '|' in uid:
+                continue
+            mentions.add((document_pk, uid, text, STYPES[PUBTATOR_TYPES.index(ann_type)]))
+    return mentions
+
+
+def _concept_text_pks(keys: Set[Tuple]) -> Dict[Tuple, int]:
+    """(uid, text) >> ConceptText pk, the oldest one if repeated"""
+    pks = {}
+    uids = sorted(set(uid for uid, text in keys))
+    for uids_chunk in _chunks(uids):
+        for pk, uid, text in ConceptText.objects.filter(concept_id__in=uids_chunk).order_by('pk').values_list(
+                'pk', 'concept_id', 'text'):
+            # Concept ids are strings, whatever type the column hands back
+            if (str(uid), text) in keys:
+                pks.setdefault((str(uid), text), pk)
+    return pks
+
+
+def import_concepts(document_pks: List[int]) -> Dict:
+    """Create the Concepts, ConceptTexts and ConceptDocumentRelationships
+        for the Pubtator annotations of the Documents
+
+        Existing rows are read back with a query per chunk and left alone,
+        so running the import again only adds what is new
+
+    Args:
+        document_pks (list): The Documents to import the concepts of
+
+    Returns:
+        dict: Counts of the mentions read and rows created, and the rows per second
+    """
+    start = time.time()
+    mentions = extract_concepts(document_pks)
+
+    with transaction.atomic():
+        # Concepts
+        uids = sorted(set(uid for document_pk, uid, text, stype in mentions))
+        existing = set()
+        for uids_chunk in _chunks(uids):
+            existing.update(Concept.objects.filter(id__in=uids_chunk).values_list('id', flat=True))
+        new_concepts = [Concept(id=uid) for uid in uids if uid not in existing]
+        Concept.objects.bulk_create(new_concepts, batch_size=IMPORT_CHUNK_SIZE)
+
+        # ConceptTexts, bulk_create doesn't return the pks on MySQL
+        text_keys = set((uid, text) for document_pk, uid, text, stype in mentions)
+        text_pks = _concept_text_pks(text_keys)
+        new_texts = [ConceptText(concept_id=uid, text=text) for uid, text in sorted(text_keys - set(text_pks))]
+        ConceptText.objects.bulk_create(new_texts, batch_size=IMPORT_CHUNK_SIZE)
+        if new_texts:
+            text_pks = _concept_text_pks(text_keys)
+
+        # ConceptDocumentRelationships
+        relationships = set((text_pks[(uid, text)], document_pk, stype) for document_pk, uid, text, stype in mentions)
+        existing = set()
+        for document_pks_chunk in _chunks(sorted(set(document_pk for document_pk, uid, text, stype in mentions))):
+            existing.update(ConceptDocumentRelationship.objects.filter(document_id__in=document_pks_chunk).values_list(
+                'concept_text_id', 'document_id', 'stype'))
+        new_relationships = [ConceptDocumentRelationship(concept_text_id=text_pk, document_id=document_pk, stype=stype)
+                             for text_pk, document_pk, stype in sorted(relationships - existing)]
+        ConceptDocumentRelationship.objects.bulk_create(new_relationships, batch_size=IMPORT_CHUNK_SIZE)
+
+    elapsed = time.time() - start
+    created = len(new_concepts) + len(new_texts) + len(new_relationships)
+    counts = {
+        'mentions': len(mentions),
+        'concepts': len(new_concepts),
+        'concept_texts': len(new_texts),
+        'relationships': len(new_relationships),
+        'rows_per_second': round((len(mentions) + created) / elapsed, 1) if elapsed else None
+    }
+    logger.info('Imported concepts of %s documents in %.2fs: %s', len(set(document_pks)), elapsed, counts)
+    return counts
@@ -1,6 +1,5 @@
-from .models import Concept, ConceptText, ConceptDocumentRelationship, Relation, RelationGroup
-from ...document.models import Document
-from ...common.formatter import clean_df
+from .models import ConceptDocumentRelationship, Relation, RelationGroup
+from . import concepts
 
 import itertools
 from celery import task
@@ -12,8 +11,6 @@ determined if there are non-overlapping concepts
 (at least one pair, or "relation pair" per document).
 """
 
-stype_arr = ['d', 'g', 'c']
-
 
 @task()
 def import_concepts():
@@ -26,27 +23,13 @@ def import_concepts():
             4) Do not use concepts without a unique identification (UID)
             5) Use the longest word as the representative "text" if there are multiple texts
             per UID
-    """
-
-    for group in RelationGroup.objects.all():
 
-        for document in group.documents.all():
-
-            df = Document.objects.entity_recognition_df(documents=[document], include_pubtator=True)
-            # (TODO) Do we need protection or not? I'm confused.
-            df = clean_df(df, overlap_protection=False, allow_duplicates=False)
-
-            # We're only interested in Pubtator identifiers
-            df = df[df['user_id'] == -1]
+        The Pubtator annotations of every group's Documents are imported
+        in bulk, see concepts.import_concepts
+    """
 
-            # Put these into the DB
-            for index, row in df.iterrows():
-                # (TODO) Maybe make these bulk creates
-                c, created = Concept.objects.get_or_create(id=row['uid'])
-                ct, created = ConceptText.objects.get_or_create(concept_id=row['uid'], text=row['text'])
-                # (TODO) Consider ann_type in addition to source
-                # agree with this comment. 'source' is too variable. Just use ann_type -JF
-                cdr, created = ConceptDocumentRelationship.objects.get_or_create(concept_text=ct, document=document, stype=stype_arr[row['ann_type_idx']])
+    document_pks = list(RelationGroup.objects.filter(documents__isnull=False).values_list('documents', flat=True).distinct())
+    return concepts.import_concepts(document_pks)
 
 
 @task()
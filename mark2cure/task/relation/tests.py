@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from ...document.models import Document, Pubtator, PubtatorAnnotation
+from .models import Concept, ConceptText, ConceptDocumentRelationship
+from . import concepts
+
+
+class ConceptImport(TestCase):
+
+    def setUp(self):
+        self.documents = []
+        for pmid in (1, 2):
+            document = Document.objects.create(document_id=pmid, title='Title', authors='Author')
+            pubtator = Pubtator.objects.create(document=document, kind='DNorm')
+            for ann_type, uid, text in (('Disease', 'MESH:D001', 'ataxia'), ('Disease', 'MESH:D001', 'ataxia'),
+                                        ('Gene', '6311', 'ATXN2'), ('Chemical', 'CHEBI:15377', 'water'),
+                                        ('Disease', 'MESH:D002,MESH:D003', 'both'), ('Disease', None, 'none'),
+                                        ('Species', '9606', 'human')):
+                PubtatorAnnotation.objects.create(pubtator=pubtator, document=document, ann_type=ann_type,
+                                                  uid=uid, start=0, text=text)
+            self.documents.append(document)
+
+        # ataxia is also known by another text in the second document
+        PubtatorAnnotation.objects.create(pubtator=pubtator, document=document, ann_type='Disease',
+                                          uid='D001', start=10, text='Ataxias')
+
+    def test_import_concepts(self):
+        document_pks = [document.pk for document in self.documents]
+
+        counts = concepts.import_concepts(document_pks)
+        self.assertEqual(counts['concepts'], 3)
+        self.assertEqual(counts['concept_texts'], 4)
+        self.assertEqual(counts['relationships'], 7)
+
+        self.assertEqual(sorted(Concept.objects.values_list('id', flat=True)), ['15377', '6311', 'D001'])
+        self.assertEqual(ConceptText.objects.filter(concept_id='D001').count(), 2)
+        self.assertEqual(list(ConceptDocumentRelationship.objects.filter(
+            document=self.documents[0], concept_text__concept_id='6311').values_list('stype', flat=True)), ['g'])
+
+        # Importing again doesn't duplicate anything
+        counts = concepts.import_concepts(document_pks)
+        self.assertEqual((counts['concepts'], counts['concept_texts'], counts['relationships']), (0, 0, 0))
+        self.assertEqual(ConceptDocumentRelationship.objects.count(), 7)
@@ -12,6 +12,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 
+from ...common import sql
 from ...score.models import Point
 from ...document.models import Document, View, Annotation
 
@@ -29,24 +30,18 @@ def document_analysis(request, document_pk, relation_pk=None):
     """
     document = get_object_or_404(Document, pk=document_pk)
 
-    relation_logic = ''
+    relation_id = None
     # If a relation was specified, only show results for that
     if relation_pk:
         relation = get_object_or_404(Relation, pk=relation_pk)
-        relation_logic = 'AND `relation_relation`.`id` = {0}'.format(relation.pk)
-
-    cmd_str = ""
-    with open('mark2cure/task/relation/commands/get-relations-analysis-for-user-and-document.sql', 'r') as f:
-        cmd_str = f.read()
-    cmd_str = cmd_str.format(
-        document_id=document.pk,
-        user_id=request.user.pk,
-        relation_logic=relation_logic
-    )
+        relation_id = relation.pk
 
     # Start the DB Connection
     c = connection.cursor()
-    c.execute(cmd_str)
+    sql.execute(c, 'task/relation/get-relations-analysis-for-user-and-document',
+                document_id=document.pk,
+                user_id=request.user.pk,
+                relation_id=relation_id)
 
     queryset = [{
         'id': x[0],
@@ -92,17 +87,12 @@ def re_task_relationships_list(request, document_pk):
     for section in document.section_set.all():
         View.objects.get_or_create(task_type='ri', section=section, user=request.user)
 
-    cmd_str = ""
-    with open('mark2cure/task/relation/commands/get-user-relations-for-document.sql', 'r') as f:
-        cmd_str = f.read()
-
     # Start the DB Connection
     c = connection.cursor()
-
-    c.execute('SET @k_max = {completions};'.format(completions=settings.ENTITY_RECOGNITION_K))
-    c.execute('SET @user_id = {user_id};'.format(user_id=request.user.pk))
-    c.execute('SET @document_id = {document_id};'.format(document_id=document.pk))
-    c.execute(cmd_str)
+    sql.execute(c, 'task/relation/get-user-relations-for-document', variables={
+        'k_max': settings.ENTITY_RECOGNITION_K,
+        'user_id': request.user.pk,
+        'document_id': document.pk})
 
     queryset = [{'id': x[0],
                  'document_id': x[1],
@@ -141,19 +131,10 @@ def re_task_relationship_submit(request, document_pk, relation_pk):
 
     current_selection = request.POST.get('relation', None)
     if current_selection:
-        cmd_str = ""
-        with open('mark2cure/task/relation/commands/get-relation-ann-exists.sql', 'r') as f:
-            cmd_str = f.read()
-        cmd_str = cmd_str.format(
-            document_id=document.pk,
-            user_id=request.user.pk,
-            relation_id=relation.pk
-        )
-
-        # Start the DB Connection
-        c = connection.cursor()
-        c.execute(cmd_str)
-        already_submitted = c.fetchone()[0]
+        already_submitted = sql.fetchall('task/relation/get-relation-ann-exists',
+                                         document_id=document.pk,
+                                         user_id=request.user.pk,
+                                         relation_id=relation.pk)[0][0]
 
         if already_submitted:
             content = {'message': 'A Relationship Extraction Annotation can only be submitted once.'}
@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 
 from ..document.models import Annotation
 
-from brabeion import badges
+from ..task.models import Level
 from random import randint
 from django.utils import timezone
 import random
@@ -3,6 +3,6 @@ SELECT  `task_level`.`task_type`,
         MAX(`task_level`.`created`) as `last_created`,
         COUNT(`task_level`.`id`) as `completions`
 FROM `task_level`
-WHERE `task_level`.`user_id` = {user_id}
+WHERE `task_level`.`user_id` = %(user_id)s
 GROUP BY `task_type` ASC, `level`
 ORDER BY `task_type` ASC, `level`
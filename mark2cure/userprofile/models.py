@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Q, Sum
 
 from django_countries.fields import CountryField
 
@@ -10,9 +10,9 @@ from ..document.models import Annotation, Document, View
 from ..common.models import Group
 from ..task.models import Task, UserQuestRelationship, Level
 from ..task.relation.models import RelationAnnotation
-from ..task.entity_recognition.models import EntityRecognitionAnnotation
 from ..analysis.models import Report
-from ..score.models import Point
+from ..score.models import Point, ScoreLedger
+from ..score.managers import ENTITY_RECOGNITION, RELATION
 
 from django.utils import timezone
 import pandas as pd
@@ -161,55 +161,23 @@ class UserProfile(models.Model):
         if view:
             # If they want to get back all the specific points they earned for a view
 
-            # Points for submitting individual relation steps
+            # Points for submitting individual relation steps and the relation set
             relation_ann_pks = view.annotation_set.values_list('object_id', flat=True)
-            val = sum(Point.objects.filter(
-                user=self.user,
-                content_type=ContentType.objects.get_for_model(RelationAnnotation),
-                object_id__in=relation_ann_pks
-            ).values_list('amount', flat=True))
-
-            # Points for submitting the relation set
-            val += sum(Point.objects.filter(
-                user=self.user,
-                content_type=ContentType.objects.get_for_model(view),
-                object_id=view.pk
-            ).values_list('amount', flat=True))
+            val = Point.objects.filter(user=self.user).filter(
+                Q(content_type=ContentType.objects.get_for_model(RelationAnnotation), object_id__in=relation_ann_pks) |
+                Q(content_type=ContentType.objects.get_for_model(view), object_id=view.pk)
+            ).aggregate(score=Sum('amount'))['score'] or 0
 
         elif task:
+            # The ledger assigns each Point to the game it was earned in as it's created
             if 'entity' in task:
-                val = sum(Point.objects.filter(user=self.user).filter(
-                    Q(object_id__isnull=True) | Q(content_type=ContentType.objects.get_for_model(EntityRecognitionAnnotation))
-                ).values_list('amount', flat=True))
-
-                # These are being assigned to Tasks
-                # (TODO) This whole thing is fucked up, need to get away from Tasks and
-                # find clear way to allocate units complete and points for multi-game system
-                quest_task_pks = Task.objects.filter(kind='q').values_list('pk', flat=True)
-                val += sum(Point.objects.filter(
-                    user=self.user,
-                    content_type=ContentType.objects.get_for_model(Task),
-                    object_id__in=quest_task_pks
-                ).values_list('amount', flat=True))
+                val = ScoreLedger.objects.score(self.user_id, category=ENTITY_RECOGNITION)
 
             if 'relation' in task:
-
-                # Points for submitting individual relation steps
-                val = sum(Point.objects.filter(
-                    user=self.user,
-                    content_type=ContentType.objects.get_for_model(RelationAnnotation)
-                ).values_list('amount', flat=True))
-
-                # Points for submitting relation sets
-                completed_relation_view_pks = View.objects.filter(user=self.user, task_type='ri').values_list('pk', flat=True)
-                val += sum(Point.objects.filter(
-                    user=self.user,
-                    content_type=ContentType.objects.get_for_model(View),
-                    object_id__in=completed_relation_view_pks
-                ).values_list('amount', flat=True))
+                val = ScoreLedger.objects.score(self.user_id, category=RELATION)
 
         else:
-            val = sum(Point.objects.filter(user=self.user).values_list('amount', flat=True))
+            val = ScoreLedger.objects.score(self.user_id)
 
         return int(val)
 